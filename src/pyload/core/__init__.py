@@ -19,7 +19,7 @@ import time
 from pyload import PKGDIR, APPID, USERHOMEDIR
 from .. import __version__ as PYLOAD_VERSION
 from .. import __version_info__ as PYLOAD_VERSION_INFO
-from .utils import format, fs
+from .utils import format
 from .utils.misc import reversemap
 from threading import Event
 
@@ -185,10 +185,12 @@ class Core:
         from .managers.plugin_manager import PluginManager
         from .managers.thread_manager import ThreadManager
         from .managers.file_manager import FileManager
+        from .managers.storage_manager import StorageManager
 
         from .scheduler import Scheduler
 
         self.files = self.file_manager = FileManager(self)
+        self.storage = self.storage_manager = StorageManager(self)
         self.scheduler = Scheduler(self)
 
         self.pgm = self.plugin_manager = PluginManager(self)
@@ -313,11 +315,11 @@ class Core:
             self.log.info(self._("User directory: {}").format(self.userdir))
             self.log.info(self._("Cache directory: {}").format(self.cachedir))
 
-            storage_folder = self.config.get("general", "storage_folder")
-            self.log.info(self._("Storage directory: {}".format(storage_folder)))
+            for storage_folder in self.storage.roots:
+                self.log.info(self._("Storage directory: {}".format(storage_folder)))
 
-            avail_space = format.size(fs.free_space(storage_folder))
-            self.log.info(self._("Storage free space: {}").format(avail_space))
+                avail_space = format.size(self.storage.free_space(storage_folder))
+                self.log.info(self._("Storage free space: {}").format(avail_space))
 
             self._setup_network()
             # self._setup_niceness()
@@ -399,5 +401,6 @@ class Core:
 
         finally:
             self.files.sync_save()
+            self.request_factory.save_cookies()
             self._running.clear()
             # self.evm.fire('pyload:stopped')
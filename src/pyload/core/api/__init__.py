@@ -18,7 +18,7 @@ from functools import wraps
 from ..datatypes.pyfile import PyFile
 from ..network.request_factory import get_url
 from ..utils.old.packagetools import parse_names
-from ..utils import seconds, fs
+from ..utils import seconds
 
 import json
 from enum import IntFlag
@@ -294,9 +294,9 @@ class Api:
     @permission(Perms.STATUS)
     def free_space(self):
         """
-        Available free space at download directory in bytes.
+        Available free space at download directories in bytes.
         """
-        return fs.free_space(self.pyload.config.get("general", "storage_folder"))
+        return self.pyload.storage.total_free_space()
 
     @legacy("getServerVersion")
     @permission(Perms.ALL)
@@ -987,6 +987,21 @@ class Api:
         p.sync()
         self.pyload.files.save()
 
+    @permission(Perms.MODIFY)
+    def set_package_storage(self, pid, folder=None):
+        """
+        Pins a package to one of the download folders.
+
+        :param pid: package id
+        :param folder: download folder, or None to let pyLoad place the package
+        :raises: ValueError, when folder is not one of the download folders
+        """
+        p = self.pyload.files.get_package(pid)
+        if not p:
+            raise PackageDoesNotExists(pid)
+
+        self.pyload.storage.pin(p.id, folder)
+
     @legacy("deleteFinished")
     @permission(Perms.DELETE)
     def delete_finished(self):
@@ -182,6 +182,7 @@ class FileManager:
         self.pyload.db.delete_package(p)
         self.pyload.event_manager.add_event(e)
         self.pyload.addon_manager.dispatch_event("package_deleted", id)
+        self.pyload.storage.forget(id)
 
         if id in self.package_cache:
             del self.package_cache[id]
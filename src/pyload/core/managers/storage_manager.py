@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import time
+from threading import RLock
+
+from ..utils import fs
+from ..utils.old import lock
+
+
+class StorageManager:
+    """
+    Places packages on the download folders (storage roots) of one or more
+    volumes.
+
+    Every package lives on one root: the one its folder already exists on, the
+    one it was pinned to, or else the one picked by the `storage_policy`
+    (most free space or round-robin) among the roots with enough free space.
+    Placements are saved, so packages stay on their volume across restarts.
+    Free space is cached per volume for `FREE_SPACE_TTL` seconds, a full
+    (or held, e.g. while archives are extracted on it) volume only holds back
+    the downloads placed on it.
+    """
+
+    FREE_SPACE_TTL = 5  #: seconds
+
+    def __init__(self, core):
+        self.pyload = core
+        self._ = core._
+        self.lock = RLock()
+
+        self.file = os.path.join(core.userdir, "data", "storage.json")
+        self.packages = {}  #: package id -> root
+        self.pinned = set()  #: ids of packages pinned by the user
+        self.spaces = {}  #: volume -> (timestamp, free bytes)
+        self.full = set()  #: roots reported as full
+        self.held = {}  #: volume -> holds keeping new downloads off it
+        self.next_root = 0  #: round-robin position
+
+        self.load()
+
+    @property
+    def roots(self):
+        """
+        the download folders, the primary one first.
+        """
+        roots = [self.pyload.config.get("general", "storage_folder")]
+        extra = self.pyload.config.get("general", "storage_folders")
+        roots.extend(x.strip() for x in extra.split(";") if x.strip())
+
+        result = []
+        for root in roots:
+            root = os.path.abspath(os.path.expanduser(root))
+            if root not in result:
+                result.append(root)
+        return result
+
+    @lock
+    def load(self):
+        try:
+            with open(self.file, encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return
+
+        self.packages = {int(k): v for k, v in data.get("packages", {}).items()}
+        self.pinned = set(data.get("pinned", []))
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        tmp_name = f"{self.file}.tmp"
+        with open(tmp_name, mode="w", encoding="utf-8") as fh:
+            json.dump({"packages": self.packages, "pinned": sorted(self.pinned)}, fh)
+        os.replace(tmp_name, self.file)
+
+    def _volume(self, path):
+        while not os.path.exists(path):
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+        try:
+            return os.stat(path).st_dev, path
+        except OSError:
+            return path, path
+
+    def volume(self, path):
+        """
+        returns the volume of `path`, or of its nearest existing parent.
+        """
+        return self._volume(path)[0]
+
+    @lock
+    def hold(self, path):
+        """
+        hold back new downloads to the volume of `path` until released.
+        """
+        volume = self.volume(path)
+        self.held[volume] = self.held.get(volume, 0) + 1
+
+    @lock
+    def release(self, path):
+        volume = self.volume(path)
+        if self.held.get(volume, 0) > 1:
+            self.held[volume] -= 1
+        else:
+            self.held.pop(volume, None)
+
+    @lock
+    def free_space(self, path):
+        """
+        returns the free bytes of the volume of `path`, cached for
+        `FREE_SPACE_TTL` seconds.
+        """
+        volume, path = self._volume(path)
+        now = time.time()
+        cached = self.spaces.get(volume)
+        if cached is None or now - cached[0] > self.FREE_SPACE_TTL:
+            try:
+                space = fs.free_space(path)
+            except OSError:
+                space = 0
+            cached = self.spaces[volume] = (now, space)
+        return cached[1]
+
+    def total_free_space(self):
+        """
+        returns the free bytes of all the volumes of the download folders.
+        """
+        volumes = {self._volume(x)[0]: x for x in self.roots}
+        return sum(self.free_space(x) for x in volumes.values())
+
+    def has_space(self, root):
+        min_space = self.pyload.config.get("general", "min_free_space")
+        return self.free_space(root) >> 20 >= min_space
+
+    def _package(self, pypack):
+        if isinstance(pypack, int):
+            return self.pyload.files.get_package(pypack)
+        return pypack
+
+    def _choose(self, pypack):
+        roots = self.roots
+
+        if pypack is not None and pypack.folder:
+            for root in roots:
+                if os.path.isdir(os.path.join(root, pypack.folder)):
+                    return root
+
+        candidates = [x for x in roots if self.has_space(x)] or roots
+        if self.pyload.config.get("general", "storage_policy") == "roundrobin":
+            root = candidates[self.next_root % len(candidates)]
+            self.next_root += 1
+            return root
+
+        return max(candidates, key=self.free_space)
+
+    @lock
+    def get_root(self, pypack):
+        """
+        returns the download folder of a package (or package id), placing the
+        package if it has none yet.
+        """
+        pid = pypack if isinstance(pypack, int) else pypack.id
+        pypack = self._package(pypack)
+        roots = self.roots
+        root = self.packages.get(pid)
+        if root in roots:
+            return root
+        if pypack is None:
+            return roots[0]
+
+        #: a pin to a folder no longer among the download folders is dropped
+        self.pinned.discard(pypack.id)
+        root = self.packages[pypack.id] = self._choose(pypack)
+        self._save()
+        return root
+
+    def get_folder(self, pypack):
+        """
+        returns the folder the files of a package are downloaded to.
+        """
+        pypack = self._package(pypack)
+        root = self.get_root(pypack)
+        if pypack is None or not self.pyload.config.get(
+            "general", "folder_per_package"
+        ):
+            return root
+        return os.path.join(root, pypack.folder)
+
+    @lock
+    def pin(self, pid, root):
+        """
+        pin a package to the download folder `root`, or unpin it if `root` is
+        None. Raises ValueError if `root` is not one of the download folders.
+        """
+        if root is None:
+            self.pinned.discard(pid)
+            self.packages.pop(pid, None)
+        else:
+            root = os.path.abspath(os.path.expanduser(root))
+            if root not in self.roots:
+                raise ValueError(f"{root} is not a download folder")
+            self.packages[pid] = root
+            self.pinned.add(pid)
+        self._save()
+
+    @lock
+    def forget(self, pid):
+        """
+        drop the placement of a deleted package.
+        """
+        if self.packages.pop(pid, None) is not None:
+            self.pinned.discard(pid)
+            self._save()
+
+    @lock
+    def check(self, pypack):
+        """
+        returns True if downloads of a package can start: its volume has enough
+        free space and is not held. Logs when a volume gets full or has space
+        again.
+        """
+        root = self.get_root(pypack)
+        if self.held and self.volume(root) in self.held:
+            return False
+
+        if self.has_space(root):
+            if root in self.full:
+                self.full.discard(root)
+                self.pyload.log.info(
+                    self._("Enough space left on {}, resuming its downloads").format(
+                        root
+                    )
+                )
+            return True
+
+        if root not in self.full:
+            self.full.add(root)
+            self.pyload.log.warning(
+                self._("Not enough space left on {}, holding its downloads").format(
+                    root
+                )
+            )
+        return False
@@ -16,7 +16,7 @@ from ..network.request_factory import get_url
 from ..threads.decrypter_thread import DecrypterThread
 from ..threads.download_thread import DownloadThread
 from ..threads.info_thread import InfoThread
-from ..utils import fs
+from ..threads.prefetch_thread import PrefetchThread
 from ..utils.old import lock
 
 
@@ -60,6 +60,10 @@ class ThreadManager:
         for i in range(self.pyload.config.get("download", "max_downloads")):
             self.create_thread()
 
+        #: ids of the queued files with a link resolution pending
+        self.prefetching = set()
+        self.prefetch_thread = PrefetchThread(self)
+
     def create_thread(self):
         """
         create a download thread.
@@ -268,6 +272,28 @@ class ThreadManager:
         # return True
 
     # ----------------------------------------------------------------------
+    def prefetch_jobs(self, occ):
+        """
+        queue the next jobs for link resolution ahead of their download.
+        """
+        amount = self.pyload.config.get("download", "prefetch")
+        if amount <= 0:
+            return
+
+        ids = [x for x in self.pyload.files.job_cache.get(occ, []) if x != "empty"][
+            -amount:
+        ]
+        for id in reversed(ids):
+            if id in self.prefetching:
+                continue
+
+            pyfile = self.pyload.files.get_file(id)
+            if pyfile is None:
+                continue
+
+            self.prefetching.add(id)
+            self.prefetch_thread.put(pyfile)
+
     def assign_job(self):
         """
         assing a job to a thread if possible.
@@ -327,19 +353,20 @@ class ThreadManager:
                 return
 
             if job.plugin.__type__ == "downloader":
-                space_left = (
-                    fs.free_space(self.pyload.config.get("general", "storage_folder"))
-                    >> 20
-                )
-                if space_left < self.pyload.config.get("general", "min_free_space"):
-                    self.pyload.log.warning(self._("Not enough space left on device"))
-                    self.pause = True
+                #: a full volume only holds back the downloads placed on it
+                if not self.pyload.storage.check(job.package()):
+                    jobs = self.pyload.files.job_cache.setdefault(occ, [])
+                    if "empty" in jobs:
+                        jobs.remove("empty")
+                    jobs.insert(0, job.id)  #: try the other jobs first
+                    return
 
                 if free and not self.pause:
                     thread = free[0]
                     # self.downloaded += 1
 
                     thread.put(job)
+                    self.prefetch_jobs(occ)
                 else:
                     # put job back
                     if occ not in self.pyload.files.job_cache:
@@ -2,6 +2,7 @@
 
 from logging import getLogger
 
+import pycurl
 from pyload import APPID
 
 from .http.http_download import HTTPDownload
@@ -9,15 +10,21 @@ from .http.http_request import HTTPRequest
 
 
 class Browser:
-    def __init__(self, bucket=None, options={}):
+    #: curl errors counted as a proxy failure
+    PROXY_ERRORS = (5, 7, 28, 35, 52, 56, 97)
+
+    def __init__(self, bucket=None, options={}, cache=None, proxy_pool=None):
         self.log = getLogger(APPID)
 
         self.options = options  #: holds pycurl options
         self.bucket = bucket
+        self.cache = cache
+        self.proxy_pool = proxy_pool  #: ProxyPool the proxy of the options is from
 
         self.cj = None  #: needs to be setted later
         self.http = None
         self._size = 0
+        self.digests = {}  #: hex digests of the last download by algorithm
 
         self.renew_http_request()
         self.dl = None
@@ -27,7 +34,7 @@ class Browser:
             self.http.close()
         except Exception:
             pass
-        self.http = HTTPRequest(self.cj, self.options)
+        self.http = HTTPRequest(self.cj, self.options, cache=self.cache)
 
     def set_last_url(self, val):
         self.http.last_url = val
@@ -94,11 +101,20 @@ class Browser:
         resume=False,
         progress_notify=None,
         disposition=False,
+        mirrors=(),
+        hashes=(),
+        transform=None,
     ):
         """
         this can also download ftp.
+
+        `mirrors` are other urls of the same file, loaded in parallel.
+        `hashes` are the algorithms of the digests computed while downloading.
+        `transform(offset)` returns the function applied to the data received
+        from a file offset on, before it is written.
         """
         self._size = 0
+        self.digests = {}
         self.dl = HTTPDownload(
             url,
             filename,
@@ -110,9 +126,18 @@ class Browser:
             self.options,
             progress_notify,
             disposition,
+            mirrors,
+            hashes,
+            transform,
         )
-        name = self.dl.download(chunks, resume)
+        try:
+            name = self.dl.download(chunks, resume)
+        except pycurl.error as exc:
+            self.report_proxy(exc)
+            raise
+        self.report_proxy()
         self._size = self.dl.size
+        self.digests = self.dl.digests
 
         self.dl = None
 
@@ -122,7 +147,22 @@ class Browser:
         """
         retrieves page.
         """
-        return self.http.load(*args, **kwargs)
+        try:
+            rep = self.http.load(*args, **kwargs)
+        except pycurl.error as exc:
+            self.report_proxy(exc)
+            raise
+        self.report_proxy()
+        return rep
+
+    def report_proxy(self, exc=None):
+        """
+        report the outcome of a request to the proxy pool.
+        """
+        if not self.proxy_pool:
+            return
+        success = exc is None or exc.args[0] not in self.PROXY_ERRORS
+        self.proxy_pool.report(self.options["proxies"], success)
 
     def put_header(self, name, value):
         """
@@ -161,6 +201,9 @@ class Browser:
         """
         cleanup.
         """
+        if self.proxy_pool:
+            self.proxy_pool.release(self.options["proxies"])
+            self.proxy_pool = None
         if hasattr(self, "http"):
             self.http.close()
             del self.http
@@ -2,7 +2,7 @@
 # AUTHOR: RaNaN
 
 import time
-from threading import Lock
+from threading import Lock, local
 
 from ..utils.old import lock
 
@@ -10,9 +10,12 @@ from ..utils.old import lock
 class Bucket:
 
     MIN_RATE = 10 << 10  # 10kb minimum rate
+    RESERVE_TIME = 0.01  #: seconds of rate every thread may reserve in one batch
 
     def __init__(self):
         self._rate = 0
+        self._epoch = 0  #: bumped on rate change, invalidates thread reservations
+        self._local = local()
         self.token = 0
         self.timestamp = time.time()
         self.lock = Lock()
@@ -23,6 +26,7 @@ class Bucket:
     @lock
     def set_rate(self, rate):
         self._rate = int(rate)
+        self._epoch += 1
 
     def get_rate(self):
         return self._rate
@@ -38,13 +42,37 @@ class Bucket:
         self.timestamp = now
 
     @lock
+    def _reserve(self, amount):
+        """
+        Take `amount` plus a batch reservation from the shared bucket.
+
+        Returns the sleep time and the tokens left over for the calling thread.
+        """
+        self._calc_token()
+        batch = max(amount, int(self._rate * self.RESERVE_TIME))
+        self.token -= batch
+        consumed = -self.token / self._rate if self.token < 0 else 0
+        return consumed, batch - amount
+
     def consumed(self, amount):
         """
         Return time the process have to sleep, after consumed specified amount.
+
+        Every thread keeps a small local reservation of tokens, so the shared
+        bucket (and its lock) is touched only once per batch and not on every
+        write callback.
         """
-        if self.rate < self.MIN_RATE:
+        if self._rate < self.MIN_RATE:
             return 0  # NOTE: May become unresponsive otherwise
-        self._calc_token()
-        self.token -= amount
-        consumed = -self.token // self._rate if self.token < 0 else 0
+
+        reserve = self._local
+        if getattr(reserve, "epoch", None) != self._epoch:
+            reserve.epoch = self._epoch
+            reserve.token = 0
+
+        if reserve.token >= amount:
+            reserve.token -= amount
+            return 0
+
+        consumed, reserve.token = self._reserve(amount - reserve.token)
         return consumed
@@ -1,44 +1,174 @@
 # -*- coding: utf-8 -*-
 # AUTHOR: mkaay, RaNaN
 
+import hashlib
+import os
 import time
 from datetime import timedelta
+from threading import Lock
+
+from ..utils.old import lock
 
 
 class CookieJar:
-    def __init__(self, pluginname, account=None):
-        self.cookies = {}
+    """
+    Cookies of a plugin (and account), indexed by domain, path and name.
+
+    Cookies are kept as curl cookielist (Netscape format) lines. Jars with a
+    `folder` are loaded back from there on creation and saved there by `save`,
+    so sessions survive a restart. Changes are only marked, since sessions
+    refreshing a cookie on every response would rewrite the file on every
+    request.
+    """
+
+    def __init__(self, pluginname, account=None, folder=None):
+        self.cookies = {}  #: domain -> {(path, name): cookie line}
         self.plugin = pluginname
         self.account = account
+        self.lock = Lock()
+        self.changed = False  #: cookies changed since they were last saved
+
+        if folder:
+            name = hashlib.sha1(f"{pluginname}\n{account}".encode()).hexdigest()
+            self.file = os.path.join(folder, f"{name}.txt")
+            self.load()
+        else:
+            self.file = None
+
+    @staticmethod
+    def _parse(line):
+        """
+        returns domain, path, name, value and expiry of a cookie line.
+        """
+        fields = line.rstrip("\r\n").split("\t")
+        if len(fields) != 7:
+            return None
+        domain = fields[0]
+        if domain.startswith("#HttpOnly_"):
+            domain = domain[10:]
+        try:
+            exp = int(fields[4])
+        except ValueError:
+            exp = 0
+        return domain.lstrip(".").lower(), fields[2], fields[5], fields[6], exp
+
+    @staticmethod
+    def _expired(exp, now):
+        return exp != 0 and exp < now  #: 0 is a session cookie
+
+    def _set(self, line, now):
+        cookie = self._parse(line)
+        if cookie is None:
+            return False
 
+        domain, path, name, value, exp = cookie
+        if self._expired(exp, now):
+            return self.cookies.get(domain, {}).pop((path, name), None) is not None
+
+        cookies = self.cookies.setdefault(domain, {})
+        if cookies.get((path, name)) == line:
+            return False
+        cookies[(path, name)] = line
+        return True
+
+    def _purge(self, now):
+        changed = False
+        for domain, cookies in list(self.cookies.items()):
+            for key, line in list(cookies.items()):
+                if self._expired(self._parse(line)[4], now):
+                    del cookies[key]
+                    changed = True
+            if not cookies:
+                del self.cookies[domain]
+        return changed
+
+    @lock
+    def save(self):
+        """
+        save the cookies to the jar file, if they changed since the last save.
+        """
+        if not self.file or not self.changed:
+            return
+
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        tmp_name = f"{self.file}.tmp"
+        fd = os.open(tmp_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, mode="w", encoding="utf-8", newline="\n") as fh:
+            fh.write("# Netscape HTTP Cookie File\n")
+            for cookies in self.cookies.values():
+                for line in cookies.values():
+                    fh.write(line + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, self.file)
+        self.changed = False
+
+    @lock
+    def load(self):
+        """
+        load the cookies saved to the jar file, dropping the expired ones.
+        """
+        try:
+            with open(self.file, encoding="utf-8") as fh:
+                lines = fh.read().splitlines()
+        except OSError:
+            return
+
+        now = time.time()
+        for line in lines:
+            if not line or line.startswith("#") and not line.startswith("#HttpOnly_"):
+                continue
+            self._set(line, now)
+
+    @lock
     def add_cookies(self, clist):
+        now = time.time()
         for c in clist:
-            name = c.split("\t")[5]
-            self.cookies[name] = c
+            self.changed |= self._set(c, now)
 
+    @lock
     def get_cookies(self):
-        return list(self.cookies.values())
+        self.changed |= self._purge(time.time())
+        return [line for cookies in self.cookies.values() for line in cookies.values()]
 
-    def parse_cookie(self, name):
-        if name in self.cookies:
-            return self.cookies[name].split("\t")[6]
+    def parse_cookie(self, name, domain=None):
+        """
+        returns the value of cookie `name`, set for `domain` or any of its
+        parent domains if given.
+        """
+        if domain:
+            domain = domain.lstrip(".").lower()
+            parts = domain.split(".")
+            domains = [".".join(parts[i:]) for i in range(len(parts))]
         else:
-            return None
+            domains = list(self.cookies)
+
+        now = time.time()
+        for d in domains:
+            for (path, cname), line in list(self.cookies.get(d, {}).items()):
+                cookie = self._parse(line)
+                if cname == name and not self._expired(cookie[4], now):
+                    return cookie[3]
+        return None
+
+    def get_cookie(self, name, domain=None):
+        return self.parse_cookie(name, domain)
 
-    def get_cookie(self, name):
-        return self.parse_cookie(name)
-
-    def set_cookie(
-        self,
-        domain,
-        name,
-        value,
-        path="/",
-        exp=time.time() + timedelta(hours=744).seconds,  #: 31 days retention
-    ):
-        self.cookies[
-            name
-        ] = f".{domain}    TRUE    {path}    FALSE    {exp}    {name}    {value}"
+    @lock
+    def set_cookie(self, domain, name, value, path="/", exp=None):
+        if exp is None:
+            exp = (
+                time.time() + timedelta(hours=744).total_seconds()
+            )  #: 31 days retention
+        line = f".{domain}\tTRUE\t{path}\tFALSE\t{int(exp)}\t{name}\t{value}"
+        self.changed |= self._set(line, time.time())
 
+    @lock
     def clear(self):
         self.cookies = {}
+        self.changed = False
+        if self.file:
+            try:
+                os.remove(self.file)
+            except OSError:
+                pass
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import weakref
+from urllib.parse import urlsplit
+
+import pycurl
+
+from .http_request import HTTPRequest
+
+
+def run_coroutine(coro):
+    """
+    runs `coro` on a new event loop and returns its result, like `asyncio.run`
+    that needs Python 3.7.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+class CurlLoop:
+    """
+    Drives a curl multi handle from an asyncio event loop, so any number of
+    transfers runs concurrently on the thread of the loop.
+
+    Transfers to a host speaking HTTP/2 are multiplexed as streams of one
+    connection. The http version negotiated with every host is remembered, so
+    transfers wait for a connection to multiplex on unless the host is known to
+    only speak HTTP/1.
+
+    The event loop is only weakly referenced, so a CurlLoop is dropped along
+    with its loop, `discard` closes it as soon as it is no longer needed.
+    """
+
+    MAX_HOST_CONNECTIONS = 16  #: more transfers to the same host are queued
+
+    _loops = weakref.WeakKeyDictionary()  #: event loop -> CurlLoop
+    versions = {}  #: host -> http version negotiated last, shared by all loops
+
+    def __init__(self, loop):
+        self._loop = weakref.ref(loop)
+        self.futures = {}  #: curl handle -> future of its transfer
+        self.timer = None
+
+        self.m = pycurl.CurlMulti()
+        self.m.setopt(pycurl.M_SOCKETFUNCTION, self._on_socket)
+        self.m.setopt(pycurl.M_TIMERFUNCTION, self._on_timer)
+        self.m.setopt(pycurl.M_MAX_HOST_CONNECTIONS, self.MAX_HOST_CONNECTIONS)
+        self.m.setopt(pycurl.M_PIPELINING, pycurl.PIPE_MULTIPLEX)
+
+    @classmethod
+    def get(cls):
+        """
+        returns the CurlLoop of the running event loop.
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            return cls._loops[loop]
+        except KeyError:
+            curl_loop = cls._loops[loop] = cls(loop)
+            return curl_loop
+
+    @classmethod
+    def discard(cls):
+        """
+        closes the CurlLoop of the running event loop, if any.
+        """
+        curl_loop = cls._loops.pop(asyncio.get_event_loop(), None)
+        if curl_loop is not None:
+            curl_loop.close()
+
+    @property
+    def loop(self):
+        return self._loop()
+
+    def close(self):
+        """
+        cancels the transfers left and closes the multi handle.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        for c, future in list(self.futures.items()):
+            self._remove(c)
+            future.cancel()
+        self.m.close()
+
+    @staticmethod
+    def _host(url):
+        if isinstance(url, bytes):
+            url = url.decode("utf-8", "replace")
+        return urlsplit(url).netloc.lower()
+
+    @classmethod
+    def is_multiplexed(cls, url):
+        """
+        returns False if the host of `url` is known to only speak HTTP/1.
+        """
+        version = cls.versions.get(cls._host(url))
+        return version is None or version >= pycurl.CURL_HTTP_VERSION_2_0
+
+    def perform(self, c, url=None):
+        """
+        returns a future set when the transfer of curl handle `c` is done.
+        `url` is given for transfers that may be multiplexed.
+        """
+        #: opening more connections is faster than waiting on an HTTP/1 one
+        c.setopt(pycurl.PIPEWAIT, int(bool(url) and self.is_multiplexed(url)))
+
+        future = self.loop.create_future()
+        future.add_done_callback(lambda x: x.cancelled() and self._remove(c))
+        self.futures[c] = future
+        self.m.add_handle(c)
+        return future
+
+    def _remove(self, c):
+        if self.futures.pop(c, None) is not None:
+            self.m.remove_handle(c)
+
+    def _on_socket(self, event, fd, multi, data):
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+
+        if event == pycurl.POLL_REMOVE:
+            loop.remove_reader(fd)
+            loop.remove_writer(fd)
+            return
+
+        if event & pycurl.POLL_IN:
+            loop.add_reader(fd, self._action, fd, pycurl.CSELECT_IN)
+        else:
+            loop.remove_reader(fd)
+
+        if event & pycurl.POLL_OUT:
+            loop.add_writer(fd, self._action, fd, pycurl.CSELECT_OUT)
+        else:
+            loop.remove_writer(fd)
+
+    def _on_timer(self, timeout_ms):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if timeout_ms >= 0:
+            self.timer = self.loop.call_later(
+                timeout_ms / 1000, self._action, pycurl.SOCKET_TIMEOUT, 0
+            )
+
+    def _action(self, fd, event):
+        while True:
+            ret, running = self.m.socket_action(fd, event)
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+
+        while True:
+            num_q, ok_list, err_list = self.m.info_read()
+            for c in ok_list:
+                self._done(c, None)
+            for c, errno, msg in err_list:
+                self._done(c, pycurl.error(errno, msg))
+            if not num_q:
+                break
+
+    def _done(self, c, exc):
+        future = self.futures.pop(c, None)
+        self.m.remove_handle(c)
+
+        version = c.getinfo(pycurl.INFO_HTTP_VERSION)
+        if version:
+            self.versions[self._host(c.getinfo(pycurl.EFFECTIVE_URL))] = version
+        if future is None or future.done():
+            return
+        if exc is None:
+            future.set_result(None)
+        else:
+            future.set_exception(exc)
+
+
+class AsyncHTTPRequest:
+    """
+    Asyncio counterpart of HTTPRequest, where `load` is a coroutine.
+
+    Any number of loads can run at the same time on one thread. Every load uses
+    its own curl handle with the cookie jar and the options (interface, proxy,
+    ...) of the request. The http cache and streamed responses are not
+    supported.
+    """
+
+    def __init__(self, cookies=None, options=None, limit=1_000_000):
+        self.cj = cookies  #: cookiejar
+        self.options = options or {}
+        self.limit = limit
+
+        self.idle = []  #: HTTPRequests free to be reused
+
+        #: results of the last finished load
+        self.code = 0
+        self.header = bytes()
+        self.last_url = None
+        self.last_effective_url = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    async def request(
+        self,
+        url,
+        get={},
+        post={},
+        referer=True,
+        cookies=True,
+        just_header=False,
+        multipart=False,
+        decode=False,
+        follow_location=True,
+        save_cookies=True,
+    ):
+        """
+        load a page, returns the response along with the HTTPRequest it was
+        loaded with, for its `code`, `header` and `last_effective_url`.
+        """
+        if self.idle:
+            req = self.idle.pop()
+        else:
+            req = HTTPRequest(self.cj, self.options, self.limit)
+        req.last_url = self.last_url
+
+        try:
+            req.prepare_load(
+                url,
+                get,
+                post,
+                referer,
+                cookies,
+                just_header,
+                multipart,
+                follow_location,
+            )
+            await CurlLoop.get().perform(
+                req.c, url if self.options.get("http2") else None
+            )
+            rep = req.finish_load(just_header, decode, follow_location, save_cookies)
+        finally:
+            self.idle.append(req)
+
+        self.code = req.code
+        self.header = req.header
+        self.last_url = req.c.last_url
+        self.last_effective_url = req.last_effective_url
+
+        return rep, req
+
+    async def load(self, *args, **kwargs):
+        """
+        load and returns a given page, see HTTPRequest.load.
+        """
+        rep, req = await self.request(*args, **kwargs)
+        return rep
+
+    def close(self):
+        """
+        cleanup, unusable after this.
+        """
+        for req in self.idle:
+            req.close()
+        self.idle = []
+        if hasattr(self, "cj"):
+            del self.cj
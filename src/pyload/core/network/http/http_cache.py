@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import email.utils
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from ...utils.old import lock
+
+
+class HTTPCache:
+    """
+    On-disk cache for plugin page loads, bounded in size with lru eviction.
+
+    Entries are keyed by url and cookie scope (plugin and account of the
+    cookiejar) and keep the ETag/Last-Modified validators of the response, so
+    stale entries are revalidated with a conditional request.
+    """
+
+    _RE_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)")
+
+    def __init__(self, folder, max_size):
+        self.folder = folder
+        self.max_size = max_size
+        self.lock = Lock()
+
+        self.entries = OrderedDict()  #: key -> size on disk, least recent first
+        self.size = 0
+
+        os.makedirs(self.folder, exist_ok=True)
+        self._scan()
+
+    def __bool__(self):
+        return self.max_size > 0
+
+    def _scan(self):
+        files = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(".meta"):
+                continue
+            key = name[:-5]
+            try:
+                st_meta = os.stat(self._path(key, "meta"))
+                st_body = os.stat(self._path(key, "body"))
+            except OSError:
+                self._remove_files(key)
+                continue
+            files.append((st_meta.st_mtime, key, st_meta.st_size + st_body.st_size))
+
+        for mtime, key, size in sorted(files):
+            self.entries[key] = size
+            self.size += size
+
+    def _path(self, key, ext):
+        return os.path.join(self.folder, f"{key}.{ext}")
+
+    def _remove_files(self, key):
+        for ext in ("meta", "body"):
+            try:
+                os.remove(self._path(key, ext))
+            except OSError:
+                pass
+
+    def _discard(self, key):
+        self.size -= self.entries.pop(key, 0)
+        self._remove_files(key)
+
+    def _evict(self):
+        while self.size > self.max_size and self.entries:
+            key = next(iter(self.entries))
+            self._discard(key)
+
+    @staticmethod
+    def key(url, cj=None):
+        scope = (getattr(cj, "plugin", None), getattr(cj, "account", None))
+        return hashlib.sha1(f"{scope}\n{url}".encode()).hexdigest()
+
+    @lock
+    def get(self, key):
+        """
+        returns the cached entry as (meta, body) or None.
+        """
+        if key not in self.entries:
+            return None
+        try:
+            with open(self._path(key, "meta"), encoding="utf-8") as fh:
+                meta = json.load(fh)
+            with open(self._path(key, "body"), mode="rb") as fh:
+                body = fh.read()
+        except (OSError, ValueError):
+            self._discard(key)
+            return None
+
+        self.entries.move_to_end(key)
+        os.utime(self._path(key, "meta"))
+        return meta, body
+
+    @lock
+    def set(self, key, meta, body):
+        self._discard(key)
+
+        data = json.dumps(meta, separators=(",", ":")).encode()
+        for ext, content in (("body", body), ("meta", data)):
+            tmp_name = self._path(key, f"{ext}.tmp")
+            with open(tmp_name, mode="wb") as fh:
+                fh.write(content)
+            os.replace(tmp_name, self._path(key, ext))
+
+        self.entries[key] = len(data) + len(body)
+        self.size += len(data) + len(body)
+        self._evict()
+
+    @lock
+    def refresh(self, key, meta):
+        """
+        update the metadata of an entry revalidated by the server.
+        """
+        if key not in self.entries:
+            return
+        data = json.dumps(meta, separators=(",", ":")).encode()
+        tmp_name = self._path(key, "meta.tmp")
+        with open(tmp_name, mode="wb") as fh:
+            fh.write(data)
+        os.replace(tmp_name, self._path(key, "meta"))
+        self.entries.move_to_end(key)
+
+    @lock
+    def clear(self):
+        for key in list(self.entries):
+            self._discard(key)
+
+    @classmethod
+    def parse_header(cls, header, ttl=None):
+        """
+        returns the cache metadata of a response or None if it must not be
+        stored. `ttl` overrides the freshness lifetime given by the server.
+        """
+        fields = {}
+        for line in header.decode("iso-8859-1").splitlines():
+            if line.startswith("HTTP/"):
+                fields = {}  #: keep only the header of the last response
+            name, sep, value = line.partition(":")
+            if sep:
+                fields[name.strip().lower()] = value.strip()
+
+        cache_control = fields.get("cache-control", "").lower()
+        if "no-store" in cache_control:
+            return None
+
+        now = time.time()
+        if ttl is not None and ttl is not True:
+            expires = now + int(ttl)
+        elif "no-cache" in cache_control:
+            expires = now
+        else:
+            m = cls._RE_MAX_AGE.search(cache_control)
+            if m:
+                expires = now + int(m.group(1))
+            else:
+                try:
+                    expires = email.utils.parsedate_to_datetime(
+                        fields["expires"]
+                    ).timestamp()
+                except (KeyError, TypeError, ValueError):
+                    expires = now
+
+        return {
+            "expires": expires,
+            "etag": fields.get("etag"),
+            "last_modified": fields.get("last-modified"),
+        }
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 # AUTHOR: RaNaN
 
+import json
 import os
 import re
 import time
+import zlib
 
 import pycurl
 
@@ -15,11 +17,16 @@ class WrongFormat(Exception):
 
 
 class ChunkInfo:
+
+    BLOCK_SIZE = 1 << 20  #: size of the blocks covered by a journal checksum
+
     def __init__(self, name):
         self.name = os.fsdecode(name)
         self.size = 0
         self.resume = False
         self.chunks = []
+        self.arrived = []  #: confirmed (synced to disk) bytes of every chunk
+        self.checksums = []  #: crc32 of every complete block of every chunk
 
     def __repr__(self):
         ret = f"ChunkInfo: {self.name}, {self.size}\n"
@@ -31,11 +38,15 @@ class ChunkInfo:
     def set_size(self, size):
         self.size = int(size)
 
-    def add_chunk(self, name, range):
+    def add_chunk(self, name, range, arrived=0, checksums=None):
         self.chunks.append((name, range))
+        self.arrived.append(arrived)
+        self.checksums.append(checksums or [])
 
     def clear(self):
         self.chunks = []
+        self.arrived = []
+        self.checksums = []
 
     def create_chunks(self, chunks):
         self.clear()
@@ -47,15 +58,39 @@ class ChunkInfo:
             self.add_chunk(f"{self.name}.chunk{i}", (current, end))
             current += chunk_size + 1
 
+    def set_arrived(self, index, arrived, checksums=None):
+        """
+        record the confirmed byte offset (and block checksums) of a chunk.
+        """
+        self.arrived[index] = arrived
+        if checksums is not None:
+            self.checksums[index] = list(checksums)
+
     def save(self):
+        """
+        atomically replace the journal file, so a crash leaves either the old
+        or the new checkpoint on disk, never a partial one.
+        """
         fs_name = f"{self.name}.chunks"
-        with open(fs_name, mode="w", encoding="utf-8") as fh:
-            fh.write(f"name:{self.name}\n")
-            fh.write(f"size:{self.size}\n")
-            for i, c in enumerate(self.chunks):
-                fh.write(f"#{i}:\n")
-                fh.write(f"\tname:{c[0]}\n")
-                fh.write(f"\trange:{c[1][0]}-{c[1][1]}\n")
+        tmp_name = f"{fs_name}.tmp"
+        data = {
+            "name": self.name,
+            "size": self.size,
+            "chunks": [
+                {
+                    "name": c[0],
+                    "range": c[1],
+                    "arrived": self.arrived[i],
+                    "checksums": self.checksums[i],
+                }
+                for i, c in enumerate(self.chunks)
+            ],
+        }
+        with open(tmp_name, mode="w", encoding="utf-8") as fh:
+            json.dump(data, fh, separators=(",", ":"))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, fs_name)
 
     @staticmethod
     def load(name):
@@ -63,29 +98,59 @@ class ChunkInfo:
         if not os.path.exists(fs_name):
             raise IOError
         with open(fs_name, encoding="utf-8") as fh:
-            name = fh.readline()[:-1]
-            size = fh.readline()[:-1]
-            if name.startswith("name:") and size.startswith("size:"):
+            if fh.read(1) != "{":
+                fh.seek(0)
+                return ChunkInfo._load_text(fh)
+            fh.seek(0)
+            try:
+                data = json.load(fh)
+            except ValueError:
+                raise WrongFormat
+
+        try:
+            ci = ChunkInfo(data["name"])
+            ci.loaded = True
+            ci.set_size(data["size"])
+            for c in data["chunks"]:
+                ci.add_chunk(
+                    c["name"],
+                    (int(c["range"][0]), int(c["range"][1])),
+                    int(c["arrived"]),
+                    c["checksums"],
+                )
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise WrongFormat
+
+        return ci
+
+    @staticmethod
+    def _load_text(fh):
+        """
+        load the line-oriented format written by older versions.
+        """
+        name = fh.readline()[:-1]
+        size = fh.readline()[:-1]
+        if name.startswith("name:") and size.startswith("size:"):
+            name = name[5:]
+            size = size[5:]
+        else:
+            raise WrongFormat
+        ci = ChunkInfo(name)
+        ci.loaded = True
+        ci.set_size(size)
+        while True:
+            if not fh.readline():  #: skip line
+                break
+            name = fh.readline()[1:-1]
+            range = fh.readline()[1:-1]
+            if name.startswith("name:") and range.startswith("range:"):
                 name = name[5:]
-                size = size[5:]
+                range = range[6:].split("-")
             else:
-                fh.close()
                 raise WrongFormat
-            ci = ChunkInfo(name)
-            ci.loaded = True
-            ci.set_size(size)
-            while True:
-                if not fh.readline():  #: skip line
-                    break
-                name = fh.readline()[1:-1]
-                range = fh.readline()[1:-1]
-                if name.startswith("name:") and range.startswith("range:"):
-                    name = name[5:]
-                    range = range[6:].split("-")
-                else:
-                    raise WrongFormat
 
-                ci.add_chunk(name, (int(range[0]), int(range[1])))
+            #: no confirmed offset known, trust the chunk file size
+            ci.add_chunk(name, (int(range[0]), int(range[1])), None)
 
         return ci
 
@@ -103,17 +168,54 @@ class ChunkInfo:
     def get_chunk_range(self, index):
         return self.chunks[index][1]
 
+    def get_verified_offset(self, index):
+        """
+        returns the offset the chunk can safely be resumed from.
+        """
+        fs_name = self.get_chunk_name(index)
+        try:
+            offset = os.stat(fs_name).st_size
+        except OSError:
+            return 0
+
+        arrived = self.arrived[index]
+        if arrived is None:
+            return offset
+        offset = min(offset, arrived)
+
+        checksums = self.checksums[index]
+        if checksums:
+            with open(fs_name, mode="rb") as fh:
+                for i, crc in enumerate(checksums):
+                    if (i + 1) * self.BLOCK_SIZE > offset:
+                        break
+                    if zlib.crc32(fh.read(self.BLOCK_SIZE)) != crc:
+                        offset = i * self.BLOCK_SIZE
+                        break
+
+        return offset
+
 
 class HTTPChunk(HTTPRequest):
-    def __init__(self, id, parent, range=None, resume=False):
+    def __init__(self, id, parent, range=None, resume=False, url=None, interface=None):
         self.id = id
         self.p = parent  #: HTTPDownload instance
         self.range = range  #: tuple (start, end)
         self.resume = resume
         self.log = parent.log
+        self.url = url or parent.url  #: source this chunk is loaded from
+        #: network interface this chunk is bound to
+        self.interface = interface or parent.options.get("interface")
+
+        self.remote_size = None  #: total size reported by content-range
+        self.etag = None
+        self.status = None  #: http status of the response
+        self.source_checked = False
+        self.source_failed = False  #: the source sent inconsistent data
 
         self.size = range[1] - range[0] if range else -1
         self.arrived = 0
+        self.synced = 0  #: bytes known to be synced to disk
         self.last_url = self.p.referer
 
         self.c = pycurl.Curl()
@@ -123,8 +225,16 @@ class HTTPChunk(HTTPRequest):
 
         self.fp = None  #: file handle
 
+        self.checksums = []  #: crc32 of every complete block written
+        self.block_crc = 0
+        self.block_filled = 0
+
+        self.hasher = None  #: ChunkHasher of the download checksums
+        self.transform = None  #: turns the data received into the data written
+
         self.init_handle()
-        self.set_interface(self.p.options)
+        #: chunks need their own connections, never multiplex them
+        self.set_interface(dict(self.p.options, interface=self.interface, http2=False))
 
         self.BOMChecked = False  #: check and remove byte order mark
 
@@ -145,7 +255,7 @@ class HTTPChunk(HTTPRequest):
         returns a Curl handle ready to use for perform/multiperform.
         """
         self.set_request_context(
-            self.p.url, self.p.get, self.p.post, self.p.referer, self.p.cj
+            self.url, self.p.get, self.p.post, self.p.referer, self.p.cj
         )
         self.c.setopt(pycurl.WRITEFUNCTION, self.write_body)
         self.c.setopt(pycurl.HEADERFUNCTION, self.write_header)
@@ -155,10 +265,14 @@ class HTTPChunk(HTTPRequest):
 
         fs_name = self.p.info.get_chunk_name(self.id)
         if self.resume:
-            self.fp = open(fs_name, mode="ab")
-            self.arrived = self.fp.tell()
-            if not self.arrived:
-                self.arrived = os.stat(fs_name).st_size
+            # drop everything behind the last verified checkpoint
+            self.arrived = self.p.info.get_verified_offset(self.id)
+            self.fp = open(fs_name, mode="ab", buffering=self.p.write_buffer)
+            self.fp.truncate(self.arrived)
+            self.synced = self.arrived
+            self.init_checksums()
+            self.hasher = self.p.init_hasher(self)
+            self.transform = self.p.init_transform(self)
 
             if self.range:
                 # do nothing if chunk already finished
@@ -194,7 +308,9 @@ class HTTPChunk(HTTPRequest):
                 self.log.debug(f"Chunked with range {range}")
                 self.c.setopt(pycurl.RANGE, range)
 
-            self.fp = open(fs_name, mode="wb")
+            self.fp = open(fs_name, mode="wb", buffering=self.p.write_buffer)
+            self.hasher = self.p.init_hasher(self)
+            self.transform = self.p.init_transform(self)
 
         return self.c
 
@@ -204,6 +320,8 @@ class HTTPChunk(HTTPRequest):
         # as first chunk, we will parse the headers
         if not self.range and self.header.endswith(b"\r\n\r\n"):
             self.parse_header()
+        elif self.range and self.header.endswith(b"\r\n\r\n"):
+            self.parse_range_header()
         # ftp file size parsing
         elif not self.range and buf.startswith(b"150") and b"data connection" in buf:
             size = re.search(rb"(\d+) bytes", buf)
@@ -214,9 +332,18 @@ class HTTPChunk(HTTPRequest):
         self.header_parsed = True
 
     def write_body(self, buf):
+        if not self.source_checked:
+            self.source_checked = True
+            if not self.p.check_source(self):
+                self.source_failed = True
+                return 0  #: drop the response, the chunk will be reassigned
+
+        if self.transform:
+            buf = self.transform(buf)
+
         # ignore BOM, it confuses unrar
         if not self.BOMChecked:
-            if [ord(b) for b in buf[:3]] == [239, 187, 191]:
+            if buf[:3] == b"\xef\xbb\xbf":
                 buf = buf[3:]
             self.BOMChecked = True
 
@@ -226,6 +353,12 @@ class HTTPChunk(HTTPRequest):
 
         self.fp.write(buf)
 
+        if self.hasher:
+            self.hasher.update(buf, self.p.hash_limit(self))
+
+        if self.p.checkpoint_checksum:
+            self.update_checksums(buf)
+
         if self.p.bucket:
             time.sleep(self.p.bucket.consumed(size))
         else:
@@ -263,8 +396,28 @@ class HTTPChunk(HTTPRequest):
             if not self.resume and line.startswith("content-length"):
                 self.p.size = int(line.split(":")[1])
 
+            if line.startswith("etag"):
+                self.p.etag = orgline.partition(":")[2].strip()
+
         self.header_parsed = True
 
+    def parse_range_header(self):
+        """
+        parse the data needed to check the source of a ranged chunk.
+        """
+        for line in self.header.decode("iso-8859-1").splitlines():
+            name, sep, value = line.partition(":")
+            name = name.strip().lower()
+            if line.startswith("HTTP/"):
+                m = re.match(r"HTTP/\S+\s+(\d+)", line)
+                self.status = int(m.group(1)) if m else None
+                self.remote_size = self.etag = None  #: new response (redirect)
+            elif name == "content-range" and "/" in value:
+                size = value.rpartition("/")[2].strip()
+                self.remote_size = int(size) if size.isdigit() else None
+            elif name == "etag":
+                self.etag = value.strip()
+
     def stop(self):
         """
         The download will not proceed after next call of write_body.
@@ -282,13 +435,81 @@ class HTTPChunk(HTTPRequest):
         self.range = range
         self.size = range[1] - range[0]
 
+    def init_checksums(self):
+        """
+        restore the block checksums of the data kept on resume.
+        """
+        if not self.p.checkpoint_checksum:
+            return
+
+        block_size = self.p.info.BLOCK_SIZE
+        blocks = self.arrived // block_size
+        self.checksums = self.p.info.checksums[self.id][:blocks]
+        self.block_crc = 0
+        self.block_filled = self.arrived % block_size
+
+        if len(self.checksums) < blocks:  #: journal without checksums
+            self.checksums = []
+            self.p.info.checksums[self.id] = []
+            self.p.checkpoint_checksum = False
+            return
+
+        if self.block_filled:
+            with open(self.p.info.get_chunk_name(self.id), mode="rb") as fh:
+                fh.seek(blocks * block_size)
+                self.block_crc = zlib.crc32(fh.read(self.block_filled))
+
+    def update_checksums(self, buf):
+        block_size = self.p.info.BLOCK_SIZE
+        view = memoryview(buf)
+        while view:
+            n = min(len(view), block_size - self.block_filled)
+            self.block_crc = zlib.crc32(view[:n], self.block_crc)
+            self.block_filled += n
+            view = view[n:]
+            if self.block_filled == block_size:
+                self.checksums.append(self.block_crc)
+                self.block_crc = 0
+                self.block_filled = 0
+
+    def sync_file(self, force=False):
+        """
+        flush the write buffer, syncs it to disk if forced or the sync policy
+        is periodic, returns the byte offset synced to disk, the only one safe
+        to journal.
+        """
+        self.fp.flush()
+        if force or self.p.sync_policy == "periodic":
+            self._fsync()
+        return self.synced
+
+    def _fsync(self):
+        os.fsync(self.fp.fileno())
+        self.synced = self.arrived
+        self.drop_cache()  #: dirty pages can't be dropped, only synced ones
+
+    def drop_cache(self):
+        """
+        advise the kernel to evict the already written data from page cache.
+        """
+        if self.p.drop_cache and hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(self.fp.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
     def flush_file(self):
         """
-        flush and close file.
+        flush and close file, returns the byte offset to journal, the one synced
+        to disk unless the sync policy is none.
         """
+        if self.fp.closed:
+            return self.synced
+
         self.fp.flush()
-        os.fsync(self.fp.fileno())  #: make sure everything was written to disk
+        if self.p.sync_policy != "none":
+            self._fsync()  #: make sure everything was written to disk
+        else:
+            self.synced = self.arrived  #: no sync wanted, trust the page cache
         self.fp.close()  #: needs to be closed, or merging chunks will fail
+        return self.synced
 
     def close(self):
         """
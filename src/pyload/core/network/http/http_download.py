@@ -5,12 +5,14 @@ import os
 import shutil
 import time
 from logging import getLogger
+from urllib.parse import urlparse
 
 import pycurl
 from pyload import APPID
 
 from ..exceptions import Abort
 from .http_chunk import ChunkInfo, HTTPChunk
+from .http_hasher import HASH_ALGORITHMS, ChunkHasher
 from .http_request import BadHeader
 
 
@@ -31,8 +33,15 @@ class HTTPDownload:
         options={},
         progress_notify=None,
         disposition=False,
+        mirrors=(),
+        hashes=(),
+        transform=None,
     ):
         self.url = url
+        #: equivalent urls of the same file, byte ranges are spread across them
+        self.sources = [url] + [x for x in mirrors if x != url]
+        self.failed_sources = set()
+        self.source_speeds = {}
         self.filename = filename  #: complete file destination, not only name
         self.get = get
         self.post = post
@@ -45,7 +54,30 @@ class HTTPDownload:
 
         self.abort = False
         self.size = 0
+
+        #: seconds between two resume checkpoints, disabled if not positive
+        self.checkpoint_interval = options.get("checkpoint_interval", 5)
+        self.checkpoint_checksum = options.get("checkpoint_checksum", False)
+
+        #: size of the write buffer of every chunk file
+        self.write_buffer = options.get("write_buffer", 1 << 20)
+        #: when chunk files are synced to disk, one of none, end or periodic
+        self.sync_policy = options.get("sync_policy", "periodic")
+        self.drop_cache = options.get("drop_cache", False)
+        #: InterfaceBalancer fed with the chunk speeds
+        self.balancer = options.get("balancer")
+
         self.name_disposition = None  #: will be parsed from content disposition
+        self.etag = None
+
+        #: hash algorithms computed while the file is written
+        self.hash_algorithms = [x for x in hashes if x in HASH_ALGORITHMS]
+        self.hashers = {}  #: chunk id -> ChunkHasher
+        self.digests = {}  #: algorithm -> hex digest of the complete file
+
+        #: returns the function turning the data received from a file offset on
+        #: into the data written, like a decryption
+        self.transform = transform
 
         self.chunks = []
 
@@ -86,14 +118,21 @@ class HTTPDownload:
 
     def _copy_chunks(self):
         init = self.info.get_chunk_name(0)  #: initial chunk name
+        count = self.info.get_count()
+        hashers = self.get_hashers()
 
-        if self.info.get_count() > 1:
+        if count > 1:
             with open(init, mode="rb+") as fo:  #: first chunkfile
-                for i in range(1, self.info.get_count()):
+                for i in range(1, count):
                     # input file
                     # seek to beginning of chunk, to get rid of overlapping chunks
                     fo.seek(self.info.get_chunk_range(i - 1)[1] + 1)
                     fname = f"{self.filename}.chunk{i}"
+                    #: the sequential hashes are fed with the data of chunk i
+                    sequential = ChunkHasher(()) if hashers else None
+                    if sequential:
+                        sequential.hashes = hashers[0].hashes
+                    limit = self.hash_limit(i)
                     with open(fname, mode="rb") as fi:
                         buf = 32 << 10
                         while True:  #: copy in chunks, consumes less memory
@@ -101,6 +140,8 @@ class HTTPDownload:
                             if not data:
                                 break
                             fo.write(data)
+                            if sequential:
+                                sequential.update(data, limit)
                     if fo.tell() < self.info.get_chunk_range(i)[1]:
                         fo.close()
                         os.remove(init)
@@ -108,8 +149,13 @@ class HTTPDownload:
                         raise Exception(
                             "Downloaded content was smaller than expected. Try to reduce download connections."
                         )
+                    if sequential and sequential.length != hashers[i].length:
+                        hashers = None
                     os.remove(fname)  #: os.remove chunk
 
+        if hashers:
+            self.digests = ChunkHasher.digests(hashers)
+
         if self.name_disposition and self.disposition:
             self.filename = os.path.join(
                 os.path.dirname(self.filename), self.name_disposition
@@ -162,9 +208,12 @@ class HTTPDownload:
 
         self.chunks.append(init)
         self.m.add_handle(init.get_handle())
+        if self.balancer:
+            self.balancer.acquire(init, init.interface)
 
         last_finish_check = 0
         last_time_check = 0
+        last_checkpoint = time.time()
         chunks_done = set()  #: list of curl handles that are finished
         chunks_created = False
         done = False
@@ -181,7 +230,7 @@ class HTTPDownload:
 
                 if not resume:
                     self.info.set_size(self.size)
-                    self.info.create_chunks(chunks)
+                    self.info.create_chunks(max(chunks, len(self.sources)))
                     self.info.save()
 
                 chunks = self.info.get_count()
@@ -189,12 +238,21 @@ class HTTPDownload:
                 init.set_range(self.info.get_chunk_range(0))
 
                 for i in range(1, chunks):
-                    c = HTTPChunk(i, self, self.info.get_chunk_range(i), resume)
+                    c = HTTPChunk(
+                        i,
+                        self,
+                        self.info.get_chunk_range(i),
+                        resume,
+                        self.sources[i % len(self.sources)],
+                        self.chunk_interface(),
+                    )
 
                     handle = c.get_handle()
                     if handle:
                         self.chunks.append(c)
                         self.m.add_handle(handle)
+                        if self.balancer:
+                            self.balancer.acquire(c, c.interface)
                     else:
                         # close immediatly
                         self.log.debug("Invalid curl handle -> closed")
@@ -226,15 +284,22 @@ class HTTPDownload:
                         ex = exc
                     else:
                         chunks_done.add(c)
+                        self.finish_chunk(chunk)
 
                 for c in err_list:
                     curl, errno, msg = c
                     chunk = self.find_chunk(curl)
-                    # test if chunk was finished
-                    if errno != 23 or "0 !=" not in msg:
+                    # test if chunk was finished (newer libcurl words it differently)
+                    if (
+                        chunk.source_failed
+                        or errno != 23
+                        or ("0 !=" not in msg and "returned 0" not in msg)
+                    ):
                         failed.append(chunk)
                         ex = pycurl.error(errno, msg)
                         self.log.debug(f"Chunk {chunk.id + 1} failed: {ex}")
+                        if self.balancer and not chunk.source_failed:
+                            self.balancer.release(chunk, error=True)
                         continue
 
                     try:  #: check if the header implies success, else add it to failed list
@@ -245,8 +310,14 @@ class HTTPDownload:
                         ex = exc
                     else:
                         chunks_done.add(curl)
+                        self.finish_chunk(chunk)
                 if not num_q:  #: no more infos to get
 
+                    # try to load failed chunks from another source first
+                    failed = [
+                        x for x in failed if x is init or not self.reassign_chunk(x)
+                    ]
+
                     # check if init is not finished so we reset download connections
                     # note that other chunks are closed and downloaded with init too
                     if failed and init not in failed and init.c not in chunks_done:
@@ -295,10 +366,26 @@ class HTTPDownload:
                 self.last_speeds[0] = self.speeds
                 self.speeds = [float(a) / (t - last_time_check) for a in diff]
                 self.last_arrived = [c.arrived for c in self.chunks]
+
+                self.source_speeds = {}
+                for c, speed in zip(self.chunks, self.speeds):
+                    self.source_speeds[c.url] = self.source_speeds.get(c.url, 0) + speed
+                    if self.balancer:
+                        self.balancer.sample(c, speed)
                 last_time_check = t
                 self.update_progress()
 
+            if (
+                chunks_created
+                and self.checkpoint_interval > 0
+                and last_checkpoint + self.checkpoint_interval < t
+            ):
+                self.checkpoint()
+                last_checkpoint = t
+
             if self.abort:
+                if chunks_created:
+                    self.checkpoint(sync=True)  #: keep what was loaded so far
                 raise Abort
 
             # time.sleep(0.003) #supress busy waiting - limits dl speed to  (1 / x) *
@@ -310,6 +397,171 @@ class HTTPDownload:
 
         self._copy_chunks()
 
+    def check_source(self, chunk):
+        """
+        check that a chunk loaded from a mirror gets the same file.
+
+        Sizes are always compared, etags only between sources on the same host,
+        since they are not comparable across servers.
+        """
+        if chunk.url == self.url or chunk.range is None:
+            return True
+
+        if chunk.status is not None and chunk.status != 206:
+            reason = f"no partial content ({chunk.status})"
+        elif chunk.remote_size is not None and chunk.remote_size != self.size:
+            reason = f"size mismatch ({chunk.remote_size} != {self.size})"
+        elif (
+            chunk.etag
+            and self.etag
+            and chunk.etag != self.etag
+            and urlparse(chunk.url).netloc == urlparse(self.url).netloc
+        ):
+            reason = f"etag mismatch ({chunk.etag} != {self.etag})"
+        else:
+            return True
+
+        self.log.warning(f"Source {chunk.url} rejected: {reason}")
+        return False
+
+    def reassign_chunk(self, chunk):
+        """
+        restart a failed chunk from its current position using the fastest
+        other source, returns False if there is none.
+        """
+        if chunk.range is None or len(self.sources) < 2:
+            return False
+
+        self.failed_sources.add(chunk.url)
+        sources = [x for x in self.sources if x not in self.failed_sources]
+        if not sources:
+            return False
+
+        url = max(sources, key=lambda x: self.source_speeds.get(x, 0))
+        self.log.debug(
+            f"Chunk {chunk.id + 1} failed on {chunk.url}, reassigned to {url}"
+        )
+
+        self.info.set_arrived(
+            chunk.id,
+            chunk.sync_file(),
+            chunk.checksums if self.checkpoint_checksum else [],
+        )
+
+        index = self.chunks.index(chunk)
+        self.close_chunk(chunk)
+
+        c = HTTPChunk(chunk.id, self, chunk.range, True, url, self.chunk_interface())
+        handle = c.get_handle()
+        if handle:
+            self.chunks[index] = c
+            self.m.add_handle(handle)
+            if self.balancer:
+                self.balancer.acquire(c, c.interface)
+        else:
+            del self.chunks[index]
+            c.close()
+
+        return True
+
+    def init_hasher(self, chunk):
+        """
+        returns the hasher of a chunk, positioned at the bytes it has arrived.
+
+        The hasher of a reassigned chunk is kept, otherwise the data kept on
+        resume is read and hashed again.
+        """
+        if not self.hash_algorithms:
+            return None
+
+        hasher = self.hashers.get(chunk.id)
+        if hasher is not None and hasher.offset == chunk.arrived:
+            return hasher
+
+        hasher = self.hashers[chunk.id] = ChunkHasher(
+            self.hash_algorithms, chunk.id == 0
+        )
+        if chunk.arrived:
+            with open(self.info.get_chunk_name(chunk.id), mode="rb") as fh:
+                hasher.update_from(fh, chunk.arrived, self.hash_limit(chunk))
+        return hasher
+
+    def init_transform(self, chunk):
+        """
+        returns the function transforming the data of a chunk before it is
+        written, positioned at the bytes it has arrived.
+        """
+        if self.transform is None:
+            return None
+        return self.transform((chunk.range[0] if chunk.range else 0) + chunk.arrived)
+
+    def hash_limit(self, chunk):
+        """
+        returns the size of the data of a chunk (or chunk id) that ends up in the
+        file, None for the last one.
+        """
+        index = chunk if isinstance(chunk, int) else chunk.id
+        if index == self.info.get_count() - 1:
+            return None
+        start, end = self.info.get_chunk_range(index)
+        return end - start + 1
+
+    def get_hashers(self):
+        """
+        returns the hashers of all chunks, or None if they did not see the
+        whole data of their chunk.
+        """
+        hashers = [self.hashers.get(i) for i in range(self.info.get_count())]
+        if not hashers or None in hashers:
+            return None
+
+        for i, hasher in enumerate(hashers):
+            limit = self.hash_limit(i)
+            if limit is None:
+                fs_name = self.info.get_chunk_name(i)
+                limit = os.path.getsize(fs_name) if os.path.exists(fs_name) else -1
+            if hasher.length != limit:
+                self.log.debug(f"Chunk {i + 1} not completely hashed")
+                return None
+
+        return hashers
+
+    def chunk_interface(self):
+        """
+        returns the interface for a new chunk, None for the one of the download.
+        """
+        if self.balancer and self.balancer.spread_chunks:
+            return self.balancer.get()
+        return None
+
+    def finish_chunk(self, chunk):
+        """
+        sync and close the file of a finished chunk, journal its final offset.
+        """
+        self.info.set_arrived(
+            chunk.id,
+            chunk.flush_file(),
+            chunk.checksums if self.checkpoint_checksum else [],
+        )
+        if self.info.get_count() > 1:
+            self.info.save()
+
+    def checkpoint(self, sync=False):
+        """
+        sync all chunk files (as the sync policy says, or anyway if `sync`) and
+        journal their offsets synced to disk.
+        """
+        for chunk in self.chunks:
+            #: closed chunks journaled their final offset when closed
+            if not chunk.fp or chunk.fp.closed:
+                continue
+            self.info.set_arrived(
+                chunk.id,
+                chunk.sync_file(sync),
+                chunk.checksums if self.checkpoint_checksum else [],
+            )
+        self.info.save()
+
     def update_progress(self):
         if self.progress_notify:
             self.progress_notify(self.percent)
@@ -328,6 +580,8 @@ class HTTPDownload:
         except pycurl.error as exc:
             self.log.debug(f"Error removing chunk: {exc}")
         finally:
+            if self.balancer:
+                self.balancer.release(chunk)
             chunk.close()
 
     def close(self):
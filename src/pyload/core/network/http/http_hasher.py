@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import zlib
+
+#: checksums that can be computed per chunk and combined afterwards
+COMBINABLE = {"adler32": zlib.adler32, "crc32": zlib.crc32}
+
+HASH_ALGORITHMS = sorted(hashlib.algorithms_guaranteed) + sorted(COMBINABLE)
+
+
+def _gf2_times(mat, vec):
+    result = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            result ^= mat[i]
+        vec >>= 1
+        i += 1
+    return result
+
+
+def _gf2_square(mat):
+    return [_gf2_times(mat, x) for x in mat]
+
+
+def crc32_combine(crc1, crc2, len2):
+    """
+    returns the crc32 of two blocks from their crc32s and the length of the
+    second one, like zlib's crc32_combine.
+    """
+    if len2 <= 0:
+        return crc1
+
+    #: operator for one zero bit, then for two and four zero bits
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = _gf2_square(odd)
+    odd = _gf2_square(even)
+
+    #: apply len2 zero bytes to crc1, squaring the operator for every bit
+    while True:
+        even = _gf2_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+
+        odd = _gf2_square(even)
+        if len2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+
+    return crc1 ^ crc2
+
+
+def adler32_combine(adler1, adler2, len2):
+    """
+    returns the adler32 of two blocks from their adler32s and the length of
+    the second one, like zlib's adler32_combine.
+    """
+    base = 65521
+    rem = len2 % base
+    sum1 = adler1 & 0xFFFF
+    sum2 = (rem * sum1) % base
+    sum1 += (adler2 & 0xFFFF) + base - 1
+    sum2 += ((adler1 >> 16) & 0xFFFF) + ((adler2 >> 16) & 0xFFFF) + base - rem
+    if sum1 >= base:
+        sum1 -= base
+    if sum1 >= base:
+        sum1 -= base
+    if sum2 >= base << 1:
+        sum2 -= base << 1
+    if sum2 >= base:
+        sum2 -= base
+    return sum1 | (sum2 << 16)
+
+
+COMBINE = {"adler32": adler32_combine, "crc32": crc32_combine}
+
+
+class ChunkHasher:
+    """
+    Hashes the data of a chunk while it is written.
+
+    Combinable checksums (crc32, adler32) are computed for every chunk and
+    combined when the download is complete. The other hashes can only be fed
+    in order, so just the first chunk (`sequential`) computes them, the data
+    of the following chunks is added while they are merged into it.
+    """
+
+    def __init__(self, algorithms, sequential=False):
+        self.offset = 0  #: bytes of the chunk passed so far
+        self.length = 0  #: bytes hashed, the chunk data up to its limit
+        self.sums = {x: COMBINABLE[x](b"") for x in algorithms if x in COMBINABLE}
+        self.hashes = {
+            x: hashlib.new(x) for x in algorithms if sequential and x not in COMBINABLE
+        }
+
+    def update(self, data, limit=None):
+        """
+        hash the next bytes of the chunk, the ones past `limit` (belonging to the
+        next chunk) are skipped.
+        """
+        size = len(data)
+        if limit is not None and self.offset + size > limit:
+            data = memoryview(data)[: max(0, limit - self.offset)]
+        self.offset += size
+
+        if data:
+            for name, value in self.sums.items():
+                self.sums[name] = COMBINABLE[name](data, value)
+            for h in self.hashes.values():
+                h.update(data)
+            self.length += len(data)
+
+    def update_from(self, fh, size, limit=None, bufsize=1 << 20):
+        """
+        hash the first `size` bytes read from the file object `fh`.
+        """
+        while size > 0:
+            data = fh.read(min(bufsize, size))
+            if not data:
+                break
+            self.update(data, limit)
+            size -= len(data)
+
+    @staticmethod
+    def digests(hashers):
+        """
+        returns the hex digests of a file from the hashers of its chunks, the
+        first one with the sequential hashes.
+        """
+        first = hashers[0]
+        result = {name: h.hexdigest() for name, h in first.hashes.items()}
+        for name, value in first.sums.items():
+            for hasher in hashers[1:]:
+                value = COMBINE[name](value, hasher.sums[name], hasher.length)
+            result[name] = "{:x}".format(value & 0xFFFFFFFF)
+        return result
@@ -3,6 +3,8 @@
 
 import codecs
 import io
+import tempfile
+import time
 from http.client import responses
 from itertools import chain
 from logging import getLogger
@@ -13,6 +15,7 @@ from pyload import APPID
 
 from ..exceptions import Abort
 from .exceptions import BadHeader
+from .http_cache import HTTPCache
 
 
 def myquote(url):
@@ -43,9 +46,15 @@ BAD_STATUS_CODES = tuple(
 
 
 class HTTPRequest:
-    def __init__(self, cookies=None, options=None):
+
+    SPOOL_SIZE = 1 << 20  #: streamed responses bigger than this are spilled to disk
+
+    def __init__(self, cookies=None, options=None, limit=1_000_000, cache=None):
         self.c = pycurl.Curl()
         self.rep = None
+        self.limit = limit  #: max size of a loaded page, unlimited if not set
+        self.stream = False
+        self.cache = cache  #: HTTPCache used by loads requesting it
 
         self.cj = cookies  #: cookiejar
 
@@ -150,6 +159,12 @@ class HTTPRequest:
         if "timeout" in options:
             self.c.setopt(pycurl.LOW_SPEED_TIME, int(options["timeout"]))
 
+        if options.get("http2"):
+            #: negotiated by alpn, streams are multiplexed on a multi handle
+            self.c.setopt(pycurl.HTTP_VERSION, pycurl.CURL_HTTP_VERSION_2TLS)
+        else:
+            self.c.setopt(pycurl.HTTP_VERSION, pycurl.CURL_HTTP_VERSION_1_1)
+
     def add_cookies(self):
         """
         put cookies from curl handle to cj.
@@ -169,11 +184,17 @@ class HTTPRequest:
     def clear_cookies(self):
         self.c.setopt(pycurl.COOKIELIST, "")
 
-    def set_request_context(self, url, get, post, referer, cookies, multipart=False):
+    def set_request_context(
+        self, url, get, post, referer, cookies, multipart=False, stream=False
+    ):
         """
         sets everything needed for the request.
         """
-        self.rep = io.BytesIO()
+        self.stream = stream
+        if stream:
+            self.rep = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_SIZE)
+        else:
+            self.rep = io.BytesIO()
 
         url = myquote(url)
 
@@ -222,11 +243,53 @@ class HTTPRequest:
         decode=False,
         follow_location=True,
         save_cookies=True,
+        stream=False,
+        cache=None,
     ):
         """
         load and returns a given page.
+
+        With `stream` the response is not size limited and is returned as a
+        binary file object (spilled to disk when big), the caller has to close it.
+
+        With `cache` a GET response is served from (and stored in) the http cache,
+        set it to a ttl in seconds or to True to follow the server cache headers.
+        """
+        if cache and self.cache and not (post or just_header or stream):
+            return self._load_cached(
+                url, get, referer, cookies, decode, follow_location, save_cookies, cache
+            )
+
+        self.prepare_load(
+            url,
+            get,
+            post,
+            referer,
+            cookies,
+            just_header,
+            multipart,
+            follow_location,
+            stream,
+        )
+        self.c.perform()
+        return self.finish_load(just_header, decode, follow_location, save_cookies)
+
+    def prepare_load(
+        self,
+        url,
+        get={},
+        post={},
+        referer=True,
+        cookies=True,
+        just_header=False,
+        multipart=False,
+        follow_location=True,
+        stream=False,
+    ):
         """
-        self.set_request_context(url, get, post, referer, cookies, multipart)
+        set up the curl handle for a `load`, to be performed by the caller.
+        """
+        self.set_request_context(url, get, post, referer, cookies, multipart, stream)
 
         self.header = bytes()
 
@@ -243,8 +306,17 @@ class HTTPRequest:
         if just_header:
             self.c.setopt(pycurl.NOBODY, 1)
 
-        self.c.perform()
-        rep = self.header if just_header else self.get_response()
+    def finish_load(
+        self, just_header=False, decode=False, follow_location=True, save_cookies=True
+    ):
+        """
+        returns the result of a `load` performed on the curl handle.
+        """
+        stream = self.stream
+        if just_header:
+            rep = self.header
+        elif not stream:
+            rep = self.get_response()
 
         if not follow_location:
             self.c.setopt(pycurl.FOLLOWLOCATION, 1)
@@ -261,15 +333,80 @@ class HTTPRequest:
         try:
             self.code = self.verify_header()
 
+            if stream and not just_header:
+                rep, self.rep = self.rep, None
+                rep.seek(0)
+                return rep
+
         finally:
-            self.rep.close()
-            self.rep = None
+            self.stream = False
+            if self.rep is not None:
+                self.rep.close()
+                self.rep = None
 
         if decode:
             rep = self.decode_response(rep)
 
         return rep
 
+    def _load_cached(
+        self, url, get, referer, cookies, decode, follow_location, save_cookies, ttl
+    ):
+        key = self.cache.key(f"{url}?{urlencode(get)}" if get else url, self.cj)
+        entry = self.cache.get(key)
+
+        if entry:
+            meta, body = entry
+            if meta["expires"] > time.time():
+                self.header = meta["header"].encode("iso-8859-1")
+                self.code = meta["code"]
+                self.last_effective_url = meta["url"]
+                return self.decode_response(body) if decode else body
+
+        headers = self.headers
+        if entry:
+            self.headers = list(headers)
+            if meta["etag"]:
+                self.headers.append(f"If-None-Match: {meta['etag']}")
+            if meta["last_modified"]:
+                self.headers.append(f"If-Modified-Since: {meta['last_modified']}")
+
+        try:
+            rep = self.load(
+                url,
+                get,
+                referer=referer,
+                cookies=cookies,
+                follow_location=follow_location,
+                save_cookies=save_cookies,
+            )
+        finally:
+            self.headers = headers
+
+        info = HTTPCache.parse_header(self.header, ttl)
+
+        if entry and self.code == 304:
+            rep = body
+            self.header = meta["header"].encode("iso-8859-1")
+            self.code = meta["code"]
+            if info:
+                meta.update(info)
+                self.cache.refresh(key, meta)
+
+        elif (
+            self.code == 200
+            and info
+            and (info["expires"] > time.time() or info["etag"] or info["last_modified"])
+        ):
+            info.update(
+                header=self.header.decode("iso-8859-1"),
+                code=self.code,
+                url=self.last_effective_url,
+            )
+            self.cache.set(key, info, rep)
+
+        return self.decode_response(rep) if decode else rep
+
     def verify_header(self):
         """
         raise an exceptions on bad headers.
@@ -292,6 +429,12 @@ class HTTPRequest:
         """
         if self.rep is None:
             return ""
+        elif self.stream:
+            self.rep.seek(0)
+            value = self.rep.read()
+            self.rep.close()
+            self.rep = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_SIZE)
+            return value
         else:
             value = self.rep.getvalue()
             self.rep.close()
@@ -302,7 +445,7 @@ class HTTPRequest:
         """
         decode with correct encoding, relies on header.
         """
-        header = self.header.splitlines()
+        header = self.header.decode("iso-8859-1").splitlines()
         encoding = "utf-8"  #: default encoding
 
         for line in header:
@@ -342,10 +485,11 @@ class HTTPRequest:
         """
         writes response.
         """
-        if self.rep.tell() > 1_000_000 or self.abort:
+        if self.abort:
+            raise Abort
+
+        if self.limit and not self.stream and self.rep.tell() > self.limit:
             rep = self.get_response()
-            if self.abort:
-                raise Abort
             with open("response.dump", mode="wb") as fp:
                 fp.write(rep)
             raise Exception("Loaded Url exceeded limit")
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import time
+from threading import Lock
+
+from ..utils.old import lock
+
+
+class InterfaceBalancer:
+    """
+    Spreads downloads over several network interfaces by their load.
+
+    Downloads report the speed of their connections per interface. The load
+    of an interface is its current throughput relative to the best one seen
+    on it, plus connections not transferring yet and recent errors. New
+    requests (and chunks, if `spread_chunks` is set) get the least loaded
+    interface, ties go to the one the plugin used least recently.
+    """
+
+    PENDING_LOAD = 0.5  #: load of a connection not transferring yet
+    ERROR_LOAD = 0.25  #: load of a recent error
+    ERROR_TIME = 60  #: seconds an error counts
+    PEAK_DECAY = 0.999  #: per sample, lets the peak follow a slower uplink
+
+    def __init__(self):
+        self.lock = Lock()
+        self.interfaces = {}  #: address -> interface state
+        self.owners = {}  #: connection -> address
+        self.spread_chunks = False
+
+    def __bool__(self):
+        return bool(self.interfaces)
+
+    @lock
+    def set_interfaces(self, addresses, spread_chunks=False):
+        self.interfaces = {
+            x: self.interfaces.get(x)
+            or {"speeds": {}, "peak": 0, "errors": [], "history": {}}
+            for x in addresses
+        }
+        self.owners = {k: v for k, v in self.owners.items() if v in self.interfaces}
+        self.spread_chunks = spread_chunks
+
+    def _load(self, state, now):
+        speeds = state["speeds"].values()
+        speed = sum(x for x in speeds if x)
+        pending = sum(1 for x in speeds if not x)
+        state["errors"] = [x for x in state["errors"] if x + self.ERROR_TIME > now]
+
+        load = speed / state["peak"] if state["peak"] else 0
+        return (
+            load + pending * self.PENDING_LOAD + len(state["errors"]) * self.ERROR_LOAD
+        )
+
+    @lock
+    def get(self, plugin=None, account=None):
+        """
+        returns the address of the least loaded interface or None.
+        """
+        if not self.interfaces:
+            return None
+
+        now = time.time()
+        address, state = min(
+            self.interfaces.items(),
+            key=lambda x: (
+                self._load(x[1], now),
+                len(x[1]["speeds"]),
+                x[1]["history"].get((plugin, account), 0),
+            ),
+        )
+        state["history"][(plugin, account)] = now
+        return address
+
+    @lock
+    def acquire(self, owner, address):
+        """
+        count connection `owner` on the interface `address`.
+        """
+        state = self.interfaces.get(address)
+        if state is None:
+            return
+        state["speeds"][owner] = None
+        self.owners[owner] = address
+
+    @lock
+    def sample(self, owner, speed):
+        state = self.interfaces.get(self.owners.get(owner))
+        if state is None:
+            return
+        state["speeds"][owner] = speed
+        total = sum(x for x in state["speeds"].values() if x)
+        state["peak"] = max(total, state["peak"] * self.PEAK_DECAY)
+
+    @lock
+    def release(self, owner, error=False):
+        state = self.interfaces.get(self.owners.pop(owner, None))
+        if state is None:
+            return
+        state["speeds"].pop(owner, None)
+        if error:
+            state["errors"].append(time.time())
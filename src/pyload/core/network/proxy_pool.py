@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import pycurl
+
+from ..utils.old import lock
+from .http.http_request import HTTPRequest
+
+
+class ProxyPool:
+    """
+    Pool of proxies handed out to the requests of free downloads.
+
+    Proxies are read from the pool file, one `[type://][user:password@]host:port`
+    per line, and checked periodically for health and latency. Every request
+    gets the least used healthy proxy (sticky per plugin with the `plugin`
+    rotation) and reports connection failures back, which lower its rank.
+    """
+
+    FAILURE_LIMIT = 3  #: consecutive failures marking a proxy unhealthy
+    CHECK_WORKERS = 8
+    CHECK_TIMEOUT = 15
+
+    _RE_PROXY = re.compile(
+        r"^(?:(?P<type>https?|socks4a?|socks5h?)://)?"
+        r"(?:(?P<username>[^:@\s]+)(?::(?P<password>[^@\s]*))?@)?"
+        r"(?P<host>[^:@/\s]+):(?P<port>\d+)/?$"
+    )
+
+    def __init__(self, core):
+        self.pyload = core
+        self._ = core._
+        self.lock = Lock()
+
+        self.proxies = {}  #: url -> proxy state
+        self.plugins = {}  #: plugin name -> url, for the `plugin` rotation
+        self.mtime = None
+        self.checking = False
+
+        self.load()
+
+    def __bool__(self):
+        #: even while empty, so `get` keeps reloading the pool file
+        return bool(self.pyload.config.get("proxy", "pool"))
+
+    @classmethod
+    def parse(cls, line):
+        """
+        returns the proxy option dict of a pool file line or None.
+        """
+        m = cls._RE_PROXY.match(line.strip())
+        if m is None:
+            return None
+
+        type = (m.group("type") or "http").lower()
+        if type.startswith("socks4"):
+            type = "socks4"
+        elif type.startswith("socks5"):
+            type = "socks5"
+        else:
+            type = "http"
+
+        return {
+            "type": type,
+            "host": m.group("host"),
+            "port": int(m.group("port")),
+            "username": m.group("username"),
+            "password": m.group("password"),
+            "url": "{}://{}:{}".format(type, m.group("host"), m.group("port")),
+        }
+
+    @lock
+    def load(self):
+        """
+        (re)load the pool file, keeping the state of known proxies.
+        """
+        filename = self.pyload.config.get("proxy", "pool_file")
+        try:
+            mtime = os.stat(filename).st_mtime if os.path.isfile(filename) else None
+        except OSError:
+            mtime = None
+
+        if mtime is None:
+            self.proxies = {}
+            self.mtime = None
+            return
+
+        if mtime == self.mtime:
+            return
+
+        proxies = {}
+        with open(filename, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+
+                proxy = self.parse(line)
+                if proxy is None:
+                    self.pyload.log.warning(
+                        self._("Invalid proxy in pool file: {}").format(line.strip())
+                    )
+                    continue
+
+                url = proxy["url"]
+                proxies[url] = self.proxies.get(url) or {
+                    "proxy": proxy,
+                    "healthy": True,  #: until the first check
+                    "latency": None,
+                    "successes": 0,
+                    "failures": 0,
+                    "errors": 0,  #: consecutive failures
+                    "used": 0,
+                }
+                proxies[url]["proxy"] = proxy
+
+        self.proxies = proxies
+        self.mtime = mtime
+        self.pyload.log.debug(f"Proxy pool loaded: {len(proxies)} proxies")
+
+    def _rank(self, state):
+        total = state["successes"] + state["failures"]
+        failure_rate = state["failures"] / total if total else 0
+        latency = state["latency"] if state["latency"] is not None else float("inf")
+        return state["used"], failure_rate, latency
+
+    @lock
+    def get(self, plugin=None):
+        """
+        returns the proxy option dict to use for a request of `plugin`, or None
+        if no healthy proxy is available.
+        """
+        if not self.checking:
+            self.checking = True
+            self.pyload.scheduler.add_job(0, self.check)
+
+        healthy = [x for x in self.proxies.values() if x["healthy"]]
+        if not healthy:
+            return None
+
+        state = None
+        if self.pyload.config.get("proxy", "pool_rotation") == "plugin":
+            state = self.proxies.get(self.plugins.get(plugin))
+            if state is not None and not state["healthy"]:
+                state = None
+
+        if state is None:
+            state = min(healthy, key=self._rank)
+            self.plugins[plugin] = state["proxy"]["url"]
+
+        state["used"] += 1
+        return state["proxy"]
+
+    @lock
+    def release(self, proxy):
+        state = self.proxies.get(proxy.get("url"))
+        if state is not None and state["used"] > 0:
+            state["used"] -= 1
+
+    @lock
+    def report(self, proxy, success):
+        """
+        feed the outcome of a request back into the selection.
+        """
+        state = self.proxies.get(proxy.get("url"))
+        if state is None:
+            return
+
+        if success:
+            state["successes"] += 1
+            state["errors"] = 0
+        else:
+            state["failures"] += 1
+            state["errors"] += 1
+            if state["healthy"] and state["errors"] >= self.FAILURE_LIMIT:
+                state["healthy"] = False
+                self.pyload.log.info(
+                    self._("Proxy {} marked unhealthy").format(state["proxy"]["url"])
+                )
+
+    def _check_proxy(self, state):
+        options = self.pyload.request_factory.get_options()
+        options["proxies"] = state["proxy"]
+        url = self.pyload.config.get("proxy", "pool_check_url")
+
+        try:
+            with HTTPRequest(None, options) as h:
+                h.c.setopt(pycurl.CONNECTTIMEOUT, self.CHECK_TIMEOUT)
+                h.c.setopt(pycurl.TIMEOUT, self.CHECK_TIMEOUT)
+                start = time.time()
+                h.load(url, just_header=True)
+                latency = time.time() - start
+
+        except Exception as exc:
+            self.pyload.log.debug(f"Proxy {state['proxy']['url']} check failed: {exc}")
+            return None
+
+        return latency
+
+    def check(self):
+        """
+        check all proxies of the pool and schedule the next check.
+        """
+        try:
+            self.load()
+
+            states = list(self.proxies.values())
+            with ThreadPoolExecutor(self.CHECK_WORKERS) as executor:
+                latencies = list(executor.map(self._check_proxy, states))
+
+            healthy = len(states) - latencies.count(None)
+            with self.lock:
+                for state, latency in zip(states, latencies):
+                    state["healthy"] = latency is not None
+                    if latency is not None:
+                        state["latency"] = latency
+                        state["errors"] = 0
+
+            self.pyload.log.debug(
+                f"Proxy pool checked: {healthy} of {len(states)} healthy"
+            )
+
+        finally:
+            interval = self.pyload.config.get("proxy", "pool_check_interval")
+            self.pyload.scheduler.add_job(max(interval, 1) * 60, self.check)
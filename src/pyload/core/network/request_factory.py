@@ -1,19 +1,27 @@
 # -*- coding: utf-8 -*-
 # AUTHOR: mkaay, RaNaN
 
+import os
 from threading import Lock
 
 from ..utils.old import lock
 from .browser import Browser
 from .bucket import Bucket
 from .cookie_jar import CookieJar
+from .http.async_request import AsyncHTTPRequest
+from .http.http_cache import HTTPCache
 from .http.http_request import HTTPRequest
+from .interface_balancer import InterfaceBalancer
+from .proxy_pool import ProxyPool
 from .xdcc.request import XDCCRequest
 
 DEFAULT_REQUEST = None
 
 
 class RequestFactory:
+
+    COOKIE_SAVE_INTERVAL = 60  #: seconds between two saves of the changed cookies
+
     def __init__(self, core):
         self.lock = Lock()
         self.pyload = core
@@ -21,6 +29,14 @@ class RequestFactory:
         self.bucket = Bucket()
         self.update_bucket()
         self.cookiejars = {}
+        self.saving_cookies = False
+        self.cookiedir = os.path.join(core.userdir, "data", "cookies")
+        self.cache = HTTPCache(
+            os.path.join(core.cachedir, "http"),
+            self.pyload.config.get("download", "http_cache_size") << 20,
+        )
+        self.proxy_pool = ProxyPool(core)
+        self.balancer = InterfaceBalancer()
 
         # TODO: Rewrite...
         global DEFAULT_REQUEST
@@ -31,15 +47,31 @@ class RequestFactory:
         return self.pyload.config.get("download", "interface")
 
     @lock
-    def get_request(self, plugin_name, account=None, type="HTTP", **kwargs):
+    def get_request(
+        self, plugin_name, account=None, type="HTTP", pooled=False, **kwargs
+    ):
+        """
+        returns a request of `plugin_name`, `pooled` requests of free downloads
+        get a proxy of the proxy pool.
+        """
         options = self.get_options()
+        if self.balancer:
+            options["interface"] = self.balancer.get(plugin_name, account)
         options.update(kwargs)  #: submit kwargs as additional options
 
         if type == "XDCC":
             req = XDCCRequest(self.bucket, options)
 
         else:
-            req = Browser(self.bucket, options)
+            #: Free downloads get a proxy of the pool, accounts keep their ip
+            proxy_pool = None
+            if pooled and not account and self.proxy_pool:
+                proxy = self.proxy_pool.get(plugin_name)
+                if proxy:
+                    options["proxies"] = proxy
+                    proxy_pool = self.proxy_pool
+
+            req = Browser(self.bucket, options, self.cache, proxy_pool)
 
             if account:
                 cj = self.get_cookie_jar(plugin_name, account)
@@ -55,13 +87,25 @@ class RequestFactory:
         """
         options = self.get_options()
         options.update(kwargs)  #: submit kwargs as additional options
-        return HTTPRequest(CookieJar(None), options)
+        return HTTPRequest(CookieJar(None), options, cache=self.cache)
+
+    def get_async_request(self, plugin_name=None, account=None, **kwargs):
+        """
+        returns an asyncio http request, dont forget to close it !
+        """
+        options = self.get_options()
+        options.update(kwargs)  #: submit kwargs as additional options
+        if account:
+            cj = self.get_cookie_jar(plugin_name, account)
+        else:
+            cj = CookieJar(plugin_name)
+        return AsyncHTTPRequest(cj, options)
 
     def get_url(self, *args, **kwargs):
         """
         see HTTPRequest for argument list.
         """
-        with HTTPRequest(None, self.get_options()) as h:
+        with HTTPRequest(None, self.get_options(), cache=self.cache) as h:
             rep = h.load(*args, **kwargs)
         return rep
 
@@ -69,10 +113,38 @@ class RequestFactory:
         if (plugin_name, account) in self.cookiejars:
             return self.cookiejars[(plugin_name, account)]
 
-        cj = CookieJar(plugin_name, account)
+        cj = CookieJar(
+            plugin_name, account, self.cookiedir if account is not None else None
+        )
         self.cookiejars[(plugin_name, account)] = cj
+
+        if account is not None and not self.saving_cookies:
+            self.saving_cookies = True
+            self.pyload.scheduler.add_job(
+                self.COOKIE_SAVE_INTERVAL, self._save_cookies_periodically
+            )
         return cj
 
+    def save_cookies(self):
+        """
+        save the changed cookies of all account jars.
+        """
+        for cj in list(self.cookiejars.values()):
+            try:
+                cj.save()
+            except OSError as exc:
+                self.pyload.log.warning(
+                    self._("Could not save cookies of {}: {}").format(cj.plugin, exc)
+                )
+
+    def _save_cookies_periodically(self):
+        try:
+            self.save_cookies()
+        finally:
+            self.pyload.scheduler.add_job(
+                self.COOKIE_SAVE_INTERVAL, self._save_cookies_periodically
+            )
+
     def get_proxies(self):
         """
         returns a proxy list for the request classes.
@@ -117,6 +189,17 @@ class RequestFactory:
             "interface": self.iface(),
             "proxies": self.get_proxies(),
             "ipv6": self.pyload.config.get("download", "ipv6"),
+            "checkpoint_interval": self.pyload.config.get(
+                "download", "checkpoint_interval"
+            ),
+            "checkpoint_checksum": self.pyload.config.get(
+                "download", "checkpoint_checksum"
+            ),
+            "write_buffer": self.pyload.config.get("download", "write_buffer") << 20,
+            "sync_policy": self.pyload.config.get("download", "sync_policy"),
+            "drop_cache": self.pyload.config.get("download", "drop_cache"),
+            "balancer": self.balancer,
+            "http2": self.pyload.config.get("download", "http2"),
         }
 
     def update_bucket(self):
@@ -12,19 +12,25 @@ from ..exceptions import Abort
 
 
 class XDCCRequest:
+
+    RECV_SIZE = 256 << 10  #: bytes read from the dcc socket at once
+    RCVBUF_SIZE = 4 << 20  #: kernel receive buffer requested for the dcc socket
+    ACK_INTERVAL = 1 << 20  #: bytes received before an ack is sent at the latest
+    POLL_TIMEOUT = 0.5
+
     def __init__(self, bucket=None, options={}):
         self.proxies = options.get("proxies", {})
         self.bucket = bucket
+        self.write_buffer = options.get("write_buffer", 1 << 20)
 
         self.fh = None
         self.dccsock = None
 
         self.filesize = 0
         self.received = 0
+        self.acked = 0
         self.speeds = [0.0, 0.0, 0.0]
 
-        self.sleep = 0.000
-        self.last_recv_size = 0
         self.send_64bits_ack = False
 
         self.abort = False
@@ -49,7 +55,11 @@ class XDCCRequest:
         # return sock
 
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        # sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16384)
+        #: set before connecting, so the tcp window scales to it
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.RCVBUF_SIZE)
+        except OSError:
+            pass
 
         return sock
 
@@ -61,28 +71,23 @@ class XDCCRequest:
         self.fh.write(buf)
 
         if self.bucket:
-            time.sleep(self.bucket.consumed(size))
-
-        else:
-            # Avoid small buffers, increasing sleep time slowly if buffer size gets smaller
-            # otherwise reduce sleep time percentequal (values are based on tests)
-            # So in general cpu time is saved without reducing bandwidth too much
-
-            if size < self.last_recv_size:
-                self.sleep += 0.002
-            else:
-                self.sleep *= 0.7
-
-            self.last_recv_size = size
-
-            time.sleep(self.sleep)
+            wait = self.bucket.consumed(size)
+            if wait:
+                time.sleep(wait)
 
     def _send_ack(self):
-        # acknowledge data by sending number of recceived bytes
+        """
+        acknowledge data by sending the number of received bytes.
+
+        Senders only need the latest count, so acks are sent once the socket
+        is drained, every `ACK_INTERVAL` bytes and at the end of the file,
+        instead of after every read.
+        """
         try:
             self.dccsock.send(
                 struct.pack("!Q" if self.send_64bits_ack else "!I", self.received)
             )
+            self.acked = self.received
 
         except socket.error:
             pass
@@ -94,7 +99,7 @@ class XDCCRequest:
         chunk_name = filename + ".chunk0"
 
         if resume and os.path.exists(chunk_name):
-            self.fh = open(chunk_name, mode="ab")
+            self.fh = open(chunk_name, mode="ab", buffering=self.write_buffer)
             resume_position = self.fh.tell()
             if not resume_position:
                 resume_position = os.stat(chunk_name).st_size
@@ -104,11 +109,16 @@ class XDCCRequest:
             self.received = resume_position
 
         else:
-            self.fh = open(chunk_name, mode="wb")
+            self.fh = open(chunk_name, mode="wb", buffering=self.write_buffer)
+
+        self.acked = self.received
 
         last_update = time.time()
         cum_recv_len = 0
 
+        buf = bytearray(self.RECV_SIZE)
+        view = memoryview(buf)
+
         self.dccsock = self.create_socket()
 
         recv_list = [self.dccsock]
@@ -122,19 +132,19 @@ class XDCCRequest:
                 self.fh.close()
                 raise Abort
 
-            fdset = select.select(recv_list, [], [], 0.1)
-            if self.dccsock in fdset[0]:
-                try:
-                    data = self.dccsock.recv(16384)
+            try:
+                data_len = self.dccsock.recv_into(view)
 
-                except socket.error as exc:
-                    if exc.errno == errno.EAGAIN or exc.errno == errno.EWOULDBLOCK:
-                        continue
+            except socket.error as exc:
+                if exc.errno != errno.EAGAIN and exc.errno != errno.EWOULDBLOCK:
+                    raise
 
-                    else:
-                        raise
+                #: drained, acknowledge what is there and wait for more
+                if self.acked < self.received:
+                    self._send_ack()
+                data_len = None
 
-                data_len = len(data)
+            if data_len is not None:
                 if (
                     data_len == 0
                     or self.filesize
@@ -144,8 +154,12 @@ class XDCCRequest:
 
                 cum_recv_len += data_len
 
-                self._write_func(data)
-                self._send_ack()
+                self._write_func(view[:data_len])
+                if (
+                    self.received - self.acked >= self.ACK_INTERVAL
+                    or self.received == self.filesize
+                ):
+                    self._send_ack()
 
             now = time.time()
             timespan = now - last_update
@@ -160,6 +174,9 @@ class XDCCRequest:
 
                 self.update_progress()
 
+            if data_len is None:
+                select.select(recv_list, [], [], self.POLL_TIMEOUT)
+
         self.dccsock.close()
         self.fh.close()
 
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+from queue import Queue
+
+from .plugin_thread import PluginThread
+
+
+class PrefetchThread(PluginThread):
+    """
+    thread resolving the download links of the next queued files, while the
+    download threads are busy.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, manager):
+        """
+        Constructor.
+        """
+        super().__init__(manager)
+
+        self.queue = Queue()  #: job queue
+
+        self.start()
+
+    # ----------------------------------------------------------------------
+    def run(self):
+        """
+        run method.
+        """
+        while True:
+            pyfile = self.queue.get()
+
+            if pyfile == "quit":
+                return True
+
+            try:
+                if not pyfile.has_status("queued"):
+                    continue
+
+                pyfile.init_plugin()
+                if hasattr(pyfile.plugin, "prefetch"):
+                    pyfile.plugin.prefetch(self)
+
+            except Exception as exc:
+                self.pyload.log.debug(
+                    self._("Prefetch failed: {name} | {msg}").format(
+                        name=pyfile.name, msg=exc
+                    ),
+                    exc_info=self.pyload.debug > 1,
+                )
+
+            finally:
+                self.m.prefetching.discard(pyfile.id)
+
+    # ----------------------------------------------------------------------
+    def put(self, job):
+        """
+        assign job to thread.
+        """
+        self.queue.put(job)
@@ -154,5 +154,4 @@ def html_unescape(text):
     """
     Removes HTML or XML character references and entities from a text string.
     """
-    h = html.parser.HTMLParser()
-    return h.unescape(text)
+    return html.unescape(text)
@@ -24,7 +24,7 @@ class Kernel32:
 class AntiStandby(BaseAddon):
     __name__ = "AntiStandby"
     __type__ = "addon"
-    __version__ = "0.18"
+    __version__ = "0.19"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -166,8 +166,8 @@ class AntiStandby(BaseAddon):
         ):
             return
 
-        dl_folder = self.pyload.config.get("general", "storage_folder")
-        if (self.max_mtime(dl_folder) - self.mtime) < self.periodical.interval:
+        max_mtime = max(self.max_mtime(x) for x in self.pyload.storage.roots)
+        if (max_mtime - self.mtime) < self.periodical.interval:
             return
 
         self.touch(self.TMP_FILE)
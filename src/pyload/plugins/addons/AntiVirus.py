@@ -16,7 +16,7 @@ except ImportError:
 class AntiVirus(BaseAddon):
     __name__ = "AntiVirus"
     __type__ = "addon"
-    __version__ = "0.21"
+    __version__ = "0.22"
     __status__ = "broken"
 
     __pyload_version__ = "0.5"
@@ -55,7 +55,7 @@ class AntiVirus(BaseAddon):
         scanfolder = self.config.get("avtarget") == "folder"
 
         if scanfolder:
-            dl_folder = self.pyload.config.get("general", "storage_folder")
+            dl_folder = self.pyload.storage.get_root(pyfile.package())
             package_folder = (
                 pyfile.package().folder
                 if self.pyload.config.get("general", "folder_per_package")
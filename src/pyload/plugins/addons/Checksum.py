@@ -4,12 +4,31 @@ import os
 import re
 import time
 import zlib
-from threading import Event
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Semaphore
 
 from pyload.core.utils import format
 
 from ..base.addon import BaseAddon, threaded
 
+#: bytes read at once, hashlib and zlib release the GIL while hashing them
+BUFFER_SIZE = 4 << 20
+
+
+def read_blocks(local_file, bufsize=BUFFER_SIZE):
+    """
+    yields the content of a file in blocks read into one reused buffer, every
+    block is only valid until the next one is read.
+    """
+    buf = bytearray(bufsize)
+    view = memoryview(buf)
+    with open(local_file, mode="rb", buffering=0) as fp:
+        while True:
+            size = fp.readinto(buf)
+            if not size:
+                break
+            yield view[:size]
+
 
 def compute_checksum(local_file, algorithm, progress_notify=None, abort=None):
     file_size = os.stat(local_file).st_size
@@ -25,33 +44,31 @@ def compute_checksum(local_file, algorithm, progress_notify=None, abort=None):
         ):
             h = getattr(hashlib, algorithm)()
 
-            with open(local_file, mode="rb") as fp:
-                for chunk in iter(lambda: fp.read(128 * h.block_size), ""):
-                    if abort and abort():
-                        return False
+            for chunk in read_blocks(local_file):
+                if abort and abort():
+                    return False
 
-                    h.update(chunk)
-                    processed += len(chunk)
+                h.update(chunk)
+                processed += len(chunk)
 
-                    if progress_notify:
-                        progress_notify(processed * 100 // file_size)
+                if progress_notify:
+                    progress_notify(processed * 100 // file_size)
 
             return h.hexdigest()
 
         elif algorithm in ("adler32", "crc32"):
             hf = getattr(zlib, algorithm)
-            last = 0
+            last = hf(b"")
 
-            with open(local_file, mode="rb") as fp:
-                for chunk in iter(lambda: fp.read(8192), ""):
-                    if abort and abort():
-                        return False
+            for chunk in read_blocks(local_file):
+                if abort and abort():
+                    return False
 
-                    last = hf(chunk, last)
-                    processed += len(chunk)
+                last = hf(chunk, last)
+                processed += len(chunk)
 
-                    if progress_notify:
-                        progress_notify(processed * 100 // file_size)
+                if progress_notify:
+                    progress_notify(processed * 100 // file_size)
 
             #: zlib sometimes return negative value
             return "{:x}".format((2 ** 32 + last) & 0xFFFFFFFF)
@@ -67,7 +84,7 @@ def compute_checksum(local_file, algorithm, progress_notify=None, abort=None):
 class Checksum(BaseAddon):
     __name__ = "Checksum"
     __type__ = "addon"
-    __version__ = "0.34"
+    __version__ = "0.37"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -84,6 +101,8 @@ class Checksum(BaseAddon):
         ("max_tries", "int", "Number of retries", 2),
         ("retry_action", "fail;nothing", "What to do if all retries fail?", "fail"),
         ("wait_time", "int", "Time to wait before each retry (seconds)", 1),
+        ("workers", "int", "Files verified in parallel (0 for one per CPU core)", 0),
+        ("disk_workers", "int", "Files verified in parallel on the same disk", 1),
     ]
 
     __description__ = """Verify downloaded file size and checksum"""
@@ -99,7 +118,7 @@ class Checksum(BaseAddon):
 
     _regexmap = {
         "sfv": r"^(?P<NAME>[^;].+)\s+(?P<HASH>[0-9A-Fa-f]{8})$",
-        "md5": r"^(?P<NAME>[0-9A-Fa-f]{32})  (?P<FILE>.+)$",
+        "md5": r"^(?P<HASH>[0-9A-Fa-f]{32})\s+\*?(?P<NAME>.+)$",
         "crc": r"filename=(?P<NAME>.+)\nsize=(?P<SIZE>\d+)\ncrc32=(?P<HASH>[0-9A-Fa-f]{8})$",
         "default": r"^(?P<HASH>[0-9A-Fa-f]+)\s+\*?(?P<NAME>.+)$",
     }
@@ -126,6 +145,9 @@ class Checksum(BaseAddon):
 
         self.retries = {}
 
+        self.disks = {}  #: disk -> Semaphore of the files verified on it
+        self.disks_lock = Lock()
+
     def download_finished(self, pyfile):
         """
         Compute checksum for the downloaded file and compare it with the hash provided
@@ -194,16 +216,23 @@ class Checksum(BaseAddon):
             if len(data["hash"]) > 0:
                 for key in self.algorithms:
                     if key in data["hash"]:
-                        pyfile.set_custom_status(self._("checksum verifying"))
-                        try:
-                            checksum = compute_checksum(
-                                local_file,
-                                key.replace("-", "").lower(),
-                                progress_notify=pyfile.set_progress,
-                                abort=lambda: pyfile.abort,
-                            )
-                        finally:
-                            pyfile.set_status("processing")
+                        algorithm = key.replace("-", "").lower()
+                        #: digest computed while downloading, saves reading the file
+                        checksum = getattr(pyfile.plugin, "digests", {}).get(algorithm)
+                        if checksum is not None:
+                            self.log_debug(f"Using {algorithm} computed on download")
+
+                        else:
+                            pyfile.set_custom_status(self._("checksum verifying"))
+                            try:
+                                checksum = compute_checksum(
+                                    local_file,
+                                    algorithm,
+                                    progress_notify=pyfile.set_progress,
+                                    abort=lambda: pyfile.abort,
+                                )
+                            finally:
+                                pyfile.set_status("processing")
 
                         if checksum is False:
                             continue
@@ -271,16 +300,59 @@ class Checksum(BaseAddon):
         self.verify_package(pypack, event_finished)
         event_finished.wait()  #: Postpone `all_downloads_processed` event until we actually finish
 
+    def _disk_slot(self, local_file):
+        """
+        returns the semaphore limiting the files verified at the same time on
+        the disk of `local_file`.
+        """
+        try:
+            disk = os.stat(local_file).st_dev
+        except OSError:
+            disk = None
+
+        with self.disks_lock:
+            if disk not in self.disks:
+                self.disks[disk] = Semaphore(max(self.config.get("disk_workers"), 1))
+            return self.disks[disk]
+
+    def _verify_file(self, local_file, algorithm, pyfile, thread):
+        with self._disk_slot(local_file):
+            try:
+                if pyfile is None:
+                    return compute_checksum(local_file, algorithm)
+
+                pyfile.set_custom_status(self._("checksum verifying"))
+                thread.add_active(pyfile)
+                try:
+                    return compute_checksum(
+                        local_file,
+                        algorithm,
+                        progress_notify=pyfile.set_progress,
+                        abort=lambda: pyfile.abort,
+                    )
+                finally:
+                    thread.finish_file(pyfile)
+
+            except OSError as exc:
+                self.log_warning(self._("File not found"), local_file, exc)
+                return False
+
     @threaded
     def verify_package(self, pypack, event_finished, thread=None):
         try:
             dl_folder = os.path.join(
-                self.pyload.config.get("general", "storage_folder"), pypack.folder, ""
+                self.pyload.storage.get_root(pypack), pypack.folder, ""
             )
 
             pdata = list(pypack.get_children().items())
             files_ids = {fdata["name"]: fdata["id"] for fid, fdata in pdata}
             failed_queue = []
+
+            workers = self.config.get("workers") or os.cpu_count() or 1
+            executor = ThreadPoolExecutor(max(workers, 1))
+
+            #: start verifying all files listed by the hash files at once
+            hash_files = []
             for fid, fdata in pdata:
                 file_type = os.path.splitext(fdata["name"])[1][1:].lower()
 
@@ -295,7 +367,7 @@ class Checksum(BaseAddon):
                 with open(hash_file) as fp:
                     text = fp.read()
 
-                failed = []
+                entries = []
                 for m in re.finditer(
                     self._regexmap.get(file_type, self._regexmap["default"]), text, re.M
                 ):
@@ -309,20 +381,20 @@ class Checksum(BaseAddon):
                     fid = files_ids.get(data["NAME"], None)
                     if fid is not None:
                         pyfile = self.pyload.files.get_file(fid)
-                        pyfile.set_custom_status(self._("checksum verifying"))
-                        thread.add_active(pyfile)
-                        try:
-                            checksum = compute_checksum(
-                                local_file,
-                                algorithm,
-                                progress_notify=pyfile.set_progress,
-                                abort=lambda: pyfile.abort,
-                            )
-                        finally:
-                            thread.finish_file(pyfile)
 
-                    else:
-                        checksum = compute_checksum(local_file, algorithm)
+                    future = executor.submit(
+                        self._verify_file, local_file, algorithm, pyfile, thread
+                    )
+                    entries.append((data, local_file, algorithm, fid, pyfile, future))
+
+                hash_files.append((fdata, entries))
+
+            executor.shutdown(wait=False)
+
+            for fdata, entries in hash_files:
+                failed = []
+                for data, local_file, algorithm, fid, pyfile, future in entries:
+                    checksum = future.result()
 
                     if checksum is False:
                         continue
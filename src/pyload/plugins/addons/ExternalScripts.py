@@ -9,7 +9,7 @@ from ..base.addon import BaseAddon, expose
 class ExternalScripts(BaseAddon):
     __name__ = "ExternalScripts"
     __type__ = "addon"
-    __version__ = "0.73"
+    __version__ = "0.74"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -220,25 +220,19 @@ class ExternalScripts(BaseAddon):
         self.call_script("archive_extracted", *args)
 
     def package_finished(self, pypack):
-        dl_folder = self.pyload.config.get("general", "storage_folder")
-
-        if self.pyload.config.get("general", "folder_per_package"):
-            dl_folder = os.path.join(dl_folder, pypack.folder)
+        dl_folder = self.pyload.storage.get_folder(pypack)
 
         args = [pypack.id, pypack.name, dl_folder, pypack.password]
         self.call_script("package_finished", *args)
 
     def package_processed(self, pypack):
-        dl_folder = self.pyload.config.get("general", "storage_folder")
-
-        if self.pyload.config.get("general", "folder_per_package"):
-            dl_folder = os.path.join(dl_folder, pypack.folder)
+        dl_folder = self.pyload.storage.get_folder(pypack)
 
         args = [pypack.id, pypack.name, dl_folder, pypack.password]
         self.call_script("package_processed", *args)
 
     def package_deleted(self, pid):
-        dl_folder = self.pyload.config.get("general", "storage_folder")
+        dl_folder = self.pyload.storage.get_root(pid)
         pdata = self.pyload.api.get_package_info(pid)
 
         if self.pyload.config.get("general", "folder_per_package"):
@@ -248,28 +242,19 @@ class ExternalScripts(BaseAddon):
         self.call_script("package_deleted", *args)
 
     def package_failed(self, pypack):
-        dl_folder = self.pyload.config.get("general", "storage_folder")
-
-        if self.pyload.config.get("general", "folder_per_package"):
-            dl_folder = os.path.join(dl_folder, pypack.folder)
+        dl_folder = self.pyload.storage.get_folder(pypack)
 
         args = [pypack.id, pypack.name, dl_folder, pypack.password]
         self.call_script("package_failed", *args)
 
     def package_extract_failed(self, pypack):
-        dl_folder = self.pyload.config.get("general", "storage_folder")
-
-        if self.pyload.config.get("general", "folder_per_package"):
-            dl_folder = os.path.join(dl_folder, pypack.folder)
+        dl_folder = self.pyload.storage.get_folder(pypack)
 
         args = [pypack.id, pypack.name, dl_folder, pypack.password]
         self.call_script("package_extract_failed", *args)
 
     def package_extracted(self, pypack):
-        dl_folder = self.pyload.config.get("general", "storage_folder")
-
-        if self.pyload.config.get("general", "folder_per_package"):
-            dl_folder = os.path.join(dl_folder, pypack.folder)
+        dl_folder = self.pyload.storage.get_folder(pypack)
 
         args = [pypack.id, pypack.name, dl_folder]
         self.call_script("package_extracted", *args)
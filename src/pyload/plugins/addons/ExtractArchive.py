@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Condition, Event, Lock, Thread
 
-from pyload.core.utils.old import safename
+from pyload.core.utils.old import lock, safename
 from pyload.core.utils.purge import uniquify
 
 from ..base.addon import BaseAddon, expose, threaded
@@ -19,6 +21,7 @@ class ArchiveQueue:
     def __init__(self, plugin, storage):
         self.plugin = plugin
         self.storage = storage
+        self.lock = Lock()
 
     def get(self):
         return self.plugin.db.retrieve(self.storage, default=[])
@@ -29,6 +32,7 @@ class ArchiveQueue:
     def delete(self):
         return self.plugin.db.delete(self.storage)
 
+    @lock
     def add(self, item):
         queue = self.get()
         if item not in queue:
@@ -36,6 +40,7 @@ class ArchiveQueue:
         else:
             return True
 
+    @lock
     def remove(self, item):
         queue = self.get()
         try:
@@ -53,7 +58,7 @@ class ArchiveQueue:
 class ExtractArchive(BaseAddon):
     __name__ = "ExtractArchive"
     __type__ = "addon"
-    __version__ = "1.67"
+    __version__ = "1.72"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -66,6 +71,7 @@ class ExtractArchive(BaseAddon):
         ("repair", "bool", "Repair broken archives (RAR required)", False),
         ("usepasswordfile", "bool", "Use password file", True),
         ("passwordfile", "file", "Password file", "passwords.txt"),
+        ("password_workers", "int", "Passwords tested in parallel", 4),
         ("delete", "bool", "Delete archive after extraction", True),
         ("deltotrash", "bool", "Move to trash instead delete", True),
         ("subfolder", "bool", "Create subfolder for each package", False),
@@ -84,7 +90,26 @@ class ExtractArchive(BaseAddon):
         ),
         ("recursive", "bool", "Extract archives in archives", True),
         ("waitall", "bool", "Run after all downloads was processed", False),
+        (
+            "extract_early",
+            "bool",
+            "Extract RAR sets while their last volumes are downloading",
+            False,
+        ),
         ("priority", "int", "Process priority", 0),
+        (
+            "workers",
+            "int",
+            "Packages extracted in parallel (0 for one per CPU core)",
+            0,
+        ),
+        ("disk_jobs", "int", "Packages extracted in parallel on the same disk", 1),
+        (
+            "pause_downloads",
+            "bool",
+            "Hold back new downloads to a disk while extracting on it",
+            False,
+        ),
     ]
 
     __description__ = """Extract different kind of archives"""
@@ -95,6 +120,10 @@ class ExtractArchive(BaseAddon):
         ("GammaC0de", "nitzo2001[AT]yahoo[DOT]com"),
     ]
 
+    RECENT_PASSWORDS = 20  #: successful passwords tried first
+    VOLUME_POLL = 5  #: seconds between two checks of a volume awaited
+    EARLY_TIMEOUT = 1800  #: seconds an early extraction may take after its package
+
     def init(self):
         self.event_map = {
             "all_downloads_processed": "all_downloads_processed",
@@ -106,6 +135,10 @@ class ExtractArchive(BaseAddon):
 
         self.extracting = False
         self.last_package = False
+        self.pinned = set()  #: ids of packages the user asked to extract
+        self.password_cache = {}  #: first part of an archive set -> password
+        self.early = {}  #: first volume -> state of its early extraction
+        self.arrived = Condition()  #: notified when a download ends
         self.extractors = []
         self.passwords = []
         self.repair = False
@@ -181,11 +214,146 @@ class ExtractArchive(BaseAddon):
         """
         Extract packages with given id.
         """
+        self.pinned.update(ids)
         for id in ids:
             self.queue.add(id)
         if not self.config.get("waitall") and not self.extracting:
             self.extract_queued()
 
+    def download_finished(self, pyfile):
+        if not self.config.get("extract_early"):
+            return
+
+        with self.arrived:
+            self.arrived.notify_all()
+
+        extensions = [
+            x.lstrip(".").lower()
+            for x in self._to_list(self.config.get("extensions"))
+            if x
+        ]
+        for Extractor in self.extractors:
+            if not Extractor.EARLY or not Extractor.ismultipart(pyfile.name):
+                continue
+
+            if extensions and Extractor.archivetype(pyfile.name) not in extensions:
+                break
+
+            #: start with the first volume, as soon as it is downloaded
+            setname = Extractor._RE_PART.sub("", pyfile.name)
+            volumes = sorted(
+                x["name"]
+                for x in pyfile.package().get_children().values()
+                if Extractor._RE_PART.sub("", x["name"]) == setname
+            )
+            if len(volumes) > 1 and volumes[0] == pyfile.name:
+                self.extract_early(pyfile, Extractor)
+            break
+
+    def download_failed(self, pyfile):
+        with self.arrived:
+            self.arrived.notify_all()
+
+    @threaded
+    def extract_early(self, pyfile, Extractor, thread):
+        """
+        extract a multipart archive from its first volume while the next ones
+        are downloading. If it fails, the archive is extracted again with the
+        package.
+        """
+        pypack = pyfile.package()
+        pack_dl_folder, extract_folder = self._folders(pypack)
+        fname = os.path.join(pack_dl_folder, pyfile.name)
+
+        with self.lock:
+            if fname in self.early:
+                return
+            state = self.early[fname] = {
+                "done": Event(),
+                "files": None,
+                "archive": None,
+                "stopped": False,
+            }
+
+        try:
+            os.makedirs(extract_folder, exist_ok=True)
+            archive = Extractor(
+                pyfile,
+                fname,
+                extract_folder,
+                self.config.get("fullpath"),
+                self.config.get("overwrite"),
+                self._to_list(self.config.get("excludefiles")),
+                self.config.get("priority"),
+                self.config.get("keepbroken"),
+            )
+            archive.init()
+            state["archive"] = archive
+
+            self.log_info(
+                pyfile.name,
+                self._("Extract while downloading to: {}").format(extract_folder),
+            )
+            password = self.password_cache.get(self._set_key(archive), pypack.password)
+            files = archive.extract_early(
+                password, lambda x: self.wait_volume(pypack.id, x, state)
+            )
+            if not state["stopped"]:
+                state["files"] = files
+            self.remember_password(archive, pyfile, password)
+
+        except Exception as exc:
+            self.log_warning(
+                pyfile.name, self._("Extract while downloading failed"), exc
+            )
+
+        finally:
+            state["done"].set()
+
+    def wait_volume(self, pid, name, state=None):
+        """
+        blocks until the volume `name` of a package is downloaded, returns False
+        if it never will or the early extraction `state` was stopped.
+        """
+        name = os.path.basename(name)
+        with self.arrived:
+            while True:
+                if state is not None and state["stopped"]:
+                    return False
+
+                pypack = self.pyload.files.get_package(pid)
+                status = None
+                if pypack is not None:
+                    status = next(
+                        (
+                            x["status"]
+                            for x in pypack.get_children().values()
+                            if x["name"] == name
+                        ),
+                        None,
+                    )
+
+                if status in (0, 4):  #: finished, skipped
+                    return True
+
+                #: not queued, waiting, starting, downloading or processing
+                elif status not in (3, 5, 7, 12, 13):
+                    return False
+
+                self.arrived.wait(self.VOLUME_POLL)
+
+    def stop_early(self, state):
+        """
+        stop an early extraction, so the archive is extracted again.
+        """
+        state["stopped"] = True
+        if state["archive"] is not None:
+            state["archive"].stop_early()
+        with self.arrived:
+            self.arrived.notify_all()
+        state["done"].wait(self.VOLUME_POLL)
+        state["files"] = None
+
     def package_deleted(self, pid):
         self.queue.remove(pid)
 
@@ -206,13 +374,125 @@ class ExtractArchive(BaseAddon):
         if not ids:
             return False
 
-        extracted = []
-        failed = []
+        #: Reload from txt file
+        self.reload_passwords()
 
-        def to_list(value):
-            return value.replace(" ", "").replace(",", "|").replace(";", "|").split("|")
+        results = self.schedule(ids, thread)
+        return False not in results
 
-        destination = self.config.get("destination")
+    def _folders(self, pypack):
+        """
+        returns the download folder and the extraction folder of a package.
+        """
+        pack_dl_folder = os.path.join(
+            self.pyload.storage.get_root(pypack), pypack.folder, ""
+        )  #: Force trailing slash
+
+        #: Determine output folder
+        extract_folder = os.path.join(
+            pack_dl_folder, self.config.get("destination"), ""
+        )  #: Force trailing slash
+
+        if self.config.get("subfolder"):
+            extract_folder = os.path.join(
+                extract_folder,
+                pypack.folder or safename(pypack.name.replace("http://", "")),
+            )
+
+        return pack_dl_folder, extract_folder
+
+    def schedule(self, ids, thread):
+        """
+        Extract packages in parallel, returns their results.
+
+        Up to `workers` packages are extracted at once and `disk_jobs` per disk,
+        counting the disks of both the archives and the extracted files.
+        Packages the user asked to extract go first, then the smaller ones.
+        """
+        storage = self.pyload.storage
+        workers = self.config.get("workers") or os.cpu_count() or 1
+        disk_jobs = max(self.config.get("disk_jobs"), 1)
+        hold = self.config.get("pause_downloads")
+
+        jobs = []
+        for pid in ids:
+            pypack = self.pyload.files.get_package(pid)
+            if not pypack:
+                self.queue.remove(pid)
+                continue
+
+            folders = self._folders(pypack)
+            disks = {storage.volume(x) for x in folders}
+            size = sum(int(x.get("size") or 0) for x in pypack.get_children().values())
+            jobs.append((pid not in self.pinned, size, pid, folders, disks))
+
+        jobs.sort(key=lambda x: x[:3])
+
+        results = []
+        running = []
+        busy = {}  #: disk -> running jobs
+        cond = Condition()
+
+        def run(pid, folders, disks):
+            result = False
+            try:
+                result = self._extract_package(pid, thread)
+
+            except Exception as exc:
+                self.log_error(
+                    exc,
+                    exc_info=self.pyload.debug > 1,
+                    stack_info=self.pyload.debug > 2,
+                )
+
+            finally:
+                if hold:
+                    for folder in folders:
+                        storage.release(folder)
+
+                with cond:
+                    running.remove(pid)
+                    for disk in disks:
+                        busy[disk] -= 1
+                    results.append(result)
+                    cond.notify()
+
+        with cond:
+            while jobs or running:
+                for job in jobs:
+                    if len(running) < workers and all(
+                        busy.get(x, 0) < disk_jobs for x in job[4]
+                    ):
+                        break
+                else:
+                    cond.wait()
+                    continue
+
+                jobs.remove(job)
+                pid, folders, disks = job[2:]
+                running.append(pid)
+                for disk in disks:
+                    busy[disk] = busy.get(disk, 0) + 1
+
+                #: keep downloads off the disks while extracting on them
+                if hold:
+                    for folder in folders:
+                        storage.hold(folder)
+
+                Thread(target=run, args=(pid, folders, disks), daemon=True).start()
+
+        self.pinned.difference_update(ids)
+        return results
+
+    @staticmethod
+    def _to_list(value):
+        return value.replace(" ", "").replace(",", "|").replace(";", "|").split("|")
+
+    def _extract_package(self, pid, thread):
+        """
+        extract the archives of a package, returns True if extracted, False if
+        failed and None if no archive was found.
+        """
         subfolder = self.config.get("subfolder")
         fullpath = self.config.get("fullpath")
         overwrite = self.config.get("overwrite")
@@ -221,223 +501,200 @@ class ExtractArchive(BaseAddon):
         keepbroken = self.config.get("keepbroken")
 
         extensions = [
-            x.lstrip(".").lower() for x in to_list(self.config.get("extensions"))
+            x.lstrip(".").lower() for x in self._to_list(self.config.get("extensions"))
         ]
-        excludefiles = to_list(self.config.get("excludefiles"))
+        excludefiles = self._to_list(self.config.get("excludefiles"))
 
         if extensions:
             self.log_debug(f"Use for extensions: .{'|.'.join(extensions)}")
 
-        #: Reload from txt file
-        self.reload_passwords()
+        pypack = self.pyload.files.get_package(pid)
 
-        dl_folder = self.pyload.config.get("general", "storage_folder")
-
-        #: Iterate packages -> extractors -> targets
-        for pid in ids:
-            pypack = self.pyload.files.get_package(pid)
-
-            if not pypack:
-                self.queue.remove(pid)
-                continue
+        if not pypack:
+            self.queue.remove(pid)
+            return None
 
-            self.log_info(self._("Check package: {}").format(pypack.name))
+        self.log_info(self._("Check package: {}").format(pypack.name))
 
-            pack_dl_folder = os.path.join(
-                dl_folder, pypack.folder, ""
-            )  #: Force trailing slash
+        pack_dl_folder, extract_folder = self._folders(pypack)
 
-            #: Determine output folder
-            extract_folder = os.path.join(
-                pack_dl_folder, destination, ""
-            )  #: Force trailing slash
+        os.makedirs(extract_folder, exist_ok=True)
+        if subfolder:
+            self.set_permissions(extract_folder)
 
-            if subfolder:
-                extract_folder = os.path.join(
+        matched = False
+        success = True
+        files_ids = list(
+            {
+                fdata["name"]: (
+                    fdata["id"],
+                    (os.path.join(pack_dl_folder, fdata["name"])),
                     extract_folder,
-                    pypack.folder or safename(pypack.name.replace("http://", "")),
                 )
+                for fdata in pypack.get_children().values()
+            }.values()
+        )  #: : Remove duplicates
+
+        #: Check as long there are unseen files
+        while files_ids:
+            new_files_ids = []
+
+            if extensions:  #: Include only specified archive types
+                files_ids = [
+                    file_id
+                    for file_id in files_ids
+                    if any(
+                        [
+                            Extractor.archivetype(file_id[1]) in extensions
+                            for Extractor in self.extractors
+                        ]
+                    )
+                ]
 
-            os.makedirs(extract_folder, exist_ok=True)
-            if subfolder:
-                self.set_permissions(extract_folder)
-
-            matched = False
-            success = True
-            files_ids = list(
-                {
-                    fdata["name"]: (
-                        fdata["id"],
-                        (os.path.join(pack_dl_folder, fdata["name"])),
-                        extract_folder,
+            #: Sort by filename to ensure (or at least try) that a multivolume archive is targeted by its first part
+            #: This is important because, for example, UnRar ignores preceding parts in listing mode
+            files_ids.sort(key=lambda file_id: file_id[1])
+
+            for Extractor in self.extractors:
+                targets = Extractor.get_targets(files_ids)
+                if targets:
+                    self.log_debug(
+                        "Targets for {}: {}".format(Extractor.__name__, targets)
                     )
-                    for fdata in pypack.get_children().values()
-                }.values()
-            )  #: : Remove duplicates
-
-            #: Check as long there are unseen files
-            while files_ids:
-                new_files_ids = []
-
-                if extensions:  #: Include only specified archive types
-                    files_ids = [
-                        file_id
-                        for file_id in files_ids
-                        if any(
-                            [
-                                Extractor.archivetype(file_id[1]) in extensions
-                                for Extractor in self.extractors
-                            ]
-                        )
-                    ]
-
-                #: Sort by filename to ensure (or at least try) that a multivolume archive is targeted by its first part
-                #: This is important because, for example, UnRar ignores preceding parts in listing mode
-                files_ids.sort(key=lambda file_id: file_id[1])
-
-                for Extractor in self.extractors:
-                    targets = Extractor.get_targets(files_ids)
-                    if targets:
-                        self.log_debug(
-                            "Targets for {}: {}".format(Extractor.__name__, targets)
-                        )
-                        matched = True
-
-                        for fid, fname, fout in targets:
-                            name = os.path.basename(fname)
-
-                            if not exists(fname):
-                                self.log_debug(name, "File not found")
-                                continue
+                    matched = True
 
-                            self.log_info(name, self._("Extract to: {}").format(fout))
-                            try:
-                                pyfile = self.pyload.files.get_file(fid)
-                                archive = Extractor(
-                                    pyfile,
-                                    fname,
-                                    fout,
-                                    fullpath,
-                                    overwrite,
-                                    excludefiles,
-                                    priority,
-                                    keepbroken,
-                                )
+                    for fid, fname, fout in targets:
+                        name = os.path.basename(fname)
 
-                                thread.add_active(pyfile)
-                                archive.init()
+                        if not exists(fname):
+                            self.log_debug(name, "File not found")
+                            continue
 
-                                #: Save for removal from file processing list, which happens after deletion.
-                                #: So archive.chunks() would just return an empty list.
-                                chunks = archive.chunks()
+                        self.log_info(name, self._("Extract to: {}").format(fout))
+                        try:
+                            pyfile = self.pyload.files.get_file(fid)
+                            archive = Extractor(
+                                pyfile,
+                                fname,
+                                fout,
+                                fullpath,
+                                overwrite,
+                                excludefiles,
+                                priority,
+                                keepbroken,
+                            )
 
-                                try:
-                                    new_files = self._extract(
-                                        pyfile, archive, pypack.password
-                                    )
+                            thread.add_active(pyfile)
+                            archive.init()
 
-                                finally:
-                                    pyfile.set_progress(100)
-                                    thread.finish_file(pyfile)
+                            #: Save for removal from file processing list, which happens after deletion.
+                            #: So archive.chunks() would just return an empty list.
+                            chunks = archive.chunks()
 
-                            except Exception as exc:
-                                self.log_error(name, exc)
-                                success = False
-                                continue
+                            try:
+                                new_files = self._extract(
+                                    pyfile, archive, pypack.password
+                                )
 
-                            #: Remove processed file and related multiparts from list
-                            files_ids = [
-                                (fid, fname, fout)
-                                for fid, fname, fout in files_ids
-                                if fname not in chunks
-                            ]
-                            self.log_debug(f"Extracted files: {new_files}")
+                            finally:
+                                pyfile.set_progress(100)
+                                thread.finish_file(pyfile)
 
-                            new_folders = uniquify(
-                                os.path.dirname(f) for f in new_files
+                        except Exception as exc:
+                            self.log_error(name, exc)
+                            success = False
+                            continue
+
+                        #: Remove processed file and related multiparts from list
+                        files_ids = [
+                            (fid, fname, fout)
+                            for fid, fname, fout in files_ids
+                            if fname not in chunks
+                        ]
+                        self.log_debug(f"Extracted files: {new_files}")
+
+                        new_folders = uniquify(os.path.dirname(f) for f in new_files)
+                        for foldername in new_folders:
+                            self.set_permissions(
+                                os.path.join(extract_folder, foldername)
                             )
-                            for foldername in new_folders:
-                                self.set_permissions(
-                                    os.path.join(extract_folder, foldername)
-                                )
 
-                            for filename in new_files:
-                                self.set_permissions(
-                                    os.path.join(extract_folder, filename)
-                                )
+                        for filename in new_files:
+                            self.set_permissions(os.path.join(extract_folder, filename))
 
-                            for filename in new_files:
-                                file = os.fsdecode(
-                                    os.path.join(
-                                        os.path.dirname(archive.filename), filename
-                                    )
+                        for filename in new_files:
+                            file = os.fsdecode(
+                                os.path.join(
+                                    os.path.dirname(archive.filename), filename
                                 )
-                                if not exists(file):
-                                    self.log_debug(
-                                        "New file {} does not exists".format(filename)
-                                    )
-                                    continue
-
-                                if recursive and os.path.isfile(file):
-                                    new_files_ids.append(
-                                        (fid, filename, os.path.dirname(filename))
-                                    )  #: Append as new target
+                            )
+                            if not exists(file):
+                                self.log_debug(
+                                    "New file {} does not exists".format(filename)
+                                )
+                                continue
 
-                            self.m.dispatch_event("archive_extracted", pyfile, archive)
+                            if recursive and os.path.isfile(file):
+                                new_files_ids.append(
+                                    (fid, filename, os.path.dirname(filename))
+                                )  #: Append as new target
 
-                files_ids = new_files_ids  #: Also check extracted files
+                        self.m.dispatch_event("archive_extracted", pyfile, archive)
 
-            if matched:
-                if success:
-                    #: Delete empty pack folder if extract_folder resides outside download folder
-                    if self.config.get("delete") and self.pyload.config.get(
-                        "general", "folder_per_package"
-                    ):
-                        if not extract_folder.startswith(pack_dl_folder):
-                            if len(os.listdir(pack_dl_folder)) == 0:
-                                try:
-                                    os.rmdir(pack_dl_folder)
-                                    self.log_debug(
-                                        "Successfully deleted pack folder {}".format(
-                                            pack_dl_folder
-                                        )
-                                    )
+            files_ids = new_files_ids  #: Also check extracted files
 
-                                except OSError:
-                                    self.log_warning(
-                                        "Unable to delete pack folder {}".format(
-                                            pack_dl_folder
-                                        )
+        if matched:
+            if success:
+                #: Delete empty pack folder if extract_folder resides outside download folder
+                if self.config.get("delete") and self.pyload.config.get(
+                    "general", "folder_per_package"
+                ):
+                    if not extract_folder.startswith(pack_dl_folder):
+                        if len(os.listdir(pack_dl_folder)) == 0:
+                            try:
+                                os.rmdir(pack_dl_folder)
+                                self.log_debug(
+                                    "Successfully deleted pack folder {}".format(
+                                        pack_dl_folder
                                     )
+                                )
 
-                            else:
+                            except OSError:
                                 self.log_warning(
-                                    "Not deleting pack folder {}, folder not empty".format(
+                                    "Unable to delete pack folder {}".format(
                                         pack_dl_folder
                                     )
                                 )
 
-                    extracted.append(pid)
-                    self.m.dispatch_event("package_extracted", pypack)
+                        else:
+                            self.log_warning(
+                                "Not deleting pack folder {}, folder not empty".format(
+                                    pack_dl_folder
+                                )
+                            )
 
-                else:
-                    failed.append(pid)
-                    self.m.dispatch_event("package_extract_failed", pypack)
+                result = True
+                self.m.dispatch_event("package_extracted", pypack)
 
-                    self.failed.add(pid)
             else:
-                self.log_info(self._("No files found to extract"))
+                result = False
+                self.m.dispatch_event("package_extract_failed", pypack)
 
-            if not matched or not success and subfolder:
-                try:
-                    os.rmdir(extract_folder)
+                self.failed.add(pid)
+        else:
+            self.log_info(self._("No files found to extract"))
+            result = None
 
-                except OSError:
-                    pass
+        if not matched or not success and subfolder:
+            try:
+                os.rmdir(extract_folder)
 
-            self.queue.remove(pid)
+            except OSError:
+                pass
 
-        return True if not failed else False
+        self.queue.remove(pid)
+
+        return result
 
     def _extract(self, pyfile, archive, password):
         name = os.path.basename(archive.filename)
@@ -447,23 +704,33 @@ class ExtractArchive(BaseAddon):
         encrypted = False
         try:
             self.log_debug(f"Password: {password or None}")
-            passwords = (
-                uniquify([password] + self.get_passwords(False))
-                if self.config.get("usepasswordfile")
-                else [password]
-            )
 
-            for pw in passwords:
+            early = self.early.pop(archive.filename, None)
+            if early is not None:
+                pyfile.set_custom_status(self._("archive extracting"))
+                if not early["done"].wait(self.EARLY_TIMEOUT):
+                    self.log_warning(
+                        name, self._("Extract while downloading timed out")
+                    )
+                    self.stop_early(early)
+
+            if early is not None and early["files"] is not None:
+                self.log_debug(name, "Extracted while downloading")
+                archive.files = early["files"]
+
+            else:
+                #: the password of another part of the set, or of the package
+                first = self.password_cache.get(self._set_key(archive), password)
+
                 try:
                     pyfile.set_custom_status(self._("archive testing"))
                     pyfile.set_progress(0)
-                    archive.verify(pw)
+                    archive.verify(first)
                     pyfile.set_progress(100)
 
                 except PasswordError:
-                    if not encrypted:
-                        self.log_info(name, self._("Password protected"))
-                        encrypted = True
+                    self.log_info(name, self._("Password protected"))
+                    encrypted = True
 
                 except CRCError as exc:
                     self.log_debug(name, exc)
@@ -482,40 +749,43 @@ class ExtractArchive(BaseAddon):
                         if not repaired and not self.config.get("keepbroken"):
                             raise CRCError("Archive damaged")
 
-                        else:
-                            self.add_password(pw)
-                            break
-
                 except ArchiveError as exc:
                     raise ArchiveError(exc)
 
-                else:
-                    self.add_password(pw)
-                    break
+                pyfile.set_custom_status(self._("archive extracting"))
+                pyfile.set_progress(0)
 
-            pyfile.set_custom_status(self._("archive extracting"))
-            pyfile.set_progress(0)
-
-            if not encrypted or not self.config.get("usepasswordfile"):
-                self.log_debug(
-                    "Extracting using password: {}".format(password or "None")
-                )
-                archive.extract(password)
-            else:
-                for pw in [
-                    f for f in uniquify([password] + self.get_passwords(False)) if f
-                ]:
-                    try:
-                        self.log_debug(f"Extracting using password: {pw}")
-
-                        archive.extract(pw)
-                        self.add_password(pw)
-                        break
+                if not encrypted or not self.config.get("usepasswordfile"):
+                    self.log_debug(
+                        "Extracting using password: {}".format(first or "None")
+                    )
+                    archive.extract(first)
+                    self.remember_password(archive, pyfile, first)
 
-                    except PasswordError:
-                        self.log_debug("Password was wrong")
                 else:
-                    raise PasswordError
+                    passwords = self.rank_passwords(archive, pyfile, password)
+
+                    pyfile.set_custom_status(self._("password searching"))
+                    found = self.find_password(archive, passwords)
+                    if found:
+                        self.log_debug(f"Password found: {found}")
+                        passwords = [found]  #: no need to test it again
+                    elif found is False:
+                        passwords = []
+
+                    pyfile.set_custom_status(self._("archive extracting"))
+                    for pw in passwords:
+                        try:
+                            self.log_debug(f"Extracting using password: {pw}")
+
+                            archive.extract(pw)
+                            self.remember_password(archive, pyfile, pw)
+                            break
+
+                        except PasswordError:
+                            self.log_debug("Password was wrong")
+                    else:
+                        raise PasswordError
 
             pyfile.set_progress(100)
             pyfile.set_status("processing")
@@ -584,6 +854,84 @@ class ExtractArchive(BaseAddon):
 
         raise Exception(self._("Extract failed"))
 
+    def _set_key(self, archive):
+        """
+        returns the first part of the multipart set of an archive.
+        """
+        try:
+            return min(archive.chunks())
+        except (OSError, ValueError):
+            return archive.filename
+
+    def rank_passwords(self, archive, pyfile, password):
+        """
+        returns the passwords to try on an archive, most likely first: the one of
+        its multipart set, the package password, the ones that worked on files of
+        the same hoster, the recent successes and the password file.
+        """
+        history = self.db.retrieve("password_history") or {"sites": {}, "recent": []}
+        site = history["sites"].get(pyfile.pluginname, {})
+
+        passwords = [self.password_cache.get(self._set_key(archive)), password]
+        passwords.extend(sorted(site, key=site.get, reverse=True))
+        passwords.extend(history["recent"])
+        passwords.extend(self.get_passwords(False))
+        return [x for x in uniquify(passwords) if x]
+
+    def find_password(self, archive, passwords):
+        """
+        Test passwords on the headers of an archive in parallel.
+
+        Returns the first password that opens the archive, False if none does,
+        or None if the headers are not encrypted, so only extracting can tell.
+        """
+        if not passwords or archive.check_password(None) is not False:
+            return None
+
+        failed = False  #: some passwords could not be tested
+        workers = max(self.config.get("password_workers"), 1)
+        with ThreadPoolExecutor(workers) as executor:
+            futures = {executor.submit(archive.check_password, x): x for x in passwords}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+
+                except (ArchiveError, CRCError) as exc:
+                    self.log_debug(exc)
+                    failed = True
+                    continue
+
+                if result is not False:
+                    for x in futures:
+                        x.cancel()
+                    return futures[future]
+
+        return None if failed else False
+
+    def remember_password(self, archive, pyfile, password):
+        """
+        keep a working password for the other parts of the archive set and
+        rank it higher for the next archives.
+        """
+        if not password:
+            return
+
+        self.password_cache[self._set_key(archive)] = password
+
+        with self.lock:
+            history = self.db.retrieve("password_history") or {
+                "sites": {},
+                "recent": [],
+            }
+            site = history["sites"].setdefault(pyfile.pluginname, {})
+            site[password] = site.get(password, 0) + 1
+            history["recent"] = uniquify([password] + history["recent"])[
+                : self.RECENT_PASSWORDS
+            ]
+            self.db.store("password_history", history)
+
+            self.add_password(password)
+
     #: Deprecated method, use `get_passwords` instead
     @expose
     def get_passwords(self, *args, **kwargs):
@@ -635,11 +983,14 @@ class ExtractArchive(BaseAddon):
         """
         Adds a password to saved list.
         """
+        if not password:
+            return
+
         try:
             self.passwords = uniquify([password] + self.passwords)
 
             file = os.fsdecode(self.config.get("passwordfile"))
-            with open(file, mode="wb") as fp:
+            with open(file, mode="w") as fp:
                 for pw in self.passwords:
                     fp.write(pw + "\n")
 
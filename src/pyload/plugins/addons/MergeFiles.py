@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
+import errno
 import os
 import re
+from threading import Lock
 
 from ..base.addon import BaseAddon, threaded
 
@@ -8,65 +10,187 @@ from ..base.addon import BaseAddon, threaded
 class MergeFiles(BaseAddon):
     __name__ = "MergeFiles"
     __type__ = "addon"
-    __version__ = "0.22"
+    __version__ = "0.25"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
 
-    __config__ = [("enabled", "bool", "Activated", False)]
+    __config__ = [
+        ("enabled", "bool", "Activated", False),
+        (
+            "merge_on_arrival",
+            "bool",
+            "Merge every part as soon as it and all previous parts are finished",
+            True,
+        ),
+        ("delete_parts", "bool", "Delete parts once merged", False),
+    ]
 
     __description__ = """Merges parts splitted with hjsplit"""
     __license__ = "GPLv3"
     __authors__ = [("and9000", "me@has-no-mail.com")]
 
-    BUFFER_SIZE = 4096
+    BUFFER_SIZE = 64 << 20  #: bytes copied between two progress updates
 
-    @threaded
-    def package_finished(self, pack):
+    #: errors of a copy method not supported for the files
+    UNSUPPORTED = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP)
+
+    _RE_PART = re.compile(r"\.\d{3}$")
+
+    def init(self):
+        self.locks = {}  #: merged file -> Lock
+        self.locks_lock = Lock()
+
+        if hasattr(os, "copy_file_range"):
+            self.copy_method = "copy_file_range"
+        elif hasattr(os, "sendfile"):
+            self.copy_method = "sendfile"
+        else:
+            self.copy_method = "read"
+
+    def _get_lock(self, key):
+        with self.locks_lock:
+            return self.locks.setdefault(key, Lock())
+
+    def _part_sets(self, pack, finished=None):
+        """
+        returns the parts of every splitted file of a package, as sorted lists
+        of (name, file id, finished). `finished` is the id of a file just
+        finished.
+        """
         files = {}
-        fid_dict = {}
         for fid, data in pack.get_children().items():
-            if re.search(r"\.\d{3}$", data["name"]):
-                if data["name"][:-4] not in files:
-                    files[data["name"][:-4]] = []
-                files[data["name"][:-4]].append(data["name"])
-                files[data["name"][:-4]].sort()
-                fid_dict[data["name"]] = fid
+            if self._RE_PART.search(data["name"]):
+                files.setdefault(data["name"][:-4], []).append(
+                    (data["name"], fid, fid == finished or data["status"] == 0)
+                )
+
+        for parts in files.values():
+            parts.sort()
+        return files
+
+    def _copy(self, src_fd, dst_fd, count, src_offset, dst_offset):
+        """
+        copies up to `count` bytes between the offsets of two files inside the
+        kernel if possible, returns the bytes copied.
+        """
+        if self.copy_method == "copy_file_range":
+            try:
+                return os.copy_file_range(src_fd, dst_fd, count, src_offset, dst_offset)
+            except OSError as exc:
+                if exc.errno not in self.UNSUPPORTED:
+                    raise
+                self.log_debug(f"copy_file_range not supported: {exc}")
+                self.copy_method = "sendfile" if hasattr(os, "sendfile") else "read"
+
+        if self.copy_method == "sendfile":
+            try:
+                os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+                return os.sendfile(dst_fd, src_fd, src_offset, count)
+            except OSError as exc:
+                if exc.errno not in self.UNSUPPORTED:
+                    raise
+                self.log_debug(f"sendfile not supported: {exc}")
+                self.copy_method = "read"
+
+        os.lseek(src_fd, src_offset, os.SEEK_SET)
+        data = os.read(src_fd, min(count, 1 << 20))
+        os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+        return os.write(dst_fd, data)
+
+    def _append(self, part_file, final_file, offset, pyfile):
+        """
+        appends a part at `offset` of the merged file, returns its size.
+        """
+        size = os.path.getsize(part_file)
+        copied = 0
+        with open(part_file, mode="rb") as s_file:
+            while copied < size:
+                count = self._copy(
+                    s_file.fileno(),
+                    final_file.fileno(),
+                    min(self.BUFFER_SIZE, size - copied),
+                    copied,
+                    offset + copied,
+                )
+                if not count:
+                    raise IOError(f"Part {part_file} is smaller than expected")
+                copied += count
+                pyfile.set_progress((copied * 100) // size)
+        return copied
+
+    def merge(self, pack, name, parts, final=False):
+        """
+        appends the parts of `name` in order, as long as they are finished (or
+        all of them if `final`), returns True if all parts are merged.
+
+        The merged parts and size are saved, so merging goes on after a
+        restart, even if the merged parts were deleted.
+        """
+        dl_folder = self.pyload.storage.get_folder(pack)
+        key = f"merge/{pack.id}/{name}"
+
+        with self._get_lock(key):
+            state = self.db.retrieve(key) or {"parts": [], "size": 0}
+            final_name = os.path.join(dl_folder, name)
+
+            #: the merged file is gone or shorter than saved, merge it again
+            if state["parts"] and (
+                not os.path.isfile(final_name)
+                or os.path.getsize(final_name) < state["size"]
+            ):
+                if not all(
+                    os.path.isfile(os.path.join(dl_folder, x)) for x in state["parts"]
+                ):
+                    self.log_error(
+                        self._("Merged file {} and its merged parts are gone").format(
+                            name
+                        )
+                    )
+                    return False
 
-        dl_folder = self.pyload.config.get("general", "storage_folder")
+                self.log_warning(
+                    self._("Merged file {} is damaged, merging it again").format(name)
+                )
+                state = {"parts": [], "size": 0}
+                self.db.store(key, state)
 
-        if self.pyload.config.get("general", "folder_per_package"):
-            dl_folder = os.path.join(dl_folder, pack.folder)
+            todo = [x for x in parts if x[0] not in state["parts"]]
+            if not todo:
+                return True
+            if not final and not todo[0][2]:
+                return False
 
-        for name, file_list in files.items():
-            self.log_info(self._("Starting merging of"), name)
+            if not state["parts"]:
+                self.log_info(self._("Starting merging of"), name)
 
-            with open(os.path.join(dl_folder, name), mode="wb") as final_file:
-                for splitted_file in file_list:
-                    self.log_debug("Merging part", splitted_file)
+            mode = "r+b" if state["parts"] else "wb"
+            with open(final_name, mode=mode) as final_file:
+                #: drop what was appended after the last saved state
+                final_file.truncate(state["size"])
 
-                    pyfile = self.pyload.files.get_file(fid_dict[splitted_file])
+                for splitted_file, fid, finished in todo:
+                    if not (final or finished):
+                        break
+
+                    self.log_debug("Merging part", splitted_file)
 
+                    pyfile = self.pyload.files.get_file(fid)
                     pyfile.set_status("processing")
 
+                    part_file = os.path.join(dl_folder, splitted_file)
                     try:
-                        with open(
-                            os.path.join(dl_folder, splitted_file), "rb"
-                        ) as s_file:
-                            size_written = 0
-                            s_file_size = int(
-                                os.path.getsize(os.path.join(dl_folder, splitted_file))
-                            )
-                            while True:
-                                f_buffer = s_file.read(self.BUFFER_SIZE)
-                                if f_buffer:
-                                    final_file.write(f_buffer)
-                                    size_written += self.BUFFER_SIZE
-                                    pyfile.set_progress(
-                                        (size_written * 100) // s_file_size
-                                    )
-                                else:
-                                    break
+                        state["size"] += self._append(
+                            part_file, final_file, state["size"], pyfile
+                        )
+                        state["parts"].append(splitted_file)
+
+                        if self.config.get("delete_parts"):
+                            os.fsync(final_file.fileno())
+                        self.db.store(key, state)
+
+                        if self.config.get("delete_parts"):
+                            os.remove(part_file)
                         self.log_debug("Finished merging part", splitted_file)
 
                     except Exception as exc:
@@ -75,10 +199,30 @@ class MergeFiles(BaseAddon):
                             exc_info=self.pyload.debug > 1,
                             stack_info=self.pyload.debug > 2,
                         )
+                        break
 
                     finally:
                         pyfile.set_progress(100)
                         pyfile.set_status("finished")
                         pyfile.release()
 
-            self.log_info(self._("Finished merging of"), name)
+            return len(state["parts"]) == len(parts)
+
+    @threaded
+    def merge_arrived(self, pyfile, thread=None):
+        pack = pyfile.package()
+        name = pyfile.name[:-4]
+        self.merge(pack, name, self._part_sets(pack, pyfile.id).get(name, []))
+
+    def download_finished(self, pyfile):
+        if self.config.get("merge_on_arrival") and self._RE_PART.search(pyfile.name):
+            self.merge_arrived(pyfile)
+
+    @threaded
+    def package_finished(self, pack):
+        for name, parts in self._part_sets(pack).items():
+            merged = self.merge(pack, name, parts, final=True)
+            self.db.delete(f"merge/{pack.id}/{name}")
+
+            if merged:
+                self.log_info(self._("Finished merging of"), name)
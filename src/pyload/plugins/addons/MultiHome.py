@@ -1,23 +1,11 @@
 # -*- coding: utf-8 -*-
 
-import time
-
 from ..base.addon import BaseAddon
 
 
 class Interface:
     def __init__(self, address):
         self.address = address
-        self.history = {}
-
-    def last_plugin_access(self, plugin_name, account):
-        if (plugin_name, account) in self.history:
-            return self.history[(plugin_name, account)]
-        else:
-            return 0
-
-    def use_for(self, plugin_name, account):
-        self.history[(plugin_name, account)] = time.time()
 
     def __repr__(self):
         return "<Interface - {}>".format(self.address)
@@ -26,7 +14,7 @@ class Interface:
 class MultiHome(BaseAddon):
     __name__ = "MultiHome"
     __type__ = "addon"
-    __version__ = "0.21"
+    __version__ = "0.22"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -34,9 +22,10 @@ class MultiHome(BaseAddon):
     __config__ = [
         ("enabled", "bool", "Activated", False),
         ("interfaces", "str", "Interfaces", "None"),
+        ("chunks", "bool", "Spread chunks of a download over interfaces", False),
     ]
 
-    __description__ = """IP address changer"""
+    __description__ = """Balance downloads over multiple network interfaces"""
     __license__ = "GPLv3"
     __authors__ = [
         ("mkaay", "mkaay@mkaay.de"),
@@ -45,7 +34,6 @@ class MultiHome(BaseAddon):
 
     def init(self):
         self.interfaces = []
-        self.old_get_request = None
 
         self.parse_interfaces(self.config.get("interfaces").split(";"))
 
@@ -65,36 +53,9 @@ class MultiHome(BaseAddon):
             self.interfaces.append(Interface(interface))
 
     def activate(self):
-        self.old_get_request = self.pyload.request_factory.get_request
-
-        new_get_request = self.build_get_request()
-        self.pyload.request_factory.get_request = lambda *args: new_get_request(*args)
-
-    def best_interface(self, plugin_name, account):
-        best = None
-
-        for interface in self.interfaces:
-            if not best or interface.last_plugin_access(
-                plugin_name, account
-            ) < best.last_plugin_access(plugin_name, account):
-                best = interface
-
-        return best
-
-    def get_request(self, plugin_name, account=None):
-        iface = self.best_interface(plugin_name, account)
-        if iface is None:
-            self.log_warning(self._("Best interface not found"))
-            return self.old_get_request(plugin_name, account)
-
-        iface.use_for(plugin_name, account)
-        self.pyload.request_factory.iface = lambda: iface.address
-        self.log_debug("Using address", iface.address)
-
-        return self.old_get_request(plugin_name, account)
-
-    def build_get_request(self):
-        def resfunc(*args):
-            return self.get_request(*args)
+        self.pyload.request_factory.balancer.set_interfaces(
+            [i.address for i in self.interfaces], self.config.get("chunks")
+        )
 
-        return resfunc
+    def deactivate(self):
+        self.pyload.request_factory.balancer.set_interfaces([])
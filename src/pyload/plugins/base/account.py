@@ -16,7 +16,7 @@ from .plugin import BasePlugin
 class BaseAccount(BasePlugin):
     __name__ = "BaseAccount"
     __type__ = "account"
-    __version__ = "0.84"
+    __version__ = "0.85"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -137,6 +137,7 @@ class BaseAccount(BasePlugin):
 
         else:
             self.info["login"]["valid"] = True
+            self.req.cj.save()  #: keep the new session across a restart
 
         finally:
             #: Set timestamp for login
@@ -3,6 +3,8 @@
 import mimetypes
 import os
 import re
+import time
+from threading import Lock
 
 from pyload.core.network.exceptions import Fail
 from pyload.core.network.http.exceptions import BadHeader
@@ -16,7 +18,7 @@ from .hoster import BaseHoster
 class BaseDownloader(BaseHoster):
     __name__ = "BaseDownloader"
     __type__ = "downloader"
-    __version__ = "0.74"
+    __version__ = "0.80"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -32,6 +34,9 @@ class BaseDownloader(BaseHoster):
     __license__ = "GPLv3"
     __authors__ = [("Walter Purcaro", "vuolter@gmail.com")]
 
+    #: Seconds a download link resolved ahead by `prefetch` stays valid, 0 disables it
+    PREFETCH_TTL = 0
+
     @property
     def last_download(self):
         return self._last_download if exists(self._last_download) else ""
@@ -54,6 +59,9 @@ class BaseDownloader(BaseHoster):
         #: Location where the last call to download was saved
         self._last_download = ""
 
+        #: Hex digests of the last download, computed while it was written
+        self.digests = {}
+
         #: Re match of the last call to `check_download`
         self.last_check = None
 
@@ -63,6 +71,11 @@ class BaseDownloader(BaseHoster):
         #: Download is possible with premium account only, don't fallback to free download
         self.no_fallback = False
 
+        #: Time the download link was resolved ahead by `prefetch`
+        self.prefetched = 0
+        self.prefetch_lock = Lock()
+        self.claimed = False  #: a download thread took the file, don't prefetch
+
     def setup_base(self):
         self._last_download = ""
         self.last_check = None
@@ -84,12 +97,65 @@ class BaseDownloader(BaseHoster):
             super().load_account()
             # self.restart_free = False
 
+    def is_prefetched(self):
+        return (
+            bool(self.prefetched) and time.time() < self.prefetched + self.PREFETCH_TTL
+        )
+
+    def prefetch(self, thread):
+        """
+        Resolve the download link while the file is still queued, so `process`
+        can start downloading right away once a download slot is free.
+
+        Only premium downloads are resolved, free ones may need waits or captchas.
+        """
+        if not self.PREFETCH_TTL or self.is_prefetched():
+            return
+
+        with self.prefetch_lock:
+            #: the file may have been taken by a download thread meanwhile
+            if self.claimed or not self.pyfile.has_status("queued"):
+                return
+
+            status = self.pyfile.status
+            self.thread = thread
+            try:
+                self._initialize()
+                self._setup()
+
+                if not self.premium:
+                    return
+
+                self.resolve_link(self.pyfile)
+                if self.link:
+                    self.prefetched = time.time()
+                    self.log_debug(f"Download link prefetched: {self.link}")
+
+            finally:
+                self.pyfile.status = status
+                self.pyfile.sync()
+
+    def resolve_link(self, pyfile):
+        """
+        Resolve the download link of the file into `self.link` without
+        downloading it, needed for `prefetch`.
+        """
+        raise NotImplementedError
+
     def _process(self, thread):
-        self.thread = thread
+        #: Wait for a running prefetch of this file to finish, keep off later ones
+        with self.prefetch_lock:
+            self.claimed = True
+            self.thread = thread
 
         try:
+
             self._initialize()
-            self._setup()
+            if self.is_prefetched():
+                self.log_debug("Using prefetched download link")
+            else:
+                self.prefetched = 0
+                self._setup()
 
             # TODO: Enable in 0.6.x
             # self.pyload.addon_manager.download_preparing(self.pyfile)
@@ -213,8 +279,36 @@ class BaseDownloader(BaseHoster):
 
             return resource
 
+    def check_algorithms(self):
+        """
+        returns the hash algorithms of the checksums advertised by the hoster,
+        looked up like the Checksum addon does.
+        """
+        for attr in ("check_data", "api_data", "info"):
+            data = getattr(self, attr, None)
+            if isinstance(data, dict):
+                break
+        else:
+            return []
+
+        keys = set(data)
+        if isinstance(data.get("hash"), dict):
+            keys.update(data["hash"])
+        return [x.replace("-", "").lower() for x in keys if isinstance(x, str)]
+
     def _download(
-        self, url, filename, get, post, ref, cookies, disposition, resume, chunks
+        self,
+        url,
+        filename,
+        get,
+        post,
+        ref,
+        cookies,
+        disposition,
+        resume,
+        chunks,
+        mirrors=(),
+        transform=None,
     ):
         # TODO: Safe-filename check in HTTPDownload in 0.6.x
         filename = os.fsdecode(filename)
@@ -228,6 +322,7 @@ class BaseDownloader(BaseHoster):
         else:
             chunks = min(dl_chunks, chunk_limit)
 
+        self.digests = {}
         try:
             newname = self.req.http_download(
                 url,
@@ -240,7 +335,11 @@ class BaseDownloader(BaseHoster):
                 resume,
                 self.pyfile.set_progress,
                 disposition,
+                mirrors,
+                self.check_algorithms(),
+                transform,
             )
+            self.digests = self.req.digests
 
         except IOError as exc:
             self.log_error(exc)
@@ -275,6 +374,8 @@ class BaseDownloader(BaseHoster):
         resume=None,
         chunks=None,
         fixurl=True,
+        mirrors=(),
+        transform=None,
     ):
         """
         Downloads the content at url to download folder.
@@ -286,6 +387,9 @@ class BaseDownloader(BaseHoster):
         :param cookies:
         :param disposition: if True and server provides content-disposition header\
         the filename will be changed if needed
+        :param mirrors: other urls serving the same file, loaded in parallel
+        :param transform: returns the function applied to the data received from a\
+        file offset on before it is written, e.g. a decryption
         :return: The location where the file was saved
         """
         self.check_status()
@@ -309,7 +413,7 @@ class BaseDownloader(BaseHoster):
 
         self.pyfile.set_status("downloading")
 
-        dl_folder = self.pyload.config.get("general", "storage_folder")
+        dl_folder = self.pyload.storage.get_root(self.pyfile.package())
         dl_dirname = safejoin(dl_folder, self.pyfile.package().folder)
         dl_filename = safejoin(dl_dirname, dl_basename)
 
@@ -322,7 +426,17 @@ class BaseDownloader(BaseHoster):
         self.check_status()
 
         newname = self._download(
-            dl_url, dl_filename, get, post, ref, cookies, disposition, resume, chunks
+            dl_url,
+            dl_filename,
+            get,
+            post,
+            ref,
+            cookies,
+            disposition,
+            resume,
+            chunks,
+            [self.fixurl(x) if fixurl else x for x in mirrors],
+            transform,
         )
 
         # TODO: Recheck in 0.6.x
@@ -521,7 +635,7 @@ class BaseDownloader(BaseHoster):
                 ):  #: finished / downloading / waiting / starting
                     self.skip(pyfile.pluginname)
 
-        dl_folder = self.pyload.config.get("general", "storage_folder")
+        dl_folder = self.pyload.storage.get_root(self.pyfile.package())
         dl_file = os.path.join(dl_folder, pack_folder, self.pyfile.name)
 
         if not exists(dl_file):
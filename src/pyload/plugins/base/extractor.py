@@ -27,7 +27,7 @@ class PasswordError(Exception):
 class BaseExtractor(BasePlugin):
     __name__ = "BaseExtractor"
     __type__ = "base"
-    __version__ = "0.48"
+    __version__ = "0.51"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -43,6 +43,9 @@ class BaseExtractor(BasePlugin):
     EXTENSIONS = []
     REPAIR = False
     VERSION = None
+    #: can extract a multipart set while its volumes download, with
+    #: `extract_early` and `stop_early`
+    EARLY = False
 
     _RE_PART = re.compile(r"")
 
@@ -162,6 +165,21 @@ class BaseExtractor(BasePlugin):
         """
         pass
 
+    def check_password(self, password=None):
+        """
+        Quickly test a password without extracting, from the archive headers
+        if possible. Returns False if the archive can't be opened with it, True
+        if it can and None if it only opens the headers of an archive whose
+        files are encrypted, which does not prove the password right.
+        """
+        try:
+            self.verify(password)
+
+        except PasswordError:
+            return False
+
+        return True
+
     def repair(self):
         pass
 
@@ -28,7 +28,7 @@ def parse_file_info(klass, url="", html=""):
 class BaseHoster(BasePlugin):
     __name__ = "BaseHoster"
     __type__ = "base"
-    __version__ = "0.34"
+    __version__ = "0.35"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -168,7 +168,9 @@ class BaseHoster(BasePlugin):
             # NOTE: Avoid one unnecessary get_info call by `self.account.premium` here
             self.premium = self.account.info["data"]["premium"]
         else:
-            self.req = self.pyload.request_factory.get_request(self.classname)
+            self.req = self.pyload.request_factory.get_request(
+                self.classname, pooled=self.__type__ == "downloader"
+            )
             self.premium = False
 
         self.req.set_option("timeout", 60)  # TODO: Remove in 0.6.x
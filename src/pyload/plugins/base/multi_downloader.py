@@ -9,7 +9,7 @@ from .simple_downloader import SimpleDownloader
 class MultiDownloader(SimpleDownloader):
     __name__ = "MultiDownloader"
     __type__ = "downloader"
-    __version__ = "0.67"
+    __version__ = "0.68"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -36,6 +36,8 @@ class MultiDownloader(SimpleDownloader):
 
     LEECH_HOSTER = False
 
+    PREFETCH_TTL = 10 * 60
+
     def init(self):
         self.PLUGIN_NAME = self.pyload.plugin_manager.hoster_plugins.get(
             self.classname
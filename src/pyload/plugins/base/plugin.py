@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
 # AUTHOR: vuolter
 
+import asyncio
 import inspect
 import os
 
 import pycurl
 from pyload.core.network.exceptions import Fail, Skip
+from pyload.core.network.http.async_request import (
+    AsyncHTTPRequest,
+    CurlLoop,
+    run_coroutine,
+)
 from pyload.core.network.request_factory import get_request
 from pyload.core.utils import fs
 from pyload.core.utils.old import decode, fixurl, html_unescape
@@ -17,14 +23,17 @@ if os.name != "nt":
     import pwd
 
 
-# NOTE: save decode() as _decode() for use with load(url, decode='decode-str')
-_decode = decode
+# NOTE: decodes the raw response of load(url, decode='encoding-name')
+def _decode(value, encoding=None):
+    if isinstance(value, bytes) and isinstance(encoding, str):
+        return value.decode(encoding, "replace")
+    return decode(value) if isinstance(value, str) else value
 
 
 class BasePlugin:
     __name__ = "BasePlugin"
     __type__ = "base"
-    __version__ = "0.74"
+    __version__ = "0.78"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -163,6 +172,8 @@ class BasePlugin:
         multipart=False,
         redirect=True,
         req=None,
+        stream=False,
+        cache=None,
     ):
         """
         Load content at url and returns it.
@@ -174,6 +185,8 @@ class BasePlugin:
         :param cookies:
         :param just_header: If True only the header will be retrieved and returned as dict
         :param decode: Wether to decode the output according to http header, should be True in most cases
+        :param stream: If True the content is not size limited and returned undecoded as binary file object, close it when done
+        :param cache: Ttl in seconds (or True to follow the server cache headers) to serve a GET request from the http cache
         :return: Loaded content
         """
         if self.pyload.debug:
@@ -222,7 +235,9 @@ class BasePlugin:
             bool(cookies),
             just_header,
             multipart,
-            decode is True,
+            decode is True and not stream,
+            stream=stream,
+            cache=cache,
         )  # TODO: Fix network multipart in 0.6.x
 
         # TODO: Move to network in 0.6.x
@@ -242,17 +257,18 @@ class BasePlugin:
             # NOTE: req can be a HTTPRequest or a Browser object
             http_req.c.setopt(pycurl.MAXREDIRS, maxredirs)
 
-        # TODO: Move to network in 0.6.x
-        if decode:
-            html = html_unescape(html)
+        if not stream or just_header:
+            # TODO: Move to network in 0.6.x
+            if decode:
+                html = html_unescape(html)
 
-        # TODO: Move to network in 0.6.x
-        html = _decode(html, decode)
+            # TODO: Move to network in 0.6.x
+            html = _decode(html, decode)
 
-        self.last_html = html
+            self.last_html = html
 
-        if self.pyload.debug:
-            self.dump_html()
+            if self.pyload.debug:
+                self.dump_html()
 
         # TODO: Move to network in 0.6.x
         header = {"code": req.code, "url": req.last_effective_url}
@@ -266,6 +282,89 @@ class BasePlugin:
         else:
             return html
 
+    async def load_async(
+        self,
+        url,
+        get={},
+        post={},
+        ref=True,
+        cookies=True,
+        just_header=False,
+        decode=True,
+        multipart=False,
+        redirect=True,
+        req=None,
+    ):
+        """
+        Coroutine version of `load`, to load many pages concurrently on the
+        plugin thread (see `load_all`), with the cookies and options of `self.req`.
+
+        Unlike `load` it doesn't set `last_html` and `last_header`, `redirect`
+        only switches redirects on or off.
+
+        :param req: AsyncHTTPRequest to use, a new one by default
+        :return: Loaded content
+        """
+        if self.pyload.debug:
+            self.log_debug(f"LOAD URL ASYNC {url}")
+
+        url = fixurl(url, unquote=True)  #: Recheck in 0.6.x
+
+        async_req = req or AsyncHTTPRequest(self.req.cj, self.req.options)
+
+        if isinstance(cookies, list):
+            set_cookies(async_req.cj, cookies)
+
+        if isinstance(ref, str):
+            async_req.last_url = ref
+
+        try:
+            html, http_req = await async_req.request(
+                url,
+                get,
+                post,
+                bool(ref),
+                bool(cookies),
+                just_header,
+                multipart,
+                decode is True,
+                bool(redirect),
+            )
+            header = {"code": http_req.code, "url": http_req.last_effective_url}
+            header.update(parse_html_header(http_req.header))
+
+        finally:
+            if req is None:
+                async_req.close()
+
+        if just_header:
+            return header
+
+        html = _decode(html, decode)
+        if decode:
+            html = html_unescape(html)
+
+        return html
+
+    def load_all(self, urls, **kwargs):
+        """
+        Load all `urls` concurrently, see `load_async` for the arguments.
+
+        :return: List of the loaded contents in the order of `urls`, with the exception raised in place of a failed one
+        """
+
+        async def load_all():
+            try:
+                with AsyncHTTPRequest(self.req.cj, self.req.options) as req:
+                    return await asyncio.gather(
+                        *(self.load_async(url, req=req, **kwargs) for url in urls),
+                        return_exceptions=True,
+                    )
+            finally:
+                CurlLoop.discard()
+
+        return run_coroutine(load_all())
+
     def upload(
         self,
         path,
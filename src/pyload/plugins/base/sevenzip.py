@@ -5,6 +5,7 @@ import re
 import subprocess
 
 from pyload import PKGDIR
+from pyload.core.utils.convert import to_str
 
 from ..helpers import renice
 from .extractor import ArchiveError, BaseExtractor, CRCError, PasswordError
@@ -13,7 +14,7 @@ from .extractor import ArchiveError, BaseExtractor, CRCError, PasswordError
 class SevenZip(BaseExtractor):
     __name__ = "SevenZip"
     __type__ = "extractor"
-    __version__ = "0.27"
+    __version__ = "0.29"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -122,6 +123,19 @@ class SevenZip(BaseExtractor):
         elif self._RE_BADCRC.search(err):
             raise CRCError(err)
 
+    def check_password(self, password=None):
+        #: only lists the headers, no file is decompressed
+        p = self.call_cmd("l", "-slt", self.filename, password=password)
+        out, err = (to_str(r.strip(), errors="replace") for r in p.communicate())
+
+        if self._RE_BADPWD.search(err):
+            return False
+
+        elif self._RE_BADPWD.search(out):
+            return None
+
+        return True
+
     def progress(self, process):
         s = ""
         while True:
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
 import re
 
+from pyload.core.network.http.async_request import CurlLoop, run_coroutine
 from pyload.core.network.http.exceptions import BadHeader
 from pyload.core.network.request_factory import get_url
 from pyload.core.utils import parse
@@ -13,7 +15,7 @@ from .decrypter import BaseDecrypter
 class SimpleDecrypter(BaseDecrypter):
     __name__ = "SimpleDecrypter"
     __type__ = "decrypter"
-    __version__ = "0.93"
+    __version__ = "0.95"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -268,6 +270,12 @@ class SimpleDecrypter(BaseDecrypter):
     def load_page(self, number):
         raise NotImplementedError
 
+    async def _load_pages(self, numbers):
+        try:
+            return await asyncio.gather(*(self.load_page_async(n) for n in numbers))
+        finally:
+            CurlLoop.discard()
+
     def handle_pages(self, pyfile):
         try:
             pages = int(re.search(self.PAGES_PATTERN, self.data).group(1))
@@ -275,9 +283,15 @@ class SimpleDecrypter(BaseDecrypter):
         except Exception:
             pages = 1
 
+        numbers = range(2, pages + 1)
+        #: plugins defining a `load_page_async` coroutine load all pages concurrently
+        if hasattr(self, "load_page_async"):
+            data = run_coroutine(self._load_pages(numbers))
+        else:
+            data = (self.load_page(p) for p in numbers)
+
         links = self.links
-        for p in range(2, pages + 1):
-            self.data = self.load_page(p)
+        for self.data in data:
             links.extend(self.get_links())
 
         self.links = links
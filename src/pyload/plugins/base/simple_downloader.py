@@ -13,7 +13,7 @@ from .downloader import BaseDownloader
 class SimpleDownloader(BaseDownloader):
     __name__ = "SimpleDownloader"
     __type__ = "downloader"
-    __version__ = "2.27"
+    __version__ = "2.28"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -274,6 +274,15 @@ class SimpleDownloader(BaseDownloader):
         )
 
     def process(self, pyfile):
+        if not self.is_prefetched():
+            self.resolve_link(pyfile)
+        self.prefetched = 0
+
+        if self.link and not self.last_download:
+            self.log_info(self._("Downloading file..."))
+            self.download(self.link, disposition=self.DISPOSITION)
+
+    def resolve_link(self, pyfile):
         self._prepare()
 
         # TODO: Remove `handle_multi`, use MultiDownloader instead
@@ -312,10 +321,6 @@ class SimpleDownloader(BaseDownloader):
                     self.log_info(self._("Processing as free download..."))
                     self.handle_free(pyfile)
 
-        if self.link and not self.last_download:
-            self.log_info(self._("Downloading file..."))
-            self.download(self.link, disposition=self.DISPOSITION)
-
     def _check_download(self):
         super()._check_download()
         self.check_download()
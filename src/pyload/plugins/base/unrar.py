@@ -3,9 +3,10 @@
 import os
 import re
 import subprocess
+from threading import Thread
 
 from pyload import PKGDIR
-from pyload.core.utils.old import decode
+from pyload.core.utils.convert import to_str
 
 from ..helpers import renice
 from .extractor import ArchiveError, BaseExtractor, CRCError, PasswordError
@@ -14,7 +15,7 @@ from .extractor import ArchiveError, BaseExtractor, CRCError, PasswordError
 class UnRar(BaseExtractor):
     __name__ = "UnRar"
     __type__ = "extractor"
-    __version__ = "1.38"
+    __version__ = "1.41"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -31,6 +32,7 @@ class UnRar(BaseExtractor):
     ]
 
     CMD = "unrar"
+    EARLY = True
     EXTENSIONS = [
         "rar",
         "cab",
@@ -57,6 +59,9 @@ class UnRar(BaseExtractor):
         r"encrypted|damaged|CRC failed|checksum error|corrupt", re.I
     )
     _RE_VERSION = re.compile(r"(?:UN)?RAR\s(\d+\.\d+)", re.I)
+    _RE_NEXTVOL = re.compile(
+        r"\s*Insert disk with (.+?)\s*\[C\]ontinue,\s*\[Q\]uit\s*", re.S
+    )
 
     @classmethod
     def find(cls):
@@ -113,6 +118,20 @@ class UnRar(BaseExtractor):
             if attr[0].startswith("*"):
                 raise PasswordError
 
+    def check_password(self, password=None):
+        #: only lists the headers, no file is decompressed
+        p = self.call_cmd("l", "-v", self.filename, password=password)
+        out, err = (to_str(r.strip(), errors="replace") for r in p.communicate())
+
+        if self._RE_BADPWD.search(err):
+            return False
+
+        for attr in self._RE_FILES.findall(out):
+            if attr[0].startswith("*"):
+                return None
+
+        return True
+
     def repair(self):
         p = self.call_cmd("rc", self.filename)
 
@@ -141,7 +160,7 @@ class UnRar(BaseExtractor):
     def progress(self, process):
         s = ""
         while True:
-            c = process.stdout.read(1)
+            c = to_str(process.stdout.read(1), errors="replace")
             #: Quit loop on eof
             if not c:
                 break
@@ -165,6 +184,56 @@ class UnRar(BaseExtractor):
         self.progress(p)
         out, err = (r.strip() if r else "" for r in p.communicate())
 
+        return self._result(p, err, password)
+
+    def extract_early(self, password, wait_volume):
+        """
+        Extract a multipart archive starting from its first volume, before the
+        next ones are downloaded. `wait_volume(filename)` is called before every
+        next volume, it blocks until the volume is complete and returns False if
+        it never will.
+        """
+        command = "x" if self.fullpath else "e"
+
+        #: pause before every next volume, continue once it is downloaded
+        p = self.early_process = self.call_cmd(
+            command, "-vp", self.filename, self.dest, password=password, stdin=True
+        )
+
+        progress = Thread(target=self.progress, args=(p,), daemon=True)
+        progress.start()
+
+        err = ""
+        while True:
+            data = os.read(p.stderr.fileno(), 4096)
+            if not data:
+                break
+
+            err += to_str(data, errors="replace")
+            m = self._RE_NEXTVOL.search(err)
+            if m is not None:
+                err = err[: m.start()] + err[m.end() :]
+                ready = wait_volume(m.group(1).strip())
+                self.log_debug(f"Next volume {m.group(1).strip()}: {ready}")
+
+                p.stdin.write(b"C\n" if ready else b"Q\n")
+                p.stdin.flush()
+
+        p.stdin.close()
+        p.wait()
+        progress.join()
+
+        return self._result(p, err.strip(), password)
+
+    def stop_early(self):
+        """
+        kill the process of a running `extract_early`.
+        """
+        p = getattr(self, "early_process", None)
+        if p is not None and p.poll() is None:
+            p.kill()
+
+    def _result(self, p, err, password):
         if err:
             if self._RE_BADPWD.search(err):
                 raise PasswordError
@@ -218,13 +287,13 @@ class UnRar(BaseExtractor):
         result = set()
         if not self.fullpath and self.VERSION.startswith("5"):
             # NOTE: Unrar 5 always list full path
-            for filename in decode(out).splitlines():
+            for filename in to_str(out, errors="replace").splitlines():
                 filename = os.path.join(self.dest, os.path.basename(filename.strip()))
                 if os.path.isfile(filename):
                     result.add(os.path.join(self.dest, os.path.basename(filename)))
         else:
             if self.fullpath:
-                for filename in decode(out).splitlines():
+                for filename in to_str(out, errors="replace").splitlines():
                     # Unrar fails to list all directories for some archives
                     filename = filename.strip()
                     while filename:
@@ -235,7 +304,7 @@ class UnRar(BaseExtractor):
                         else:
                             break
             else:
-                for filename in decode(out).splitlines():
+                for filename in to_str(out, errors="replace").splitlines():
                     result.add(os.path.join(self.dest, filename.strip()))
 
         self.files = list(result)
@@ -274,7 +343,12 @@ class UnRar(BaseExtractor):
         self.log_debug("EXECUTE " + " ".join(call))
 
         call = [str(cmd) for cmd in call]
-        p = subprocess.Popen(call, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        p = subprocess.Popen(
+            call,
+            stdin=subprocess.PIPE if kwargs.get("stdin") else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
 
         renice(p.pid, self.priority)
 
@@ -6,11 +6,13 @@ import tarfile
 
 from .extractor import ArchiveError, BaseExtractor, CRCError
 
+BUFFER_SIZE = 1 << 20  #: bytes copied at once
+
 
 class UnTar(BaseExtractor):
     __name__ = "UnTar"
     __type__ = "extractor"
-    __version__ = "0.04"
+    __version__ = "0.05"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -52,12 +54,21 @@ class UnTar(BaseExtractor):
         else:
             t.close()
 
+    def _members(self, tar, fp, size):
+        #: members are read one after another, progress is the archive read
+        for member in tar:
+            yield member
+            self.pyfile.set_progress(fp.tell() * 100 // size)
+
     def extract(self, password=None):
         self.verify(password)
 
         try:
-            with tarfile.open(self.filename, errorlevel=2) as t:
-                t.extractall(self.dest)
+            size = os.path.getsize(self.filename) or 1
+            with open(self.filename, mode="rb") as fp, tarfile.open(
+                fileobj=fp, errorlevel=2, copybufsize=BUFFER_SIZE
+            ) as t:
+                t.extractall(self.dest, members=self._members(t, fp, size))
                 self.files = t.getnames()
             return self.files
 
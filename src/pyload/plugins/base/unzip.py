@@ -2,15 +2,122 @@
 
 import os
 import sys
+import threading
 import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from .extractor import ArchiveError, BaseExtractor, CRCError, PasswordError
 
+BUFFER_SIZE = 1 << 20  #: bytes copied at once
+PREALLOCATE_SIZE = 1 << 20  #: files from this size are allocated before writing
+
+
+def _target(dest, member):
+    """
+    returns the path of a member in `dest`, without its drive, absolute and
+    parent parts, like `ZipFile.extract` does.
+    """
+    arcname = member.filename.replace("/", os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    arcname = os.path.sep.join(
+        x
+        for x in arcname.split(os.path.sep)
+        if x not in ("", os.path.curdir, os.path.pardir)
+    )
+    if os.path.sep == "\\":
+        arcname = zipfile.ZipFile._sanitize_windows_name(arcname, os.path.sep)
+    return os.path.normpath(os.path.join(dest, arcname))
+
+
+def extract_members(filename, dest, password=None, workers=1, progress=None):
+    """
+    Extract a zip archive with up to `workers` threads, each one reading
+    through its own handle of the archive, the biggest members first.
+
+    `progress(percent)` is called whenever the extracted share of the archive
+    grows. Returns the names of the members.
+    """
+    with zipfile.ZipFile(filename) as z:
+        members = z.infolist()
+
+    for member in members:
+        if member.is_dir():
+            os.makedirs(_target(dest, member), exist_ok=True)
+
+    files = sorted(
+        (x for x in members if not x.is_dir()), key=lambda x: x.file_size, reverse=True
+    )
+    total = sum(x.file_size for x in files) or 1
+    state = {"done": 0, "percent": 0}
+
+    lock = threading.Lock()
+    stop = threading.Event()
+    local = threading.local()
+    handles = []
+
+    def extract(member):
+        z = getattr(local, "zip", None)
+        if z is None:
+            z = local.zip = zipfile.ZipFile(filename)
+            with lock:
+                handles.append(z)
+
+        target = _target(dest, member)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        with z.open(member, pwd=password) as src, open(target, mode="wb") as dst:
+            if member.file_size >= PREALLOCATE_SIZE and hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(dst.fileno(), 0, member.file_size)
+                except OSError:
+                    pass
+
+            while not stop.is_set():
+                data = src.read(BUFFER_SIZE)
+                if not data:
+                    break
+                dst.write(data)
+
+                with lock:
+                    state["done"] += len(data)
+                    percent = state["done"] * 100 // total
+                    if percent > state["percent"]:
+                        state["percent"] = percent
+                        if progress is not None:
+                            progress(percent)
+
+    try:
+        if workers > 1 and len(files) > 1:
+            with ThreadPoolExecutor(min(workers, len(files))) as executor:
+                futures = [executor.submit(extract, x) for x in files]
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+
+                    except BaseException:
+                        stop.set()
+                        for x in futures:
+                            x.cancel()
+                        raise
+
+        else:
+            for member in files:
+                extract(member)
+
+    finally:
+        for z in handles:
+            z.close()
+
+    return [x.filename for x in members]
+
 
 class UnZip(BaseExtractor):
     __name__ = "UnZip"
     __type__ = "extractor"
-    __version__ = "1.25"
+    __version__ = "1.28"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -35,16 +142,20 @@ class UnZip(BaseExtractor):
     def find(cls):
         return sys.version_info[:2] >= (2, 6)
 
+    @staticmethod
+    def _pwd(password):
+        return password.encode() if password else None
+
     def list(self, password=None):
         with zipfile.ZipFile(self.filename, "r") as z:
-            z.setpassword(password)
+            z.setpassword(self._pwd(password))
             self.files = z.namelist()
         return self.files
 
     def verify(self, password=None):
         try:
             with zipfile.ZipFile(self.filename, "r") as z:
-                z.setpassword(password)
+                z.setpassword(self._pwd(password))
                 badfile = z.testzip()
                 if badfile is not None:
                     raise CRCError(badfile)
@@ -58,15 +169,54 @@ class UnZip(BaseExtractor):
             else:
                 raise CRCError(exc)
 
-    def extract(self, password=None):
-        self.verify(password)
-
+    def check_password(self, password=None):
+        #: only decrypts the smallest encrypted file
         try:
             with zipfile.ZipFile(self.filename, "r") as z:
-                z.setpassword(password)
-                z.extractall(self.dest)
-                self.files = z.namelist()
+                encrypted = [x for x in z.infolist() if x.flag_bits & 0x1]
+                if not encrypted:
+                    return True
+
+                if not password:
+                    return False
+
+                smallest = min(encrypted, key=lambda x: x.compress_size)
+                with z.open(smallest, pwd=self._pwd(password)) as fp:
+                    while fp.read(1 << 20):
+                        pass
+
+        except (zipfile.BadZipfile, zipfile.LargeZipFile) as exc:
+            if "CRC" not in str(exc):
+                raise ArchiveError(exc)
+            return False  #: passed the header check by chance
+
+        except (RuntimeError, zlib.error):
+            return False
+
+        return True
+
+    def extract(self, password=None):
+        #: members are checked against their CRC while extracted, one thread per
+        #: CPU core (internal plugins have no config to set it)
+        try:
+            self.files = extract_members(
+                self.filename,
+                self.dest,
+                self._pwd(password),
+                os.cpu_count() or 1,
+                self.pyfile.set_progress,
+            )
             return self.files
 
+        except (zipfile.BadZipfile, zipfile.LargeZipFile) as exc:
+            if "CRC" in str(exc):
+                raise CRCError(exc)
+            raise ArchiveError(exc)
+
         except RuntimeError as exc:
+            if "encrypted" in exc.args[0] or "Bad password" in exc.args[0]:
+                raise PasswordError(exc)
+            raise ArchiveError(exc)
+
+        except (OSError, zlib.error) as exc:
             raise ArchiveError(exc)
@@ -6,7 +6,7 @@ from ..base.simple_decrypter import SimpleDecrypter
 class FilefactoryComFolder(SimpleDecrypter):
     __name__ = "FilefactoryComFolder"
     __type__ = "decrypter"
-    __version__ = "0.38"
+    __version__ = "0.39"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -36,3 +36,6 @@ class FilefactoryComFolder(SimpleDecrypter):
 
     def load_page(self, page_n):
         return self.load(self.pyfile.url, get={"page": page_n, "show": 100})
+
+    async def load_page_async(self, page_n):
+        return await self.load_async(self.pyfile.url, get={"page": page_n, "show": 100})
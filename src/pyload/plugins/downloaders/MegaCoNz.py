@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 
 import base64
+import collections
 import json
 import os
 import random
 import re
 import struct
+from concurrent.futures import ThreadPoolExecutor
 
 import Cryptodome.Cipher.AES
 import Cryptodome.Util.Counter
@@ -14,7 +16,6 @@ from pyload.core.network.http.exceptions import BadHeader
 from pyload.core.utils.old import decode
 
 from ..base.downloader import BaseDownloader
-from ..helpers import exists
 
 ############################ General errors ###################################
 # EINTERNAL            (-1): An internal error has occurred. Please submit a bug report, detailing the exact circumstances in which this error occurred
@@ -64,7 +65,7 @@ class MegaCrypto:
     @staticmethod
     def str_to_a32(s):
         # Add padding, we need a string with a length multiple of 4
-        s += "\0" * (-len(s) % 4)
+        s += b"\0" * (-len(s) % 4)
         #: big-endian, unsigned int
         return struct.unpack(">{}I".format(len(s) // 4), s)
 
@@ -145,6 +146,22 @@ class MegaCrypto:
             (),
         )
 
+    @staticmethod
+    def get_cipher(key, offset=0):
+        """
+        Returns the AES-CTR cipher of a file, positioned at the byte `offset`.
+        """
+        k, iv, meta_mac = MegaCrypto.get_cipher_key(key)
+        ctr = Cryptodome.Util.Counter.new(
+            128, initial_value=(((iv[0] << 32) + iv[1]) << 64) + offset // 16
+        )
+        cipher = Cryptodome.Cipher.AES.new(
+            MegaCrypto.a32_to_str(k), Cryptodome.Cipher.AES.MODE_CTR, counter=ctr
+        )
+        if offset % 16:
+            cipher.decrypt(bytes(offset % 16))  #: skip to the offset in the block
+        return cipher
+
     @staticmethod
     def get_chunks(size):
         """
@@ -165,26 +182,72 @@ class MegaCrypto:
     class Checksum:
         """
         interface for checking CBC-MAC checksum.
+
+        The MAC of every chunk only depends on the chunk, so they can be
+        computed in parallel, and are folded in order into the file MAC.
         """
 
         def __init__(self, key):
             k, iv, meta_mac = MegaCrypto.get_cipher_key(key)
-            self.hash = "\0" * 16
+            self.hash = bytes(16)
             self.key = MegaCrypto.a32_to_str(k)
             self.iv = MegaCrypto.a32_to_str(iv[0:2] * 2)
             self.AES = Cryptodome.Cipher.AES.new(
                 self.key, mode=Cryptodome.Cipher.AES.MODE_CBC, IV=self.hash
             )
 
-        def update(self, chunk):
+        def chunk_mac(self, chunk):
+            """
+            Return the CBC-MAC of a chunk, its last block padded with zeros.
+            """
             cbc = Cryptodome.Cipher.AES.new(
                 self.key, mode=Cryptodome.Cipher.AES.MODE_CBC, IV=self.iv
             )
-            for j in range(0, len(chunk), 16):
-                block = chunk[j : j + 16].ljust(16, "\0")
-                hash = cbc.encrypt(block)
+            if len(chunk) % 16:
+                chunk = bytes(chunk) + bytes(-len(chunk) % 16)
+            return cbc.encrypt(chunk)[-16:]
 
-            self.hash = self.AES.encrypt(hash)
+        def fold(self, mac):
+            """
+            Add the CBC-MAC of the next chunk to the checksum.
+            """
+            self.hash = self.AES.encrypt(mac)
+
+        def update(self, chunk):
+            self.fold(self.chunk_mac(chunk))
+
+        def update_file(self, fh, size, workers=1, progress=None):
+            """
+            Authenticate the first `size` bytes read from the file object `fh`.
+
+            Chunk MACs are computed by `workers` threads, with a few chunks read
+            ahead, `progress(percent)` is called after every chunk folded.
+            """
+            done = 0
+            chunks = MegaCrypto.get_chunks(size)
+            pending = collections.deque()
+            with ThreadPoolExecutor(workers) as executor:
+                while True:
+                    #: read a few chunks ahead, so no worker waits for the disk
+                    for chunk_start, chunk_size in chunks:
+                        chunk = fh.read(chunk_size)
+                        if not chunk:
+                            break
+                        pending.append(
+                            (executor.submit(self.chunk_mac, chunk), len(chunk))
+                        )
+                        if len(pending) >= 2 * workers:
+                            break
+
+                    if not pending:
+                        break
+
+                    future, length = pending.popleft()
+                    self.fold(future.result())
+
+                    done += length
+                    if progress is not None:
+                        progress(done * 100 // size)
 
         def digest(self):
             """
@@ -200,7 +263,7 @@ class MegaCrypto:
             so far.
             """
             return "".join(
-                "{:2x}".format(ord(x)) for x in MegaCrypto.a32_to_str(self.digest())
+                "{:02x}".format(x) for x in MegaCrypto.a32_to_str(self.digest())
             )
 
         @staticmethod
@@ -221,7 +284,7 @@ class MegaClient:
         Dispatch a call to the api, see https://mega.co.nz/#developers.
         """
         uid = random.randint(
-            10 << 9, 10 ** 10
+            10 << 9, 10**10
         )  #: : Generate a session id, no idea where to obtain elsewhere
         get_params = {"id": uid}
 
@@ -285,7 +348,7 @@ class MegaClient:
 class MegaCoNz(BaseDownloader):
     __name__ = "MegaCoNz"
     __type__ = "downloader"
-    __version__ = "0.52"
+    __version__ = "0.55"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -301,88 +364,70 @@ class MegaCoNz(BaseDownloader):
         ("GammaC0de", "nitzo2001[AT}yahoo[DOT]com"),
     ]
 
-    FILE_SUFFIX = ".crypted"
+    def setup(self):
+        #: data is decrypted at its offset while written, so any range can be loaded
+        self.chunk_limit = -1
+        self.resume_download = True
 
-    def decrypt_file(self, key):
+    def decrypter(self, key):
         """
-        Decrypts and verifies checksum to the file at 'last_download'.
+        returns the transform decrypting the data of a download from an offset on.
         """
-        k, iv, meta_mac = MegaCrypto.get_cipher_key(key)
-        ctr = Cryptodome.Util.Counter.new(
-            128, initial_value=((iv[0] << 32) + iv[1]) << 64
-        )
-        cipher = Cryptodome.Cipher.AES.new(
-            MegaCrypto.a32_to_str(k), Cryptodome.Cipher.AES.MODE_CTR, counter=ctr
-        )
-
-        self.pyfile.set_status("decrypting")
-        self.pyfile.set_progress(0)
-
-        file_crypted = os.fsdecode(self.last_download)
-        file_decrypted = file_crypted.rsplit(self.FILE_SUFFIX)[0]
-
-        try:
-            f = open(file_crypted, mode="rb")
-            df = open(file_decrypted, mode="wb")
-
-        except IOError as exc:
-            self.fail(exc)
-
-        encrypted_size = os.path.getsize(file_crypted)
+        return lambda offset: MegaCrypto.get_cipher(key, offset).decrypt
 
+    def verify_file(self, key):
+        """
+        Verifies the CBC-MAC checksum of the file at 'last_download', decrypted
+        while it was downloaded.
+        """
         checksum_activated = self.config.get(
             "enabled", default=False, plugin="Checksum"
         )
         check_checksum = self.config.get(
             "check_checksum", default=True, plugin="Checksum"
         )
+        if not (checksum_activated and check_checksum):
+            return
 
-        cbc_mac = (
-            MegaCrypto.Checksum(key) if checksum_activated and check_checksum else None
-        )
-
-        progress = 0
-        for chunk_start, chunk_size in MegaCrypto.get_chunks(encrypted_size):
-            buf = f.read(chunk_size)
-            if not buf:
-                break
-
-            chunk = cipher.decrypt(buf)
-            df.write(chunk)
+        k, iv, meta_mac = MegaCrypto.get_cipher_key(key)
+        file_decrypted = os.fsdecode(self.last_download)
 
-            progress += chunk_size
-            self.pyfile.set_progress((100 // encrypted_size) * progress)
+        self.pyfile.set_status("processing")
+        self.pyfile.set_progress(0)
 
-            if checksum_activated and check_checksum:
-                cbc_mac.update(chunk)
+        try:
+            f = open(file_decrypted, mode="rb")
 
-        self.pyfile.set_progress(100)
+        except IOError as exc:
+            self.fail(exc)
 
-        f.close()
-        df.close()
+        size = os.path.getsize(file_decrypted)
+        cbc_mac = MegaCrypto.Checksum(key)
+        workers = (
+            self.config.get("workers", default=0, plugin="Checksum")
+            or os.cpu_count()
+            or 1
+        )
 
-        self.log_info(self._("File decrypted"))
-        os.remove(file_crypted)
+        with f:
+            cbc_mac.update_file(f, size, workers, self.pyfile.set_progress)
 
-        if checksum_activated and check_checksum:
-            file_mac = cbc_mac.digest()
-            if file_mac == meta_mac:
-                self.log_info(
-                    self._(
-                        'File integrity of "{}" verified by CBC-MAC checksum ({})'
-                    ).format(self.pyfile.name.rsplit(self.FILE_SUFFIX)[0], meta_mac)
-                )
-            else:
-                self.log_warning(
-                    self._(
-                        'CBC-MAC checksum for file "{}" does not match ({} != {})'
-                    ).format(
-                        self.pyfile.name.rsplit(self.FILE_SUFFIX)[0], file_mac, meta_mac
-                    )
-                )
-                self.checksum_failed(file_decrypted, self._("Checksums do not match"))
+        self.pyfile.set_progress(100)
 
-        self.last_download = decode(file_decrypted)
+        file_mac = cbc_mac.digest()
+        if file_mac == meta_mac:
+            self.log_info(
+                self._(
+                    'File integrity of "{}" verified by CBC-MAC checksum ({})'
+                ).format(self.pyfile.name, meta_mac)
+            )
+        else:
+            self.log_warning(
+                self._(
+                    'CBC-MAC checksum for file "{}" does not match ({} != {})'
+                ).format(self.pyfile.name, file_mac, meta_mac)
+            )
+            self.checksum_failed(file_decrypted, self._("Checksums do not match"))
 
     def checksum_failed(self, local_file, msg):
         check_action = self.config.get(
@@ -409,28 +454,6 @@ class MegaCoNz(BaseDownloader):
         os.remove(local_file)
         self.fail(msg)
 
-    def check_exists(self, name):
-        """
-        Because of Mega downloads a temporary encrypted file with the extension of
-        '.crypted', pyLoad cannot correctly detect if the file exists before
-        downloading. This function corrects this.
-
-        Raises Skip() if file exists and 'skip_existing' configuration option is
-        set to True.
-        """
-        if self.pyload.config.get("download", "skip_existing"):
-            storage_folder = self.pyload.config.get("general", "storage_folder")
-            dest_file = os.path.join(
-                storage_folder,
-                self.pyfile.package().folder
-                if self.pyload.config.get("general", "folder_per_package")
-                else "",
-                name,
-            )
-            if exists(dest_file):
-                self.pyfile.name = name
-                self.skip(self._("File exists."))
-
     def process(self, pyfile):
         id = self.info["pattern"]["ID"]
         key = self.info["pattern"]["KEY"]
@@ -475,11 +498,7 @@ class MegaCoNz(BaseDownloader):
 
         self.log_debug(f"Decrypted Attr: {decode(attr)}")
 
-        name = attr["n"]
-
-        self.check_exists(name)
-
-        pyfile.name = name + self.FILE_SUFFIX
+        pyfile.name = attr["n"]
         pyfile.size = res["s"]
 
         time_left = res.get("tl", 0)
@@ -490,7 +509,7 @@ class MegaCoNz(BaseDownloader):
         # self.req.http.c.setopt(pycurl.SSL_CIPHER_LIST, "RC4-MD5:DEFAULT")
 
         try:
-            self.download(res["g"])
+            self.download(res["g"], transform=self.decrypter(key))
 
         except BadHeader as exc:
             if exc.code == 509:
@@ -499,7 +518,4 @@ class MegaCoNz(BaseDownloader):
             else:
                 raise
 
-        self.decrypt_file(key)
-
-        #: Everything is finished and final name can be set
-        pyfile.name = name
+        self.verify_file(key)
@@ -9,7 +9,7 @@ from .MegaCoNz import MegaCoNz, MegaCrypto
 class MegacrypterCom(MegaCoNz):
     __name__ = "MegacrypterCom"
     __type__ = "downloader"
-    __version__ = "0.28"
+    __version__ = "0.29"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -22,7 +22,6 @@ class MegacrypterCom(MegaCoNz):
     __authors__ = [("GonzaloSR", "gonzalo@gonzalosr.com")]
 
     API_URL = "http://megacrypter.com/api"
-    FILE_SUFFIX = ".crypted"
 
     def api_response(self, **kwargs):
         """
@@ -49,11 +48,8 @@ class MegacrypterCom(MegaCoNz):
 
         key = MegaCrypto.base64_decode(info["key"])
 
-        pyfile.name = info["name"] + self.FILE_SUFFIX
-
-        self.download(dl["url"])
+        pyfile.name = info["name"]
 
-        self.decrypt_file(key)
+        self.download(dl["url"], transform=self.decrypter(key))
 
-        #: Everything is finished and final name can be set
-        pyfile.name = info["name"]
+        self.verify_file(key)
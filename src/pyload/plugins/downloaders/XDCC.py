@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 
 import os
+import queue
 import re
-import select
 import socket
 import struct
 import sys
@@ -10,13 +10,23 @@ import threading
 import time
 
 from pyload.core.network.exceptions import Abort
-from pyload.core.utils.old import lock
 
 from ..base.addon import threaded
 from ..base.downloader import BaseDownloader
 
 
 class IRC:
+    """
+    IRC connection shared by the XDCC downloads of one network.
+
+    A reader thread owns the socket: it answers server and CTCP pings and
+    hands every other line to the queue of each thread waiting on the
+    connection, so several downloads can talk to their bots at the same time.
+    DCC offers only go to the download which requested them.
+    """
+
+    IDLE_TIMEOUT = 60  #: seconds an unused connection is kept open
+
     def __init__(self, plugin, nick, ident, realname):
         self.plugin = plugin
         self._ = plugin._
@@ -24,42 +34,196 @@ class IRC:
 
         #: last 4 digits
         self.nick = (
-            "pyload-{:04}".format(time.time() % 10000) if nick == "pyload" else nick
+            "pyload-{:04}".format(int(time.time()) % 10000)
+            if nick == "pyload"
+            else nick
         )
         self.ident = ident
         self.realname = realname
 
         self.irc_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.receive_buffer = ""
-        self.lines = []
+        self.send_lock = threading.Lock()
+        self.queues = {}  #: thread id -> queue of received lines
+        self.queues_lock = threading.Lock()
 
         self.connected = False
+        self.closed = False  #: the connection was lost or closed for good
+        self.identified = False
         self.host = ""
         self.port = 0
 
         self.bot_host = {}
+        self.channels = set()  #: joined channels, lowercase
 
-        self.xdcc_request_time = None
+        self.users = 0
+        self.idle_timer = None
 
-    def _data_available(self):
-        fdset = select.select([self.irc_sock], [], [], 0)
-        return self.irc_sock in fdset[0]
+        self.bot_slots = 1
+        self.bot_requests = {}  #: bot -> plugins holding a request slot, lowercase
+        self.pending = {}  #: bot -> (plugin, thread id) waiting for an offer, lowercase
+        self.slot_cond = threading.Condition(self.lock)
 
-    def _get_response_line(self, timeout=5):
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self._data_available():
-                self.receive_buffer += self.irc_sock.recv(1 << 10)
-                self.lines += self.receive_buffer.split("\r\n")
-                self.receive_buffer = self.lines.pop()
+    def _queue(self):
+        """
+        returns the line queue of the calling thread, subscribing it.
+        """
+        thread_id = threading.get_ident()
+        with self.queues_lock:
+            try:
+                return self.queues[thread_id]
+            except KeyError:
+                q = self.queues[thread_id] = queue.Queue()
+                return q
+
+    def subscribe(self):
+        """
+        subscribe the calling thread with an empty queue, dropping the lines
+        received before.
+        """
+        with self.queues_lock:
+            self.queues[threading.get_ident()] = queue.Queue()
 
-            if self.lines:
-                return self.lines.pop(0)
+    def unsubscribe(self):
+        with self.queues_lock:
+            self.queues.pop(threading.get_ident(), None)
 
-            else:
-                time.sleep(0.1)
+    def _write(self, line):
+        with self.send_lock:
+            self.irc_sock.sendall(f"{line}\r\n".encode("utf-8"))
 
-        return None
+    def _send(self, line):
+        self._queue()  #: do not miss the reply
+        self._write(line)
+
+    def _read_loop(self):
+        buffer = b""
+        try:
+            while True:
+                data = self.irc_sock.recv(1 << 12)
+                if not data:
+                    break
+
+                buffer += data
+                *lines, buffer = buffer.split(b"\r\n")
+                for line in lines:
+                    try:
+                        line = line.decode("utf-8")
+                    except UnicodeDecodeError:
+                        line = line.decode("latin1", "replace")
+
+                    if not line or self._handle_ping(line):
+                        continue
+
+                    owner = self._route_offer(line)
+                    with self.queues_lock:
+                        if owner in self.queues:
+                            self.queues[owner].put(line)
+                        else:
+                            for q in self.queues.values():
+                                q.put(line)
+
+        except OSError:
+            pass
+
+        finally:
+            self.connected = False
+            self.closed = True
+            with self.queues_lock:
+                for q in self.queues.values():
+                    q.put(None)  #: wake up the waiting threads
+
+    def _handle_ping(self, line):
+        """
+        answers server and CTCP pings, returns True if `line` was one.
+        """
+        origin, command, args = self._parse_irc_msg(line)
+
+        if command == "PING":
+            self.plugin.log_debug(f"[{args[0]}] Ping? Pong!")
+            self._write(f"PONG :{args[0]}")
+            return True
+
+        if not origin or command != "PRIVMSG" or len(args) < 2:
+            return False
+
+        sender_nick = origin.split("@")[0].split("!")[0]
+        recipient, text = args[0], args[1]
+        if (
+            not text.startswith("\x01")
+            or not text.endswith("\x01")
+            or recipient[0 : len(self.nick)] != self.nick
+        ):
+            return False
+
+        ctcp_data = text[1:-1].split(" ", 1)
+        ctcp_command = ctcp_data[0]
+        ctcp_args = ctcp_data[1] if len(ctcp_data) > 1 else ""
+
+        if ctcp_command == "VERSION":
+            self.plugin.log_debug(self._("[{}] CTCP VERSION").format(sender_nick))
+            self._write(
+                "NOTICE {} :\x01VERSION {}\x01".format(
+                    sender_nick, "pyLoad! IRC Interface"
+                )
+            )
+
+        elif ctcp_command == "TIME":
+            self.plugin.log_debug(self._("[{}] CTCP TIME").format(sender_nick))
+            self._write(
+                "NOTICE {} :\x01{}\x01".format(
+                    sender_nick, time.strftime("%a %b %d %H:%M:%S %Y")
+                )
+            )
+
+        elif ctcp_command == "PING":
+            self.plugin.log_debug(self._("[{}] Ping? Pong!").format(sender_nick))
+            self._write(
+                "NOTICE {} :\x01PING {}\x01".format(sender_nick, ctcp_args)
+            )  # NOTE: PING is not a typo
+
+        else:
+            return False
+
+        return True
+
+    def _route_offer(self, line):
+        """
+        returns the thread of the download a dcc offer goes to, if `line` is
+        an offer of a bot several downloads are waiting on.
+
+        The download expecting the offered file is preferred, else the one
+        which requested first.
+        """
+        origin, command, args = self._parse_irc_msg(line)
+        if command != "PRIVMSG" or len(args) < 2:
+            return None
+
+        m = re.match(r'\x01DCC SEND "?(?P<NAME>.*?)"? \d+ \d+', args[1])
+        if m is None:
+            return None
+
+        bot = origin.split("@")[0].split("!")[0].lower()
+        with self.lock:
+            pending = self.pending.get(bot)
+            if not pending:
+                return None
+
+            owner = next(
+                (x for x in pending if x[0].pyfile.name == m.group("NAME")),
+                pending[0],
+            )
+            pending.remove(owner)
+            return owner[1]
+
+    def _get_response_line(self, timeout=5):
+        q = self._queue()
+        if not self.connected and q.empty():
+            raise ConnectionError(self._("IRC connection closed"))
+
+        try:
+            return q.get(timeout=timeout)
+        except queue.Empty:
+            return None
 
     def _parse_irc_msg(self, line):
         """
@@ -84,7 +248,6 @@ class IRC:
 
         return origin, command, args
 
-    @lock
     def connect_server(self, host, port):
         """
         Connect to the IRC server and wait for RPL_WELCOME message.
@@ -97,28 +260,29 @@ class IRC:
 
         self.plugin.log_info(self._("Connecting to: {}:{}").format(host, port))
 
-        self.irc_sock.setTimeout(30)
+        self.irc_sock.settimeout(30)
         self.irc_sock.connect((host, port))
-        self.irc_sock.setTimeout(None)
+        self.irc_sock.settimeout(None)
 
-        self.irc_sock.send("NICK {}\r\n".format(self.nick))
-        self.irc_sock.send(
-            "USER {} {} bla :{}\r\n".format(self.ident, host, self.realname)
-        )
+        self.connected = True
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+        self._send("NICK {}".format(self.nick))
+        self._send("USER {} {} bla :{}".format(self.ident, host, self.realname))
 
         start_time = time.time()
         while time.time() - start_time < 30:
             origin, command, args = self.get_irc_command()
             if command == "001":  #: RPL_WELCOME
-                self.connected = True
                 self.host = host
                 self.port = port
 
                 start_time = time.time()
-                while (
-                    self._get_response_line() and time.time() - start_time < 30
-                ):  #: Skip MOTD
-                    pass
+                while time.time() - start_time < 30:  #: Skip MOTD
+                    origin, command, args = self.get_irc_command()
+                    #: RPL_ENDOFMOTD, ERR_NOMOTD
+                    if command is None or command in ("376", "422"):
+                        break
 
                 self.plugin.log_debug(
                     self._("Successfully connected to {}:{}").format(host, port)
@@ -130,13 +294,15 @@ class IRC:
 
         return False
 
-    @lock
     def disconnect_server(self):
         if self.connected:
             self.plugin.log_info(
                 self._("Diconnecting from {}:{}").format(self.host, self.port)
             )
-            self.irc_sock.send("QUIT :byebye\r\n")
+            try:
+                self._write("QUIT :byebye")
+            except OSError:
+                pass
             self.plugin.log_debug("Disconnected")
             self.connected = False
 
@@ -145,77 +311,22 @@ class IRC:
                 self._("Not connected to server, cannot disconnect")
             )
 
+        try:
+            self.irc_sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         self.irc_sock.close()
 
-    @lock
     def get_irc_command(self):
-        origin, command, args = None, None, None
-        while True:
-            line = self._get_response_line()
-            origin, command, args = self._parse_irc_msg(line)
-
-            if command == "PING":
-                self.plugin.log_debug(f"[{args[0]}] Ping? Pong!")
-                self.irc_sock.send("PONG :{}\r\n".format(args[0]))
-
-            elif origin and command == "PRIVMSG":
-                sender_nick = origin.split("@")[0].split("!")[0]
-                recipient = args[0]
-                text = args[1]
-
-                if text[0] == "\x01" and text[-1] == "\x01":  #: CTCP
-                    ctcp_data = text[1:-1].split(" ", 1)
-                    ctcp_command = ctcp_data[0]
-                    ctcp_args = ctcp_data[1] if len(ctcp_data) > 1 else ""
-
-                    if recipient[0 : len(self.nick)] == self.nick:
-                        if ctcp_command == "VERSION":
-                            self.plugin.log_debug(
-                                self._("[{}] CTCP VERSION").format(sender_nick)
-                            )
-                            self.irc_sock.send(
-                                "NOTICE {} :\x01VERSION {}\x01\r\n".format(
-                                    sender_nick, "pyLoad! IRC Interface"
-                                )
-                            )
-
-                        elif ctcp_command == "TIME":
-                            self.plugin.log_debug(
-                                self._("[{}] CTCP TIME").format(sender_nick)
-                            )
-                            self.irc_sock.send(
-                                "NOTICE {} :\x01{}\x01\r\n".format(
-                                    sender_nick, time.strftime("%a %b %d %H:%M:%S %Y")
-                                )
-                            )
-
-                        elif ctcp_command == "PING":
-                            self.plugin.log_debug(
-                                self._("[{}] Ping? Pong!").format(sender_nick)
-                            )
-                            self.irc_sock.send(
-                                "NOTICE {} :\x01PING {}\x01\r\n".format(
-                                    sender_nick, ctcp_args
-                                )
-                            )  # NOTE: PING is not a typo
-
-                        else:
-                            break
-
-                else:
-                    break
+        return self._parse_irc_msg(self._get_response_line())
 
-            else:
-                break
-
-        return origin, command, args
-
-    @lock
     def join_channel(self, chan):
         chan = "#" + chan if chan[0] != "#" else chan
+        if chan.lower() in self.channels:
+            return True
 
         self.plugin.log_info(self._("Joining channel {}").format(chan))
-        self.irc_sock.send("JOIN {}\r\n".format(chan))
+        self._send("JOIN {}".format(chan))
 
         start_time = time.time()
         while time.time() - start_time < 30:
@@ -235,12 +346,15 @@ class IRC:
 
             elif command == "353" and args[2].lower() == chan.lower():  #: RPL_NAMREPLY
                 self.plugin.log_debug(f"Successfully joined channel {chan}")
+                self.channels.add(chan.lower())
                 return True
 
         return False
 
-    @lock
     def nickserv_identify(self, password):
+        if self.identified:
+            return
+
         self.plugin.log_info(self._("Authenticating nickname"))
 
         bot = "nickserv"
@@ -252,7 +366,7 @@ class IRC:
             )
             return
 
-        self.irc_sock.send("PRIVMSG {} :identify {}\r\n".format(bot, password))
+        self._send("PRIVMSG {} :identify {}".format(bot, password))
 
         start_time = time.time()
         while time.time() - start_time < 30:
@@ -270,13 +384,10 @@ class IRC:
             ):
                 continue
 
-            try:
-                text = str(args[1], "utf-8")
-            except UnicodeDecodeError:
-                text = str(args[1], "latin1", "replace")
-
+            text = args[1]
             sender_nick = origin.split("@")[0].split("!")[0]
             self.plugin.log_info(self._("PrivMsg: <{}> {}").format(sender_nick, text))
+            self.identified = True
             break
 
         else:
@@ -284,8 +395,10 @@ class IRC:
                 self._("'{}' did not respond to the request").format(bot)
             )
 
-    @lock
     def send_invite_request(self, bot, chan, password):
+        if "#" + chan.lower() in self.channels:
+            return
+
         bot_host = self.get_bot_host(bot)
         if bot_host:
             self.plugin.log_info(
@@ -295,9 +408,7 @@ class IRC:
             self.plugin.log_warning(self._("Cannot send invite request"))
             return
 
-        self.irc_sock.send(
-            "PRIVMSG {} :enter #{} {} {}\r\n".format(bot, chan, self.nick, password)
-        )
+        self._send("PRIVMSG {} :enter #{} {} {}".format(bot, chan, self.nick, password))
         start_time = time.time()
         while time.time() - start_time < 30:
             origin, command, args = self.get_irc_command()
@@ -314,11 +425,7 @@ class IRC:
             ):
                 continue
 
-            try:
-                text = str(args[1], "utf-8")
-            except UnicodeDecodeError:
-                text = str(args[1], "latin1", "replace")
-
+            text = args[1]
             sender_nick = origin.split("@")[0].split("!")[0]
             if command == "INVITE":
                 self.plugin.log_info(self._("Got invite to #{}").format(chan))
@@ -335,10 +442,9 @@ class IRC:
                 self._("'{}' did not respond to the request").format(bot)
             )
 
-    @lock
     def is_bot_online(self, bot):
         self.plugin.log_info(self._("Checking if bot '{}' is online").format(bot))
-        self.irc_sock.send("WHOIS {}\r\n".format(bot))
+        self._send("WHOIS {}".format(bot))
 
         start_time = time.time()
         while time.time() - start_time < 30:
@@ -361,14 +467,10 @@ class IRC:
                 self.bot_host[bot] = args[3]  #: bot host
                 return True
 
-            else:
-                time.sleep(0.1)
-
         else:
             self.plugin.log_error(self._("Server did not respond in a reasonable time"))
             return False
 
-    @lock
     def get_bot_host(self, bot):
         bot_host = self.bot_host.get(bot)
         if bot_host:
@@ -381,100 +483,107 @@ class IRC:
             else:
                 return None
 
-    @lock
-    def xdcc_request_pack(self, bot, pack):
+    def acquire_bot_slot(self, bot, plugin, timeout=1):
+        """
+        wait up to `timeout` seconds for a free request slot of `bot`, returns
+        True once `plugin` holds one.
+        """
+        with self.slot_cond:
+            requests = self.bot_requests.setdefault(bot.lower(), [])
+            if plugin not in requests:
+                if len(requests) >= self.bot_slots:
+                    self.slot_cond.wait(timeout)
+                    if len(requests) >= self.bot_slots:
+                        return False
+                requests.append(plugin)
+            return True
+
+    def release_bot_slot(self, bot, plugin):
+        with self.slot_cond:
+            requests = self.bot_requests.get(bot.lower(), [])
+            if plugin in requests:
+                requests.remove(plugin)
+            self.pending[bot.lower()] = [
+                x for x in self.pending.get(bot.lower(), []) if x[0] is not plugin
+            ]
+            self.slot_cond.notify_all()
+
+    def xdcc_request_pack(self, bot, pack, plugin):
         self.plugin.log_info(self._("Requesting pack #{}").format(pack))
-        self.xdcc_request_time = time.time()
-        self.irc_sock.send("PRIVMSG {} :xdcc send #{}\r\n".format(bot, pack))
+        with self.lock:
+            pending = self.pending.setdefault(bot.lower(), [])
+            if not any(x[0] is plugin for x in pending):
+                pending.append((plugin, threading.get_ident()))
+        self._send("PRIVMSG {} :xdcc send #{}".format(bot, pack))
+        return time.time()
 
-    @lock
     def xdcc_cancel_pack(self, bot):
-        if self.xdcc_request_time:
-            self.plugin.log_info(self._("Requesting XDCC cancellation"))
-            self.xdcc_request_time = None
-            self.irc_sock.send("PRIVMSG {} :xdcc cancel\r\n".format(bot))
-
-        else:
-            self.plugin.log_warning(self._("No XDCC request pending, cannot cancel"))
+        self.plugin.log_info(self._("Requesting XDCC cancellation"))
+        self._send("PRIVMSG {} :xdcc cancel".format(bot))
 
-    @lock
     def xdcc_request_resume(self, bot, dcc_port, file_name, resume_position):
-        if self.xdcc_request_time:
-            bot_host = self.get_bot_host(bot)
+        bot_host = self.get_bot_host(bot)
 
-            self.plugin.log_info(
-                self._("Requesting XDCC resume of '{}' at position {}").format(
-                    file_name, resume_position
-                )
+        self.plugin.log_info(
+            self._("Requesting XDCC resume of '{}' at position {}").format(
+                file_name, resume_position
             )
+        )
 
-            self.irc_sock.send(
-                'PRIVMSG {} :\x01DCC RESUME "{}" {} {}\x01\r\n'.format(
-                    bot, os.fsdecode(file_name), dcc_port, resume_position
-                )
+        self._send(
+            'PRIVMSG {} :\x01DCC RESUME "{}" {} {}\x01'.format(
+                bot, os.fsdecode(file_name), dcc_port, resume_position
             )
+        )
 
-            start_time = time.time()
-            while time.time() - start_time < 30:
-                origin, command, args = self.get_irc_command()
-
-                # Private message from bot to us?
-                if (
-                    origin
-                    and command
-                    and args
-                    and "@" in origin
-                    and (
-                        origin[0 : len(bot)] == bot
-                        or bot_host
-                        and origin.split("@")[1] == bot_host
-                    )
-                    and args[0][0 : len(self.nick)] == self.nick
-                    and command in ("PRIVMSG", "NOTICE")
-                ):
+        start_time = time.time()
+        while time.time() - start_time < 30:
+            origin, command, args = self.get_irc_command()
 
-                    try:
-                        text = str(args[1], "utf-8")
-                    except UnicodeDecodeError:
-                        text = str(args[1], "latin1", "replace")
+            # Private message from bot to us?
+            if (
+                origin
+                and command
+                and args
+                and "@" in origin
+                and (
+                    origin[0 : len(bot)] == bot
+                    or bot_host
+                    and origin.split("@")[1] == bot_host
+                )
+                and args[0][0 : len(self.nick)] == self.nick
+                and command in ("PRIVMSG", "NOTICE")
+            ):
 
-                    sender_nick = origin.split("@")[0].split("!")[0]
-                    self.plugin.log_debug(
-                        self._("PrivMsg: <{}> {}").format(sender_nick, text)
-                    )
+                text = args[1]
+                sender_nick = origin.split("@")[0].split("!")[0]
+                self.plugin.log_debug(
+                    self._("PrivMsg: <{}> {}").format(sender_nick, text)
+                )
 
-                    m = re.match(
-                        r"\x01DCC ACCEPT .*? {} (?P<RESUME_POS>\d+)\x01".format(
-                            dcc_port
-                        ),
-                        text,
-                    )
-                    if m:
-                        self.plugin.log_debug(
-                            self._(
-                                "Bot '{}' acknowledged resume at position {}"
-                            ).format(sender_nick, m.group("RESUME_POS"))
+                m = re.match(
+                    r"\x01DCC ACCEPT .*? {} (?P<RESUME_POS>\d+)\x01".format(dcc_port),
+                    text,
+                )
+                if m:
+                    self.plugin.log_debug(
+                        self._("Bot '{}' acknowledged resume at position {}").format(
+                            sender_nick, m.group("RESUME_POS")
                         )
-                        return int(m.group("RESUME_POS"))
-
-                else:
-                    time.sleep(0.1)
-
-            self.plugin.log_warning(
-                self._("Timeout while waiting for resume acknowledge, not resuming")
-            )
+                    )
+                    return int(m.group("RESUME_POS"))
 
-        else:
-            self.plugin.log_error(self._("No XDCC request pending, cannot resume"))
+        self.plugin.log_warning(
+            self._("Timeout while waiting for resume acknowledge, not resuming")
+        )
 
         return 0
 
-    @lock
     def xdcc_get_pack_info(self, bot, pack):
         bot_host = self.get_bot_host(bot)
 
         self.plugin.log_info(self._("Requesting pack #{} info").format(pack))
-        self.irc_sock.send("PRIVMSG {} :xdcc info #{}\r\n".format(bot, pack))
+        self._send("PRIVMSG {} :xdcc info #{}".format(bot, pack))
 
         info = {}
         start_time = time.time()
@@ -495,11 +604,7 @@ class IRC:
                 and command in ("PRIVMSG", "NOTICE")
             ):
 
-                try:
-                    text = str(args[1], "utf-8")
-                except UnicodeDecodeError:
-                    text = str(args[1], "latin1", "replace")
-
+                text = args[1]
                 pack_info = text.split()
                 if pack_info[0].lower() == "filename":
                     self.plugin.log_debug(f"Filename: '{pack_info[1]}'")
@@ -519,8 +624,6 @@ class IRC:
                 if len(info) > 2:  #: got both name and size
                     break
 
-                time.sleep(0.1)
-
         else:
             if len(info) == 0:
                 self.plugin.log_error(
@@ -531,10 +634,91 @@ class IRC:
         return info
 
 
+class IRCSessions:
+    """
+    Keeps one IRC connection per network, shared by all its XDCC downloads.
+
+    A connection is opened (and the nickname identified) by the first download
+    and closed `IRC.IDLE_TIMEOUT` seconds after the last one released it, so
+    queued packs do not reconnect for every file.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}  #: (host, port) -> IRC
+
+    def acquire(self, plugin, host, port, nick, ident, realname):
+        """
+        returns the connected IRC session of `host`, opening it if needed.
+        """
+        key = (host.lower(), port)
+        with self.lock:
+            irc = self.sessions.get(key)
+            if irc is not None and irc.closed:
+                del self.sessions[key]
+                irc = None
+
+            if irc is None:
+                irc = self.sessions[key] = IRC(plugin, nick, ident, realname)
+
+            irc.users += 1
+            if irc.idle_timer is not None:
+                irc.idle_timer.cancel()
+                irc.idle_timer = None
+
+        with irc.lock:
+            irc.plugin = plugin
+            try:
+                if irc.closed or (
+                    not irc.connected and not irc.connect_server(host, port)
+                ):
+                    raise ConnectionError(
+                        plugin._("Connection to {}:{} failed").format(host, port)
+                    )
+
+            except BaseException:
+                self.release(irc, close=True)
+                raise
+
+        return irc
+
+    def release(self, irc, close=False):
+        with self.lock:
+            irc.users -= 1
+            if irc.users > 0 and not close:
+                return
+
+            if close or not irc.connected:
+                self._close(irc)
+
+            else:
+                irc.idle_timer = threading.Timer(irc.IDLE_TIMEOUT, self._expire, [irc])
+                irc.idle_timer.daemon = True
+                irc.idle_timer.start()
+
+    def _expire(self, irc):
+        with self.lock:
+            if irc.users <= 0:
+                self._close(irc)
+
+    def _close(self, irc):
+        irc.closed = True
+        for k, v in list(self.sessions.items()):
+            if v is irc:
+                del self.sessions[k]
+        if irc.connected:
+            irc.disconnect_server()
+        else:
+            irc.irc_sock.close()
+
+
+IRC_SESSIONS = IRCSessions()
+
+
 class XDCC(BaseDownloader):
     __name__ = "XDCC"
     __type__ = "downloader"
-    __version__ = "0.48"
+    __version__ = "0.52"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -554,6 +738,7 @@ class XDCC(BaseDownloader):
             "Invite bots options (format ircserver/channel/invitebot/password, ...)",
             "",
         ),
+        ("bot_slots", "int", "Max parallel pack requests per bot", 1),
     ]
 
     __description__ = """Download from IRC XDCC bot"""
@@ -570,6 +755,7 @@ class XDCC(BaseDownloader):
 
         self.irc_client = None
         self.exc_info = None
+        self.xdcc_request_time = None
 
         self.dcc_port = 0
         self.dcc_file_name = ""
@@ -579,7 +765,11 @@ class XDCC(BaseDownloader):
         self.multi_dl = False
 
     def xdcc_send_resume(self, resume_position):
-        if not self.config.get("try_resume") or not self.dcc_sender_bot:
+        if (
+            not self.config.get("try_resume")
+            or not self.dcc_sender_bot
+            or not self.xdcc_request_time
+        ):
             return 0
 
         else:
@@ -625,70 +815,77 @@ class XDCC(BaseDownloader):
 
         self.pyfile.set_custom_status("connect irc")
 
-        self.irc_client = IRC(self, nick, ident, realname)
         for _ in range(3):
             try:
-                if self.irc_client.connect_server(host, port):
-                    try:
-                        if nick_pw:
-                            self.irc_client.nickserv_identify(nick_pw)
-
-                        for opt in invite_opts:
-                            if (
-                                opt[0].lower() == host.lower()
-                                and opt[1].lower() == chan.lower()
-                            ):
-                                self.irc_client.send_invite_request(
-                                    opt[2], opt[1], opt[3]
-                                )
-                                break
-
-                        if not self.irc_client.join_channel(chan):
-                            self.fail(self._("Cannot join channel"))
-
-                        if not self.irc_client.is_bot_online(bot):
-                            self.fail(self._("Bot is offline"))
-
-                        self.pyfile.set_status("waiting")
-
-                        self.irc_client.xdcc_request_pack(bot, pack)
-
-                        # Main IRC loop
-                        while (
-                            not self.pyfile.abort or self.dl_started
-                        ) and not self.dl_finished:
-                            if not self.dl_started:
-                                if self.request_again:
-                                    if (
-                                        time.time() - self.irc_client.xdcc_request_time
-                                        > 300
-                                    ):
-                                        self.irc_client.xdcc_request_pack(bot, pack)
-                                        self.request_again = False
-
-                                else:
-                                    if (
-                                        self.irc_client.xdcc_request_time
-                                        and time.time()
-                                        - self.irc_client.xdcc_request_time
-                                        > 90
-                                    ):
-                                        self.irc_client.disconnect_server()
-                                        self.log_error(
-                                            self._("XDCC Bot did not answer")
-                                        )
-                                        self.retry(
-                                            3, 60, self._("XDCC Bot did not answer")
+                self.irc_client = IRC_SESSIONS.acquire(
+                    self, host, port, nick, ident, realname
+                )
+                try:
+                    self.irc_client.bot_slots = max(self.config.get("bot_slots"), 1)
+
+                    if nick_pw:
+                        self.irc_client.nickserv_identify(nick_pw)
+
+                    for opt in invite_opts:
+                        if (
+                            opt[0].lower() == host.lower()
+                            and opt[1].lower() == chan.lower()
+                        ):
+                            self.irc_client.send_invite_request(opt[2], opt[1], opt[3])
+                            break
+
+                    if not self.irc_client.join_channel(chan):
+                        self.fail(self._("Cannot join channel"))
+
+                    if not self.irc_client.is_bot_online(bot):
+                        self.fail(self._("Bot is offline"))
+
+                    self.pyfile.set_status("waiting")
+
+                    #: Wait for a free slot of the bot, shared with the other downloads,
+                    #: without queueing the lines received meanwhile
+                    self.irc_client.unsubscribe()
+                    while not self.irc_client.acquire_bot_slot(bot, self):
+                        self.check_status()
+
+                    #: replies to the requests of other downloads are no concern of ours
+                    self.irc_client.subscribe()
+                    self.xdcc_request_time = self.irc_client.xdcc_request_pack(
+                        bot, pack, self
+                    )
+
+                    # Main IRC loop
+                    while (
+                        not self.pyfile.abort or self.dl_started
+                    ) and not self.dl_finished:
+                        if not self.dl_started:
+                            if self.request_again:
+                                if time.time() - self.xdcc_request_time > 300:
+                                    self.xdcc_request_time = (
+                                        self.irc_client.xdcc_request_pack(
+                                            bot, pack, self
                                         )
+                                    )
+                                    self.request_again = False
 
-                            origin, command, args = self.irc_client.get_irc_command()
-                            self.proccess_irc_command(origin, command, args)
+                            else:
+                                if (
+                                    self.xdcc_request_time
+                                    and time.time() - self.xdcc_request_time > 90
+                                ):
+                                    self.log_error(self._("XDCC Bot did not answer"))
+                                    self.retry(3, 60, self._("XDCC Bot did not answer"))
 
-                            if self.exc_info:
-                                raise self.exc_info
+                        origin, command, args = self.irc_client.get_irc_command()
+                        self.proccess_irc_command(origin, command, args)
 
-                    finally:
-                        self.irc_client.disconnect_server()
+                        if self.exc_info:
+                            raise self.exc_info[1].with_traceback(self.exc_info[2])
+
+                finally:
+                    self.irc_client.release_bot_slot(bot, self)
+                    self.irc_client.unsubscribe()
+                    IRC_SESSIONS.release(self.irc_client)
 
                 return
 
@@ -746,10 +943,7 @@ class XDCC(BaseDownloader):
         ):
             return
 
-        try:
-            text = str(args[1], "utf-8")
-        except UnicodeDecodeError:
-            text = str(args[1], "latin1", "replace")
+        text = args[1]  #: decoded by the reader of the connection
 
         sender_nick = origin.split("@")[0].split("!")[0]
         self.log_debug(f"PrivMsg: <{sender_nick}> {text}")
@@ -796,7 +990,7 @@ class XDCC(BaseDownloader):
             self.pyfile.set_status("downloading")
 
             dl_folder = os.path.join(
-                self.pyload.config.get("general", "storage_folder"),
+                self.pyload.storage.get_root(self.pyfile.package()),
                 self.pyfile.package().folder
                 if self.pyload.config.get("general", "folder_per_package")
                 else "",
@@ -820,7 +1014,7 @@ class XDCC(BaseDownloader):
                 ip,
                 port,
                 dl_file,
-                progressNotify=self.pyfile.set_progress,
+                progress_notify=self.pyfile.set_progress,
                 resume=self.xdcc_send_resume,
             )
             if newname and newname != dl_file:
@@ -838,9 +1032,14 @@ class XDCC(BaseDownloader):
 
         except Exception as exc:
             bot = self.info["pattern"]["BOT"]
-            self.irc_client.xdcc_cancel_pack(bot)
+            if self.xdcc_request_time:
+                self.xdcc_request_time = None
+                self.irc_client.xdcc_cancel_pack(bot)
 
             if not self.exc_info:
                 self.exc_info = sys.exc_info()  #: pass the exception to the main thread
 
+        finally:
+            self.irc_client.unsubscribe()
+
         self.dl_finished = True
@@ -8,7 +8,7 @@ from ..base.xfs_downloader import XFSDownloader
 class XFileSharing(XFSDownloader):
     __name__ = "XFileSharing"
     __type__ = "downloader"
-    __version__ = "0.65"
+    __version__ = "0.66"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -62,7 +62,9 @@ class XFileSharing(XFSDownloader):
             # NOTE: Don't call get_info here to reduce overhead
             self.premium = self.account.info["data"]["premium"]
         else:
-            self.req = self.pyload.request_factory.get_request(self.classname)
+            self.req = self.pyload.request_factory.get_request(
+                self.classname, pooled=True
+            )
             self.premium = False
 
     # TODO: Recheck in 0.6.x
@@ -5,50 +5,27 @@ import operator
 import os
 import re
 import subprocess
+import threading
 import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import timedelta
 from functools import reduce
 from xml.dom.minidom import parseString as parse_xml
 
 from pyload import PKGDIR
 from pyload.core.network.cookie_jar import CookieJar
-from pyload.core.network.exceptions import Abort, Skip
+from pyload.core.network.exceptions import Skip
 from pyload.core.network.http.http_request import HTTPRequest
+from pyload.core.utils.convert import to_str
+from pyload.core.utils.old import safejoin
 
 from ..base.downloader import BaseDownloader
 from ..helpers import exists, is_executable, renice, replace_patterns, which
 
 
-class BIGHTTPRequest(HTTPRequest):
-    """
-    Overcome HTTPRequest's load() size limit to allow loading very big web pages by
-    overrding HTTPRequest's write() function.
-    """
-
-    # TODO: Add 'limit' parameter to HTTPRequest in v0.6.x
-    def __init__(self, cookies=None, options=None, limit=2_000_000):
-        self.limit = limit
-        super().__init__(cookies=cookies, options=options)
-
-    def write(self, buf):
-        """
-        writes response.
-        """
-        if self.limit and self.rep.tell() > self.limit or self.abort:
-            rep = self.getResponse()
-            if self.abort:
-                raise Abort
-            with open("response.dump", mode="wb") as fp:
-                fp.write(rep)
-            raise Exception("Loaded Url exceeded limit")
-
-        self.rep.write(buf)
-
-
 class Ffmpeg:
     _RE_DURATION = re.compile(r"Duration: (\d{2}):(\d{2}):(\d{2})\.(\d{2}),")
-    _RE_TIME = re.compile(r"time=(\d{2}):(\d{2}):(\d{2})\.(\d{2})")
     _RE_VERSION = re.compile((r"ffmpeg version (.+?) "))
 
     CMD = None
@@ -57,6 +34,7 @@ class Ffmpeg:
     start_time = (0, 0)
     output_filename = None
     error_message = ""
+    duration = 0
 
     def __init__(self, priority, plugin=None):
         self.plugin = plugin
@@ -93,7 +71,7 @@ class Ffmpeg:
             p = subprocess.Popen(
                 [cmd, "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE
             )
-            out, err = (r.strip() if r else "" for r in p.communicate())
+            out, err = (to_str(r).strip() if r else "" for r in p.communicate())
         except OSError:
             return False
 
@@ -154,91 +132,81 @@ class Ffmpeg:
             ]
         )
 
-        call = [self.CMD] + args + [self.output_filename]
+        call = (
+            [self.CMD, "-hide_banner", "-nostats", "-progress", "pipe:1"]
+            + args
+            + [self.output_filename]
+        )
         p = subprocess.Popen(call, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
         renice(p.pid, self.priority)
 
-        duration = self._find_duration(p)
-        if duration:
-            last_line = self._progress(p, duration)
-        else:
-            last_line = ""
+        #: ffmpeg logs to stderr, read it aside so it never fills up the pipe
+        self.duration = 0
+        log = []
+        reader = threading.Thread(target=self._read_log, args=(p, log), daemon=True)
+        reader.start()
+
+        self._progress(p)
 
-        out, err = (r.strip() if r else "" for r in p.communicate())
-        if err or p.returncode:
-            self.error_message = last_line
+        p.wait()
+        reader.join()
+        if p.returncode:
+            self.error_message = log[-1] if log else ""
             return False
 
         else:
             self.error_message = ""
             return True
 
-    def _find_duration(self, process):
-        duration = 0
-        while True:
-            line = process.stderr.readline()  #: ffmpeg writes to stderr
+    @staticmethod
+    def _seconds(hours, minutes, seconds, centiseconds):
+        return (
+            int(hours) * 3600
+            + int(minutes) * 60
+            + int(seconds)
+            + int(centiseconds) / 100.0
+        )
 
-            #: Quit loop on eof
+    def _read_log(self, process, log):
+        start_time = self.start_time[0] * 60 + self.start_time[1]
+        for line in process.stderr:
+            line = to_str(line, errors="replace").strip()
             if not line:
-                break
-
-            m = self._RE_DURATION.search(line)
-            if m is not None:
-                duration = sum(
-                    int(v)
-                    * [
-                        timedelta(hours=100).seconds,
-                        timedelta(minutes=100).seconds,
-                        100,
-                        1,
-                    ][i]
-                    for i, v in enumerate(m.groups())
-                )
-                break
-
-        return duration
+                continue
 
-    def _progress(self, process, duration):
-        line = ""
-        last_line = ""
-        while True:
-            c = process.stderr.read(1)  #: ffmpeg writes to stderr
+            log.append(line)
+            if not self.duration:
+                m = self._RE_DURATION.search(line)
+                if m is not None:
+                    self.duration = max(self._seconds(*m.groups()) - start_time, 1)
 
-            #: Quit loop on eof
-            if not c:
-                break
+    def _progress(self, process):
+        """
+        reads the `key=value` blocks ffmpeg writes to stdout with `-progress`,
+        each one ending with a `progress=continue` (or `progress=end`) line.
+        """
+        current_time = 0
+        for line in process.stdout:
+            key, _, value = to_str(line, errors="replace").strip().partition("=")
 
-            elif c == "\r":
-                last_line = line.strip("\r\n")
-                line = ""
-                m = self._RE_TIME.search(last_line)
-                if m is not None:
-                    current_time = sum(
-                        int(v)
-                        * [
-                            timedelta(hours=100).seconds,
-                            timedelta(minutes=100).seconds,
-                            100,
-                            1,
-                        ][i]
-                        for i, v in enumerate(m.groups())
-                    )
-                    if self.plugin:
-                        progress = current_time * 100 // duration
-                        self.plugin.pyfile.set_progress(progress)
+            #: `out_time_ms` is in microseconds as well
+            if key in ("out_time_us", "out_time_ms") and value.isdigit():
+                current_time = int(value) / 1_000_000.0
 
-            else:
-                line += c
-            continue
+            elif key == "progress" and self.plugin:
+                if value == "end":
+                    self.plugin.pyfile.set_progress(100)
 
-        return last_line  #: Last line may contain error message
+                elif self.duration:
+                    progress = min(int(current_time * 100 // self.duration), 100)
+                    self.plugin.pyfile.set_progress(progress)
 
 
 class YoutubeCom(BaseDownloader):
     __name__ = "YoutubeCom"
     __type__ = "downloader"
-    __version__ = "0.69"
+    __version__ = "0.73"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -794,21 +762,7 @@ class YoutubeCom(BaseDownloader):
         if "a" not in self.formats[chosen_fmt]["type"]:
             file_suffix = ".video" + file_suffix
 
-        self.pyfile.name = self.file_name + file_suffix
-
-        try:
-            filename = self.download(url, disposition=False)
-        except Skip as exc:
-            filename = os.path.join(
-                self.pyload.config.get("general", "storage_folder"),
-                self.pyfile.package().folder,
-                self.pyfile.name,
-            )
-            self.log_info(
-                self._("Download skipped: {} due to {}").format(self.pyfile.name, exc)
-            )
-
-        return filename, chosen_fmt
+        return url, self.file_name + file_suffix, chosen_fmt
 
     def _handle_audio(self, video_fmt):
         desired_fmt = self.config.get("afmt") or 141
@@ -901,13 +855,19 @@ class YoutubeCom(BaseDownloader):
             else ".m4a"
         )
 
-        self.pyfile.name = self.file_name + file_suffix
+        return url, self.file_name + file_suffix, chosen_fmt
+
+    def _download_stream(self, url, name):
+        """
+        downloads a stream with the request of the pyfile.
+        """
+        self.pyfile.name = name
 
         try:
             filename = self.download(url, disposition=False)
         except Skip as exc:
             filename = os.path.join(
-                self.pyload.config.get("general", "storage_folder"),
+                self.pyload.storage.get_root(self.pyfile.package()),
                 self.pyfile.package().folder,
                 self.pyfile.name,
             )
@@ -915,7 +875,77 @@ class YoutubeCom(BaseDownloader):
                 self._("Download skipped: {} due to {}").format(self.pyfile.name, exc)
             )
 
-        return filename, chosen_fmt
+        return filename
+
+    def _fetch_stream(self, req, url, name):
+        """
+        downloads a stream with a request of its own, next to the one of the
+        pyfile.
+        """
+        dl_dirname = safejoin(
+            self.pyload.storage.get_root(self.pyfile.package()),
+            self.pyfile.package().folder,
+        )
+        filename = safejoin(dl_dirname, name)
+
+        if (
+            self.pyload.config.get("download", "skip_existing")
+            and exists(filename)
+            and os.stat(filename).st_size != 0
+        ):
+            self.log_info(
+                self._("Download skipped: {} due to File exists").format(name)
+            )
+            return filename
+
+        os.makedirs(dl_dirname, exist_ok=True)
+        req.http_download(
+            url,
+            filename,
+            chunks=self.pyload.config.get("download", "chunks"),
+            resume=self.resume_download,
+        )
+        if req.code in (404, 410):
+            self.remove(filename)
+            self.fail(self._("Stream {} not found").format(name))
+
+        self.set_permissions(filename)
+        return filename
+
+    def _download_streams(self, video, audio):
+        """
+        downloads the video stream and, at the same time, the audio stream (if
+        any), returns their files once both are complete.
+
+        `video` and `audio` are (url, name) tuples, the audio stream is loaded
+        with a request of its own, so both share the download slot of the
+        pyfile.
+        """
+        if audio is None:
+            return self._download_stream(*video), None
+
+        req = self.pyload.request_factory.get_request(self.classname, pooled=True)
+        try:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                audio_future = executor.submit(self._fetch_stream, req, *audio)
+                try:
+                    video_filename = self._download_stream(*video)
+
+                    self.pyfile.name = audio[1]
+                    while not wait([audio_future], timeout=1).done:
+                        self.check_status()
+                        self.pyfile.set_progress(req.percent)
+
+                    audio_filename = audio_future.result()
+
+                except BaseException:
+                    req.abort_downloads()
+                    raise
+
+        finally:
+            req.close()
+
+        return video_filename, audio_filename
 
     def _handle_subtitles(self):
         def timedtext_to_srt(timedtext):
@@ -984,7 +1014,7 @@ class YoutubeCom(BaseDownloader):
                 for lang in subs_dl_langs:
                     if lang in subtitles_urls:
                         srt_filename = os.path.join(
-                            self.pyload.config.get("general", "storage_folder"),
+                            self.pyload.storage.get_root(self.pyfile.package()),
                             self.pyfile.package().folder,
                             os.path.splitext(self.file_name)[0] + "." + lang + ".srt",
                         )
@@ -1019,7 +1049,7 @@ class YoutubeCom(BaseDownloader):
                 # Download any available subtitle
                 for subtitle in subtitles_urls.items():
                     srt_filename = os.path.join(
-                        self.pyload.config.get("general", "storage_folder"),
+                        self.pyload.storage.get_root(self.pyfile.package()),
                         self.pyfile.package().folder,
                         os.path.splitext(self.file_name)[0]
                         + "."
@@ -1157,7 +1187,7 @@ class YoutubeCom(BaseDownloader):
         except Exception:
             pass
 
-        self.req.http = BIGHTTPRequest(
+        self.req.http = HTTPRequest(
             cookies=CookieJar(None),
             options=self.pyload.request_factory.get_options(),
             limit=5_000_000,
@@ -1232,14 +1262,19 @@ class YoutubeCom(BaseDownloader):
         available_streams = (s[0] for s in self.streams)
         self.log_debug(f"AVAILABLE STREAMS: {available_streams}")
 
-        video_filename, video_itag = self._handle_video()
+        video_url, video_name, video_itag = self._handle_video()
 
         has_audio = "a" in self.formats[video_itag]["type"]
         if not has_audio:
-            audio_filename, audio_itag = self._handle_audio(video_itag)
+            audio_url, audio_name, audio_itag = self._handle_audio(video_itag)
+            audio = (audio_url, audio_name)
 
         else:
-            audio_filename = None
+            audio = None
+
+        video_filename, audio_filename = self._download_streams(
+            (video_url, video_name), audio
+        )
 
         subtitles_files = self._handle_subtitles()
 
@@ -16,7 +16,6 @@ import traceback
 import zlib
 from base64 import b85decode, b85encode
 from collections.abc import Sequence
-from datetime import timedelta
 
 
 class Config:
@@ -415,10 +414,8 @@ def replace_patterns(value, rules):
 
 
 # TODO: Remove in 0.6.x and fix exp in CookieJar.set_cookie
-def set_cookie(
-    cj, domain, name, value, path="/", exp=time.time() + timedelta(hours=744).seconds
-):  #: 31 days retention
-    args = [domain, name, value, path, int(exp)]
+def set_cookie(cj, domain, name, value, path="/", exp=None):
+    args = [domain, name, value, path, None if exp is None else int(exp)]
     return cj.set_cookie(*args)
 
 
@@ -434,6 +431,9 @@ def set_cookies(cj, cookies):
 
 
 def parse_html_header(header):
+    if isinstance(header, bytes):
+        header = header.decode("iso-8859-1")
+
     hdict = {}
     _re = r"[ ]*(?P<key>.+?)[ ]*:[ ]*(?P<value>.+?)[ ]*\r?\n"
 
@@ -557,7 +557,7 @@ def compute_checksum(filename, hashtype):
         last = 0
 
         with open(file, mode="rb") as fp:
-            for chunk in iter(lambda: fp.read(buf), ""):
+            for chunk in iter(lambda: fp.read(buf), b""):
                 last = hf(chunk, last)
 
         return "{:x}".format(last)
@@ -566,7 +566,7 @@ def compute_checksum(filename, hashtype):
         h = hashlib.new(hashtype)
 
         with open(file, mode="rb") as fp:
-            for chunk in iter(lambda: fp.read(buf * h.block_size), ""):
+            for chunk in iter(lambda: fp.read(buf * h.block_size), b""):
                 h.update(chunk)
 
         return h.hexdigest()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+from pyload.core.network.http.async_request import (
+    AsyncHTTPRequest,
+    CurlLoop,
+    run_coroutine,
+)
+from pyload.plugins.base.plugin import BasePlugin
+
+OPTIONS = {"interface": None, "proxies": None, "ipv6": False}
+
+PAGES = 20
+TEXT = "café &amp; crème"
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/missing":
+            self.send_error(404)
+            return
+
+        body = f"{self.path} {TEXT}".encode("iso-8859-1")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=ISO-8859-1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope="module")
+def server():
+    srv = _Server(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def plugin():
+    plugin = BasePlugin.__new__(BasePlugin)
+    plugin.pyload = types.SimpleNamespace(debug=0)
+    plugin.req = types.SimpleNamespace(cj=None, options=OPTIONS)
+    return plugin
+
+
+def test_load_decodes_charset(server):
+    async def run():
+        with AsyncHTTPRequest(None, OPTIONS) as req:
+            return await req.load(f"{server}/page", decode=True)
+
+    assert run_coroutine(run()) == f"/page {TEXT}"
+
+
+def test_load_async(server, plugin):
+    async def run():
+        return await plugin.load_async(f"{server}/page")
+
+    assert run_coroutine(run()) == "/page café & crème"
+
+
+def test_load_all(server, plugin):
+    urls = [f"{server}/{n}" for n in range(PAGES)] + [f"{server}/missing"]
+
+    pages = plugin.load_all(urls)
+
+    assert pages[:-1] == [f"/{n} café & crème" for n in range(PAGES)]
+    assert isinstance(pages[-1], Exception)
+
+
+def test_load_all_releases_curl_loops(server, plugin):
+    for _ in range(5):
+        plugin.load_all([f"{server}/page"])
+
+    assert not CurlLoop._loops
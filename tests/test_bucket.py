@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import time
+from threading import Barrier, Thread
+
+from pyload.core.network.bucket import Bucket
+
+WRITERS = 4
+CHUNK_SIZE = 16 << 10
+RATE = 4 << 20  #: low enough to throttle the writers
+DURATION = 2  #: seconds the writers run at every rate
+
+
+def _run_writers(bucket, rates, writers=WRITERS):
+    """
+    returns the throughput of `writers` threads sleeping as told by the bucket,
+    at each of `rates` set while they keep running.
+    """
+    barrier = Barrier(writers + 1)
+    #: write callbacks of every writer at each rate
+    callbacks = [rate * DURATION // (writers * CHUNK_SIZE) for rate in rates]
+
+    def writer():
+        for n in callbacks:
+            barrier.wait()
+            for _ in range(n):
+                time.sleep(bucket.consumed(CHUNK_SIZE))
+            barrier.wait()
+
+    threads = [Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+
+    speeds = []
+    for rate, n in zip(rates, callbacks):
+        bucket.set_rate(rate)
+        barrier.wait()
+        start = time.perf_counter()
+        barrier.wait()
+        elapsed = time.perf_counter() - start
+        speeds.append(n * writers * CHUNK_SIZE / elapsed)
+
+    for t in threads:
+        t.join()
+
+    return speeds
+
+
+def test_consumed_unlimited():
+    bucket = Bucket()
+    bucket.set_rate(-1)
+    assert bucket.consumed(CHUNK_SIZE) == 0
+
+
+def test_consumed_throttles():
+    bucket = Bucket()
+    bucket.set_rate(Bucket.MIN_RATE)
+    assert bucket.consumed(Bucket.MIN_RATE * 3) >= 1
+
+
+def test_consumed_reservation_reset_on_rate_change():
+    bucket = Bucket()
+    bucket.set_rate(100 << 20)
+    bucket.consumed(1)
+    assert bucket._local.token > 0
+
+    bucket.set_rate(Bucket.MIN_RATE)
+    assert bucket.consumed(Bucket.MIN_RATE * 3) >= 1
+
+
+def test_benchmark_throttled_writers():
+    bucket = Bucket()
+    rates = [RATE, RATE * 2, RATE]  #: reservations are dropped on every change
+
+    for rate, speed in zip(rates, _run_writers(bucket, rates)):
+        assert abs(speed - rate) <= rate / 10, f"{speed:,.0f} B/s at {rate:,} B/s"
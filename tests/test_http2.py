@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+import pycurl
+import pytest
+
+from pyload.core.network.http.async_request import (
+    AsyncHTTPRequest,
+    CurlLoop,
+    run_coroutine,
+)
+
+hypercorn = pytest.importorskip("hypercorn")
+pytest.importorskip("h2")
+
+from hypercorn.asyncio import serve  # noqa: E402
+from hypercorn.config import Config  # noqa: E402
+
+REQUESTS = 200
+BODY = b"x" * 512
+
+OPTIONS = {"interface": None, "proxies": None, "ipv6": False}
+
+
+def _write_cert(path):
+    certfile, keyfile = path / "cert.pem", path / "key.pem"
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-keyout",
+            str(keyfile),
+            "-out",
+            str(certfile),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return str(certfile), str(keyfile)
+
+
+async def _app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/plain")],
+        }
+    )
+    await send({"type": "http.response.body", "body": BODY})
+
+
+@pytest.fixture(scope="module")
+def h2_server(tmp_path_factory):
+    if not pycurl.version_info()[4] & pycurl.VERSION_HTTP2:
+        pytest.skip("libcurl without HTTP/2 support")
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl not found")
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.certfile, config.keyfile = _write_cert(tmp_path_factory.mktemp("h2"))
+    config.loglevel = "WARNING"
+
+    loop = asyncio.new_event_loop()
+    stop = asyncio.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve(_app, config, shutdown_trigger=stop.wait))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+
+    yield f"https://localhost:{port}/"
+
+    loop.call_soon_threadsafe(stop.set)
+    thread.join(5)
+
+
+def _load_all(url, http2, requests=REQUESTS):
+    """
+    returns requests per second, the http versions and the number of new
+    connections of `requests` concurrent loads.
+    """
+
+    async def run():
+        with AsyncHTTPRequest(None, dict(OPTIONS, http2=http2)) as h:
+            CurlLoop.versions.clear()
+            results = await asyncio.gather(*[h.request(url) for _ in range(requests)])
+
+            versions = set()
+            connects = 0
+            for rep, req in results:
+                assert rep == BODY
+                versions.add(req.c.getinfo(pycurl.INFO_HTTP_VERSION))
+                connects += req.c.getinfo(pycurl.NUM_CONNECTS)
+            return versions, connects
+
+    start = time.perf_counter()
+    versions, connects = run_coroutine(run())
+    return requests / (time.perf_counter() - start), versions, connects
+
+
+def test_http2_negotiated_and_tracked(h2_server):
+    rate, versions, connects = _load_all(h2_server, True, 20)
+    assert versions == {pycurl.CURL_HTTP_VERSION_2_0}
+    assert CurlLoop.is_multiplexed(h2_server)
+
+
+def test_http1_tracked(h2_server):
+    rate, versions, connects = _load_all(h2_server, False, 20)
+    assert versions == {pycurl.CURL_HTTP_VERSION_1_1}
+    assert not CurlLoop.is_multiplexed(h2_server)
+
+
+def test_benchmark_multiplexing(h2_server):
+    rate_h1, versions, connects_h1 = _load_all(h2_server, False)
+    rate_h2, versions, connects_h2 = _load_all(h2_server, True)
+
+    print(
+        f"\n{REQUESTS} requests: HTTP/1.1 {rate_h1:.0f} req/s over {connects_h1} "
+        f"connections, HTTP/2 {rate_h2:.0f} req/s over {connects_h2} connections"
+    )
+    assert connects_h2 < connects_h1
+    assert connects_h2 <= 2
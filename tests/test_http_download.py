@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+from pyload.core.network.exceptions import Abort
+from pyload.core.network.http.http_chunk import ChunkInfo
+from pyload.core.network.http.http_download import HTTPDownload
+
+CHUNKS = 3
+DATA = os.urandom(3 << 20)
+SLOW_FROM = len(DATA) // CHUNKS * (CHUNKS - 1)  #: the last chunk is throttled
+BLOCK = 1 << 16
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        start, end = 0, len(DATA) - 1
+        m = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if m:
+            start = int(m.group(1))
+            if m.group(2):
+                end = min(int(m.group(2)), end)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(DATA)}")
+        else:
+            self.send_response(200)
+        self.server.starts.append(start)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+
+        pos = start
+        while pos <= end:
+            if pos >= SLOW_FROM:
+                time.sleep(0.2)
+            data = DATA[pos : min(pos + BLOCK, end + 1)]
+            try:
+                self.wfile.write(data)
+            except OSError:
+                return
+            pos += len(data)
+
+
+@pytest.fixture(scope="module")
+def server():
+    srv = _Server(("127.0.0.1", 0), _Handler)
+    srv.starts = []
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_resume_unsynced_chunks(server, tmp_path):
+    url = f"http://127.0.0.1:{server.server_port}/file.bin"
+    filename = str(tmp_path / "file.bin")
+    options = {
+        "interface": None,
+        "proxies": {},
+        "ipv6": False,
+        "sync_policy": "none",
+    }
+
+    dl = HTTPDownload(url, filename, options=options)
+    timer = threading.Timer(1.5, setattr, (dl, "abort", True))
+    timer.start()
+    with pytest.raises(Abort):
+        dl.download(chunks=CHUNKS, resume=True)
+    timer.cancel()
+
+    #: the fast chunks finished before the pause and are journaled as such
+    info = ChunkInfo.load(filename)
+    assert info.get_count() == CHUNKS
+    for i in range(CHUNKS - 1):
+        start, end = info.get_chunk_range(i)
+        assert info.get_verified_offset(i) > end - start
+    kept = info.get_verified_offset(CHUNKS - 1)
+
+    server.starts = []
+    dl = HTTPDownload(url, filename, options=options)
+    dl.download(chunks=CHUNKS, resume=True)
+
+    #: the finished chunks are not loaded again, the paused one goes on
+    for i in range(CHUNKS - 1):
+        assert info.get_chunk_range(i)[0] not in server.starts
+    assert info.get_chunk_range(CHUNKS - 1)[0] + kept in server.starts
+    with open(filename, mode="rb") as fh:
+        assert fh.read() == DATA
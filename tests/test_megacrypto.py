@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import struct
+import time
+
+import pytest
+
+pytest.importorskip("Cryptodome")
+
+import Cryptodome.Cipher.AES  # noqa: E402
+
+from pyload.plugins.downloaders.MegaCoNz import MegaCrypto  # noqa: E402
+
+#: size in bytes of the synthetic file of the benchmark, which only runs if set
+#: (2 GiB is a good size, the file is sparse so it costs no disk space)
+SIZE = int(os.environ.get("PYLOAD_BENCH_SIZE", 0))
+LEGACY_SIZE = 16 << 20  #: the block by block loop is too slow for the whole file
+
+KEY = struct.unpack(">8I", bytes(range(32)))
+
+
+def _legacy_mac(key, data):
+    """
+    the CBC-MAC computed block by block, like Checksum.update did.
+    """
+    checksum = MegaCrypto.Checksum(key)
+    for chunk_start, chunk_size in MegaCrypto.get_chunks(len(data)):
+        chunk = data[chunk_start : chunk_start + chunk_size]
+        cbc = Cryptodome.Cipher.AES.new(
+            checksum.key, mode=Cryptodome.Cipher.AES.MODE_CBC, IV=checksum.iv
+        )
+        for j in range(0, len(chunk), 16):
+            block = chunk[j : j + 16].ljust(16, b"\0")
+            mac = cbc.encrypt(block)
+        checksum.fold(mac)
+    return checksum.digest()
+
+
+def _file_mac(fh, size, workers, progress=None):
+    checksum = MegaCrypto.Checksum(KEY)
+    checksum.update_file(fh, size, workers, progress)
+    return checksum.digest()
+
+
+@pytest.mark.parametrize("size", [0, 5, 16, 0x20000, 0x20000 + 7, 3_333_333])
+def test_chunk_macs_match_legacy(size):
+    data = os.urandom(size)
+    expected = _legacy_mac(KEY, data)
+
+    checksum = MegaCrypto.Checksum(KEY)
+    for chunk_start, chunk_size in MegaCrypto.get_chunks(size):
+        checksum.update(data[chunk_start : chunk_start + chunk_size])
+    assert checksum.digest() == expected
+
+    percents = []
+    assert _file_mac(io.BytesIO(data), size, 4, percents.append) == expected
+    assert percents == sorted(percents)
+    assert not size or percents[-1] == 100
+
+
+@pytest.fixture(scope="module")
+def synthetic_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("mega") / "synthetic.bin"
+    with open(path, mode="wb") as fh:
+        fh.truncate(SIZE)
+    return path
+
+
+@pytest.mark.skipif(not SIZE, reason="PYLOAD_BENCH_SIZE not set")
+def test_benchmark_cbc_mac(synthetic_file):
+    start = time.perf_counter()
+    _legacy_mac(KEY, bytes(LEGACY_SIZE))
+    legacy = LEGACY_SIZE / (time.perf_counter() - start)
+
+    rates = {}
+    digests = set()
+    for workers in (1, max(os.cpu_count() or 1, 2)):
+        with open(synthetic_file, mode="rb") as fh:
+            start = time.perf_counter()
+            digests.add(_file_mac(fh, SIZE, workers))
+            rates[workers] = SIZE / (time.perf_counter() - start)
+
+    assert len(digests) == 1
+    #: a whole chunk per cipher call beats the block by block loop
+    assert min(rates.values()) > legacy, (
+        f"CBC-MAC of {SIZE >> 20} MiB: block by block {legacy / (1 << 20):.0f} MiB/s, "
+        + ", ".join(
+            f"{x} thread(s) {rate / (1 << 20):.0f} MiB/s" for x, rate in rates.items()
+        )
+    )
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import zipfile
+
+import pytest
+
+from pyload.plugins.base.unzip import extract_members
+
+SMALL_FILES = 2000
+SMALL_SIZE = 4 << 10
+HUGE_FILES = 4
+HUGE_SIZE = 24 << 20
+
+
+def _data(size, seed):
+    #: half random, half repeated, so members compress like real content
+    random = os.urandom(size // 2)
+    return random + bytes([seed % 256]) * (size - len(random))
+
+
+def _make_zip(path, count, size):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for n in range(count):
+            z.writestr(f"dir{n % 10}/file{n}.bin", _data(size, n))
+    return path
+
+
+@pytest.fixture(scope="module")
+def archives(tmp_path_factory):
+    path = tmp_path_factory.mktemp("zips")
+    return {
+        "small": _make_zip(path / "small.zip", SMALL_FILES, SMALL_SIZE),
+        "huge": _make_zip(path / "huge.zip", HUGE_FILES, HUGE_SIZE),
+    }
+
+
+def _extract(archive, dest, workers):
+    start = time.perf_counter()
+    names = extract_members(str(archive), str(dest), workers=workers)
+    return time.perf_counter() - start, names
+
+
+def _same_content(archive, dest):
+    with zipfile.ZipFile(archive) as z:
+        for info in z.infolist():
+            with open(dest / info.filename, mode="rb") as fp:
+                assert fp.read() == z.read(info)
+
+
+def test_extract_members(tmp_path):
+    archive = _make_zip(tmp_path / "a.zip", 20, 3 << 20)
+    percents = []
+
+    names = extract_members(
+        str(archive), str(tmp_path / "out"), workers=4, progress=percents.append
+    )
+
+    assert sorted(names) == sorted(zipfile.ZipFile(archive).namelist())
+    _same_content(archive, tmp_path / "out")
+    assert percents == sorted(set(percents))
+    assert percents[-1] == 100
+
+
+def test_extract_members_stays_in_dest(tmp_path):
+    archive = tmp_path / "evil.zip"
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("../../escaped.txt", b"x")
+        z.writestr("/absolute.txt", b"y")
+
+    extract_members(str(archive), str(tmp_path / "out"), workers=2)
+
+    assert (tmp_path / "out" / "escaped.txt").read_bytes() == b"x"
+    assert (tmp_path / "out" / "absolute.txt").read_bytes() == b"y"
+    assert not (tmp_path.parent / "escaped.txt").exists()
+
+
+def test_extract_members_bad_crc(tmp_path):
+    archive = tmp_path / "bad.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as z:
+        z.writestr("a.bin", b"a" * 100000)
+
+    data = bytearray(archive.read_bytes())
+    data[1000] ^= 0xFF
+    archive.write_bytes(bytes(data))
+
+    with pytest.raises(zipfile.BadZipFile):
+        extract_members(str(archive), str(tmp_path / "out"), workers=2)
+
+
+@pytest.mark.parametrize("kind", ["small", "huge"])
+def test_benchmark_extract(archives, tmp_path, kind):
+    archive = archives[kind]
+    size = sum(x.file_size for x in zipfile.ZipFile(archive).infolist())
+
+    serial, names = _extract(archive, tmp_path / "serial", 1)
+    workers = os.cpu_count() or 1
+    parallel, names = _extract(archive, tmp_path / "parallel", max(workers, 2))
+
+    start = time.perf_counter()
+    with zipfile.ZipFile(archive) as z:
+        z.extractall(tmp_path / "extractall")
+    extractall = time.perf_counter() - start
+
+    print(
+        f"\n{kind} ({len(names)} files, {size >> 20} MiB): "
+        f"extractall {size / extractall / (1 << 20):.0f} MiB/s, "
+        f"1 thread {size / serial / (1 << 20):.0f} MiB/s, "
+        f"{max(workers, 2)} threads {size / parallel / (1 << 20):.0f} MiB/s"
+    )
+    _same_content(archive, tmp_path / "parallel")